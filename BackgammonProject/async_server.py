@@ -0,0 +1,1654 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import itertools
+import logging
+import multiprocessing
+import random
+import secrets
+import signal
+import time
+
+from bot import choose_moves
+from journal import FSYNC_INTERVAL, GAME_OVER, JOURNAL_DIR, MOVE, ROLL, TURN, open_journal, sync_journals
+from matchmaking import MATCH_INTERVAL, WAIT_BUCKETS, MatchQueue
+from metrics import COUNT_BUCKETS, STATS_LOG_INTERVAL, MetricsRegistry, serve_stats
+from protocol import (SESSION_TOKEN_SIZE, FrameProtocol, encode_message, encode_messages, decode_message,
+                      route_frames, routed_room)
+from results import BOT_NAME, INITIAL_RATING, RESULTS_DB, GameResult, ResultStore, player_name
+from rules import RulesEngine, to_board_point
+from state_sync import VersionedState
+from timers import TimerHeap, TimerWheel
+from tracing import SERVER_PROCESS, Tracer, new_trace
+from turn_clock import CLOCK_MODES, DEFAULT_TURN_CLOCK, TIMEOUT_ACTIONS, TurnClock
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+LISTEN_BACKLOG = 1024
+OUTBOUND_QUEUE_LIMIT = 256
+SEND_TIMEOUT = 10.0
+SHUTDOWN_TIMEOUT = 5.0
+SPECTATOR_LAG_LIMIT = 64
+SEAT_GRACE_PERIOD = 60.0
+PING_INTERVAL = 15.0
+IDLE_TIMEOUT = 45.0
+BOT_WORKERS = 2
+PING_MESSAGE = encode_message({"type": "ping"})
+PONG_MESSAGE = encode_message({"type": "pong"})
+SPECTATOR_MESSAGE = encode_message({"type": "color", "data": "spectator"})
+TURN_MESSAGES = {flag: encode_message({"type": "turn", "data": flag}) for flag in (True, False)}
+
+
+def raise_open_file_limit():
+    """
+    Raises the soft limit of open file descriptors to the hard limit.
+
+    Every connected client holds one socket, so hosting thousands of games in one process
+    quickly exceeds the default soft limit on most systems. Does nothing on platforms
+    without the `resource` module.
+    """
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            logging.info(f"Raised open file limit from {soft} to {hard}.")
+        except (ValueError, OSError) as e:
+            logging.warning(f"Could not raise open file limit: {e}")
+
+
+class Connection:
+    """
+    Represents a connected client of the AsyncGameServer.
+
+    Outgoing messages are already encoded frames that are put in a bounded queue and
+    written by a dedicated writer task, so a broadcast never waits for a slow receiver.
+    A client whose queue overflows, or whose socket does not accept data within
+    SEND_TIMEOUT, is dropped.
+    """
+
+    def __init__(self, protocol, queue_limit=OUTBOUND_QUEUE_LIMIT, metrics=None):
+        """
+        Initializes a Connection and starts its writer task.
+
+        Parameters:
+            protocol (FrameProtocol): The protocol of the client's transport, which receives
+                                      its requests and sends messages to it.
+            queue_limit (int, optional): The number of queued messages after which the client
+                                         is dropped. Defaults to OUTBOUND_QUEUE_LIMIT.
+            metrics (MetricsRegistry, optional): The registry counting the bytes sent and the
+                                                 messages per write. Defaults to a private one.
+        """
+        self.protocol = protocol
+        self.addr = protocol.transport.get_extra_info("peername")
+        self.queue_limit = queue_limit
+        self.outbound = collections.deque()
+        self.wakeup = asyncio.Event()
+        self.closed = False
+        self.last_seen = time.monotonic()
+        self.heartbeat = None
+        self.room = None
+        self.name = None
+        self.tickets = set()
+        metrics = metrics or MetricsRegistry()
+        self.bytes_out = metrics.counter("bytes_out")
+        self.write_batches = metrics.histogram("write_batch_messages", COUNT_BUCKETS)
+        self.writer_task = asyncio.create_task(self.write_outbound())
+
+    def send(self, message):
+        """
+        Queues an encoded message for the client without blocking.
+
+        Parameters:
+            message (bytes): The framed message to send.
+
+        Returns:
+            bool: True if the message was queued, False if the client is closed or was dropped.
+        """
+        if self.closed:
+            return False
+        if len(self.outbound) >= self.queue_limit:
+            logging.warning(f"Dropping slow client {self.addr}: {len(self.outbound)} messages queued.")
+            self.close()
+            return False
+        self.outbound.append(message)
+        self.wakeup.set()
+        return True
+
+    def catch_up(self, message):
+        """
+        Discards the queued messages and queues a single message instead.
+
+        Used for spectators that fall behind: rather than being dropped, they skip the
+        deltas they did not receive yet and get the latest snapshot.
+
+        Parameters:
+            message (bytes): The framed message replacing the queued ones.
+        """
+        if self.closed:
+            return
+        self.outbound.clear()
+        self.outbound.append(message)
+        self.wakeup.set()
+
+    async def write_outbound(self):
+        """
+        Writes the queued messages to the socket until the connection is closed.
+
+        Every message queued since the last write is sent with a single write call, so the
+        number of messages per write shows how deep the queue got.
+        """
+        try:
+            while not self.closed:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                while self.outbound and not self.closed:
+                    self.write_batches.observe(len(self.outbound))
+                    batch = b"".join(self.outbound)
+                    self.outbound.clear()
+                    self.bytes_out.inc(len(batch))
+                    self.protocol.write(batch)
+                    await asyncio.wait_for(self.protocol.drain(), SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            logging.warning(f"Dropping slow client {self.addr}: send timed out.")
+        except (ConnectionError, OSError) as e:
+            logging.debug(f"Write to client {self.addr} failed: {e}")
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Closes the connection and discards any queued messages.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.outbound.clear()
+        self.wakeup.set()
+        self.protocol.close()
+
+
+class Route:
+    """
+    Represents a connection taking part in a room other than the one it was seated in.
+
+    A connection is seated in a room when it connects, and the messages of that room are
+    sent unrouted, as to any single game client. Every further room it joins, watches or
+    resumes with a routed request gets a Route, which rooms treat like a connection of
+    their own: the frames sent to it carry the room id and are queued on the shared
+    connection, in order with the frames of its other rooms.
+    """
+
+    def __init__(self, conn, room_id):
+        """
+        Initializes a Route.
+
+        Parameters:
+            conn (Connection): The connection carrying the route.
+            room_id (int): The id of the room the route leads to.
+        """
+        self.conn = conn
+        self.room_id = room_id
+        self.addr = conn.addr
+
+    @property
+    def closed(self):
+        """
+        bool: True once the connection carrying the route is closed.
+        """
+        return self.conn.closed
+
+    @property
+    def outbound(self):
+        """
+        collections.deque: The messages queued on the connection, for every room.
+        """
+        return self.conn.outbound
+
+    @property
+    def name(self):
+        """
+        str: The name the player of the connection goes by, or None.
+        """
+        return self.conn.name
+
+    def send(self, message):
+        """
+        Queues encoded messages for the room on the connection.
+
+        Parameters:
+            message (bytes): One or more framed messages, unrouted.
+
+        Returns:
+            bool: True if the messages were queued, False if the connection is closed or was dropped.
+        """
+        return self.conn.send(route_frames(self.room_id, message))
+
+    def catch_up(self, message):
+        """
+        Discards the messages of the room queued on the connection and queues a single
+        message instead.
+
+        The messages the connection queued for its other rooms stay queued, in order, so a
+        lagging spectator has at most one message of the room waiting, however long the
+        queue of the connection stays behind.
+
+        Parameters:
+            message (bytes): The framed message replacing the queued ones, unrouted.
+        """
+        if self.conn.closed:
+            return
+        outbound = self.conn.outbound
+        kept = [queued for queued in outbound if routed_room(queued) != self.room_id]
+        outbound.clear()
+        outbound.extend(kept)
+        self.send(message)
+
+
+class Room:
+    """
+    Represents a single game hosted by the AsyncGameServer.
+
+    Each room owns its board, its rules engine (which tracks the turn and the dice), its
+    pair of players and its read-only spectators, so any number of games can run side by
+    side on the same event loop. The seat of a player who disconnects is held under the
+    player's session token until the player resumes or the grace period expires. One of the
+    seats may be taken by a bot instead of a player.
+    """
+
+    def __init__(self, room_id, turn_clock=None, journal=None):
+        """
+        Initializes a Room instance with the starting position and no players.
+
+        Parameters:
+            room_id (int): The unique identifier of the room.
+            turn_clock (dict, optional): The keyword arguments of the room's TurnClock.
+                                         Defaults to None, which disables the clock.
+            journal (JournalWriter, optional): The journal recording the game. Defaults to None.
+        """
+        self.room_id = room_id
+        self.players = []
+        self.colors = ["white", "black"]
+        self.seat_colors = {}
+        self.tokens = {}
+        self.held_seats = {}
+        self.seat_timers = {}
+        self.spectators = set()
+        self.game_state = VersionedState()
+        self.rules = RulesEngine(self.game_state)
+        self.turn_clock = TurnClock(**turn_clock) if turn_clock else None
+        self.clock_timer = None
+        self.journal = journal
+        self.names = {}
+        self.moves = 0
+        self.started_at = None
+        self.bot_color = None
+
+    def is_full(self):
+        """
+        Checks if both seats of the room are taken.
+
+        Returns:
+            bool: True if the room already has two players, counting held seats and the bot,
+                  False otherwise.
+        """
+        bots = self.bot_color is not None
+        return len(self.players) + len(self.held_seats) + bots >= len(self.colors)
+
+    def add_player(self, conn):
+        """
+        Seats a new player in the room.
+
+        Parameters:
+            conn (Connection): The connection of the player.
+
+        Returns:
+            str: The color assigned to the player ("white" or "black").
+        """
+        color = self.free_color()
+        self.players.append(conn)
+        self.seat_colors[conn] = color
+        return color
+
+    def free_color(self):
+        """
+        Finds a seat nobody has taken.
+
+        Returns:
+            str: The color of the first free seat.
+        """
+        taken = set(self.seat_colors.values()) | set(self.held_seats.values()) | {self.bot_color}
+        return next(c for c in self.colors if c not in taken)
+
+    def resume_player(self, conn, token):
+        """
+        Gives a held seat back to the player who reconnected with its session token.
+
+        Parameters:
+            conn (Connection): The new connection of the player.
+            token (bytes): The session token of the held seat.
+
+        Returns:
+            str: The color of the seat.
+        """
+        color = self.held_seats.pop(token)
+        timer = self.seat_timers.pop(token, None)
+        if timer is not None:
+            timer.cancel()
+        self.players.append(conn)
+        self.seat_colors[conn] = color
+        self.tokens[conn] = token
+        return color
+
+    def has_connection(self, conn):
+        """
+        Checks if a connection plays or watches the room, directly or over a route.
+
+        Parameters:
+            conn (Connection): The connection to look for.
+
+        Returns:
+            bool: True if one of the players or spectators is the connection or one of its routes.
+        """
+        return any(getattr(member, "conn", member) is conn
+                   for members in (self.players, self.spectators) for member in members)
+
+    def remove_player(self, conn):
+        """
+        Removes a player from the room.
+
+        Parameters:
+            conn (Connection): The connection of the player that left.
+        """
+        if conn in self.players:
+            self.players.remove(conn)
+            del self.seat_colors[conn]
+            self.tokens.pop(conn, None)
+        self.spectators.discard(conn)
+
+
+class AsyncGameServer:
+    """
+    Represents the asyncio based Backgammon Game Server.
+
+    Multiplexes any number of rooms on a single event loop instead of spawning one thread
+    per connection. New connections are seated in the room that is waiting for an opponent,
+    or in a freshly created room if there is none. Quiet connections are pinged, and the
+    ones that stay silent for the idle timeout are closed; the heartbeats of all the
+    connections share one timer wheel. The turn clocks of all the rooms share one timer heap.
+    The rolls, moves and turns of every room are appended to a journal per room, which a
+    single background thread syncs to disk every FSYNC_INTERVAL seconds. Finished games and
+    the ratings of their players are handed to a ResultStore, which writes them in batches.
+    A player waiting for an opponent can ask for a bot, whose moves are computed by a pool
+    of worker processes shared by every room, so the event loop never runs the bot itself.
+    Besides the room it is seated in, a connection can join, watch or resume any number of
+    rooms over routes, each addressed by the room id its messages carry.
+    With matchmaking on, connections wait in a lobby instead of being seated on arrival:
+    the players who queue are paired by rating in a MatchQueue, which is drained every
+    MATCH_INTERVAL seconds from the timer wheel, and every pair is seated in a new room.
+    Traffic, load and handling times are kept in a MetricsRegistry, logged periodically
+    and optionally served over HTTP. Moves sent with a trace have the hops they take
+    through the server recorded by a Tracer, and their trace is passed on to the deltas
+    they cause.
+    """
+
+    def __init__(self, host='127.0.0.1', port=12345, grace_period=SEAT_GRACE_PERIOD,
+                 ping_interval=PING_INTERVAL, idle_timeout=IDLE_TIMEOUT, turn_clock=DEFAULT_TURN_CLOCK,
+                 journal_dir=JOURNAL_DIR, results_db=RESULTS_DB, bot_workers=BOT_WORKERS,
+                 stats_port=None, stats_interval=STATS_LOG_INTERVAL, trace_file=None, matchmaking=False):
+        """
+        Initializes the AsyncGameServer instance.
+
+        Parameters:
+            host (str, optional): The IP address to bind the server. Defaults to '127.0.0.1'.
+            port (int, optional): The port number to bind the server. Defaults to 12345.
+            grace_period (float, optional): The seconds a disconnected player's seat is held.
+                                            Defaults to SEAT_GRACE_PERIOD.
+            ping_interval (float, optional): The seconds of silence after which a client is pinged.
+                                             Defaults to PING_INTERVAL.
+            idle_timeout (float, optional): The seconds of silence after which a client is
+                                            disconnected. Defaults to IDLE_TIMEOUT.
+            turn_clock (dict, optional): The keyword arguments of the TurnClock of every room,
+                                         or None to play without clocks. Defaults to DEFAULT_TURN_CLOCK.
+            journal_dir (str, optional): The directory of the game journals, or None to keep
+                                         no journals. Defaults to JOURNAL_DIR.
+            results_db (str, optional): The SQLite database the results and ratings are stored
+                                        in, or None to store nothing. Defaults to RESULTS_DB.
+            bot_workers (int, optional): The number of processes computing the moves of the bots,
+                                         or 0 to refuse bots. Defaults to BOT_WORKERS.
+            stats_port (int, optional): The port of the HTTP endpoint serving the metrics, or None
+                                        to serve none. Defaults to None.
+            stats_interval (float, optional): The seconds between two logs of the metrics, or 0
+                                              to never log them. Defaults to STATS_LOG_INTERVAL.
+            trace_file (str, optional): The file the spans of traced moves are appended to, or
+                                        None to record none. Defaults to None.
+            matchmaking (bool, optional): True to pair the players who queue by rating, False
+                                          to pair connections as they arrive. Defaults to False.
+        """
+        self.host = host
+        self.port = port
+        self.grace_period = grace_period
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.turn_clock = turn_clock
+        self.journal_dir = journal_dir
+        self.journal_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1) if journal_dir else None
+        self.results = ResultStore(results_db) if results_db else None
+        self.bot_workers = bot_workers
+        self.bot_pool = None
+        self.timer_wheel = TimerWheel()
+        self.turn_timers = TimerHeap()
+        self.timers_task = None
+        self.rooms = {}
+        self.sessions = {}
+        self.clients = {}
+        self.waiting_rooms = collections.deque()
+        self.room_ids = itertools.count(1)
+        self.server = None
+        self.stats_port = stats_port
+        self.stats_interval = stats_interval
+        self.stats_server = None
+        self.metrics = MetricsRegistry()
+        self.metrics.gauge("rooms", lambda: len(self.rooms))
+        self.connections = self.metrics.gauge("connections")
+        self.moves = self.metrics.counter("moves")
+        self.bytes_in = self.metrics.counter("bytes_in")
+        self.broadcast_time = self.metrics.histogram("broadcast_seconds")
+        self.trace_file = trace_file
+        self.tracer = Tracer(trace_file, SERVER_PROCESS) if trace_file else None
+        self.match_queue = MatchQueue() if matchmaking else None
+        if matchmaking:
+            self.metrics.gauge("queued", lambda: len(self.match_queue))
+            self.match_time = self.metrics.histogram("match_seconds")
+            self.queue_wait = self.metrics.histogram("queue_wait_seconds", WAIT_BUCKETS)
+
+    def create_room(self, room_id):
+        """
+        Creates a room and opens the journal of its game.
+
+        Parameters:
+            room_id (int): The unique identifier of the room.
+
+        Returns:
+            Room: The new room, registered with the server.
+        """
+        journal = None
+        if self.journal_dir:
+            try:
+                journal = open_journal(self.journal_dir, room_id)
+            except OSError as e:
+                logging.error(f"Could not open the journal of room {room_id}: {e}")
+        room = Room(room_id, self.turn_clock, journal)
+        self.rooms[room_id] = room
+        return room
+
+    def assign_room(self, room_id=None, conn=None):
+        """
+        Finds the room for a new connection, or for a connection joining one more game.
+
+        Rooms waiting for an opponent are kept in order. There is usually at most one, but a
+        connection is never paired with itself, so one that joins several games keeps a
+        waiting room per game until other connections fill them.
+
+        Parameters:
+            room_id (int, optional): The room chosen for the connection by a supervisor.
+                                     Defaults to None, which pairs connections locally.
+            conn (Connection, optional): The connection joining one more game. Defaults to None.
+
+        Returns:
+            Room: The room with the given id, created if needed, or else the oldest room
+                  waiting for an opponent that the connection is not in, or a new room.
+        """
+        if room_id is not None:
+            room = self.rooms.get(room_id)
+            if room is None:
+                room = self.create_room(room_id)
+            return room
+        while self.waiting_rooms and self.waiting_rooms[0].is_full():
+            self.waiting_rooms.popleft()
+        for room in self.waiting_rooms:
+            if not room.is_full() and (conn is None or not room.has_connection(conn)):
+                return room
+        room = self.create_room(next(self.room_ids))
+        self.waiting_rooms.append(room)
+        return room
+
+    def stop_waiting(self, room):
+        """
+        Takes a room off the rooms waiting for an opponent.
+
+        Parameters:
+            room (Room): The room that no longer waits.
+        """
+        if room in self.waiting_rooms:
+            self.waiting_rooms.remove(room)
+
+    def player_rating(self, name):
+        """
+        Looks up the rating a player is matched by.
+
+        Parameters:
+            name (str): The name of the player, or None.
+
+        Returns:
+            float: The stored rating of the player, or INITIAL_RATING for an unnamed or new
+                   player or when no results are stored.
+        """
+        if name is None or self.results is None:
+            return INITIAL_RATING
+        return self.results.rating(name)
+
+    def enqueue(self, conn, routes=None):
+        """
+        Puts a connection in the matchmaking queue, for its own seat or for one more game.
+
+        The tickets of a connection share a group, so it is never paired with itself.
+
+        Parameters:
+            conn (Connection): The connection waiting for an opponent.
+            routes (dict, optional): The routes of the connection, for a game joined over a
+                                     route. Defaults to None, for the seat of the connection.
+        """
+        ticket = self.match_queue.add((conn, routes), self.player_rating(conn.name), group=conn)
+        conn.tickets.add(ticket)
+
+    def dequeue(self, conn, routes=None):
+        """
+        Takes the tickets of a connection out of the matchmaking queue.
+
+        Parameters:
+            conn (Connection): The connection that no longer waits.
+            routes (dict, optional): The routes of the connection, to take out the games it
+                                     joined over routes as well. Defaults to None, which only
+                                     takes out the ticket for the seat of the connection.
+        """
+        for ticket in list(conn.tickets):
+            if ticket.player[1] is None or routes is not None:
+                self.match_queue.remove(ticket)
+                conn.tickets.discard(ticket)
+
+    def rename(self, conn, name):
+        """
+        Records the name of the player of a connection and matches its tickets by its rating.
+
+        Parameters:
+            conn (Connection): The connection that sent its name.
+            name (str): The name of the player.
+        """
+        conn.name = player_name(name)
+        if conn.tickets:
+            rating = self.player_rating(conn.name)
+            conn.tickets = {self.match_queue.rerate(ticket, rating) for ticket in conn.tickets}
+
+    def run_matchmaking(self):
+        """
+        Seats every pair of queued players whose ratings are close enough in a new room, then
+        schedules the next run.
+        """
+        started = time.perf_counter()
+        now = time.monotonic()
+        for tickets in self.match_queue.match(now):
+            self.seat_pair(tickets, now)
+        self.match_time.observe(time.perf_counter() - started)
+        self.timer_wheel.schedule(MATCH_INTERVAL, self.run_matchmaking)
+
+    def seat_pair(self, tickets, now):
+        """
+        Seats two matched players in a new room, in random colors.
+
+        A ticket for the seat of a connection seats the connection itself; a ticket for a
+        game joined over a route opens a new route.
+
+        Parameters:
+            tickets (tuple of Ticket): The tickets of the matched players.
+            now (float): The monotonic time they were matched at.
+        """
+        room = self.create_room(next(self.room_ids))
+        tickets = list(tickets)
+        random.shuffle(tickets)
+        for ticket in tickets:
+            conn, routes = ticket.player
+            conn.tickets.discard(ticket)
+            self.queue_wait.observe(now - ticket.enqueued_at)
+            if routes is None:
+                conn.room = room
+                self.seat_player(room, conn)
+            else:
+                route = Route(conn, room.room_id)
+                routes[room.room_id] = (room, route)
+                self.seat_player(room, route)
+
+    def close_room_seat(self, room, conn):
+        """
+        Removes a player from its room for good and discards the room once it is empty.
+
+        Parameters:
+            room (Room): The room the player was seated in.
+            conn (Connection): The connection of the player that left.
+        """
+        self.sessions.pop(room.tokens.get(conn), None)
+        room.remove_player(conn)
+        self.close_room_if_idle(room)
+
+    def close_room_if_idle(self, room):
+        """
+        Discards a room that has no players left and no seat held for one.
+
+        Parameters:
+            room (Room): The room to check.
+
+        Returns:
+            bool: True if the room was discarded, False otherwise.
+        """
+        if room.players or room.held_seats or self.rooms.get(room.room_id) is not room:
+            return False
+        del self.rooms[room.room_id]
+        if room.clock_timer is not None:
+            self.turn_timers.cancel(room.clock_timer)
+            room.clock_timer = None
+        if room.journal is not None:
+            self.journal_executor.submit(room.journal.close)
+        self.stop_waiting(room)
+        logging.info(f"Room {room.room_id} closed. Active rooms: {len(self.rooms)}")
+        return True
+
+    def hold_seat(self, room, conn):
+        """
+        Keeps the seat of a disconnected player for the grace period.
+
+        The expiry is a single timer handle on the event loop, so a held seat costs no thread.
+
+        Parameters:
+            room (Room): The room the player was seated in.
+            conn (Connection): The connection of the player that dropped.
+        """
+        token = room.tokens.get(conn)
+        color = room.seat_colors.get(conn)
+        if token is None or color is None or self.grace_period <= 0:
+            self.close_room_seat(room, conn)
+            return
+        room.remove_player(conn)
+        room.held_seats[token] = color
+        room.seat_timers[token] = asyncio.get_running_loop().call_later(
+            self.grace_period, self.release_seat, room, token)
+        logging.info(f"Holding the {color} seat of room {room.room_id} for {self.grace_period:g} seconds.")
+
+    def release_seat(self, room, token):
+        """
+        Gives up a held seat whose grace period expired.
+
+        Parameters:
+            room (Room): The room the seat belongs to.
+            token (bytes): The session token of the seat.
+        """
+        color = room.held_seats.pop(token, None)
+        room.seat_timers.pop(token, None)
+        self.sessions.pop(token, None)
+        if color is not None:
+            logging.info(f"The {color} seat of room {room.room_id} expired.")
+        self.close_room_if_idle(room)
+
+    def resume_session(self, room, conn, token):
+        """
+        Moves a reconnected player back into the seat held under its session token.
+
+        The player gives up the seat it was assigned on connection and receives its session
+        token, color and turn status along with the cached snapshot of the room and the dice
+        left to play, so no history has to be replayed. If the seat is no longer held, the
+        player is sent its current session token instead.
+
+        Parameters:
+            room (Room): The room the connection is currently in.
+            conn (Connection): The connection that asked to resume.
+            token (bytes): The session token sent by the player.
+
+        Returns:
+            Room: The room the connection is now in.
+        """
+        target = self.sessions.get(token)
+        if target is None or token not in target.held_seats:
+            logging.info(f"Client {conn.addr} could not resume: unknown or expired session.")
+            if conn in room.tokens:
+                conn.send(encode_message({"type": "session", "data": room.tokens[conn]}))
+            return room
+        self.close_room_seat(room, conn)
+        self.restore_seat(target, conn, token)
+        return target
+
+    def restore_seat(self, room, conn, token):
+        """
+        Gives a held seat back to a connection or a route and brings it up to date.
+
+        Parameters:
+            room (Room): The room holding the seat.
+            conn (Connection or Route): The player resuming the seat.
+            token (bytes): The session token of the held seat.
+        """
+        color = room.resume_player(conn, token)
+        self.sessions[token] = room
+        rules = room.rules
+        messages = encode_messages([
+            {"type": "session", "data": token},
+            {"type": "color", "data": color},
+            {"type": "turn", "data": color == rules.turn_color}
+        ]) + room.game_state.snapshot_message(color)
+        if color == rules.turn_color and rules.has_rolled:
+            messages += encode_message({"type": "dice", "data": rules.dice})
+        conn.send(messages)
+        logging.info(f"Client {conn.addr} resumed the {color} seat of room {room.room_id}")
+
+    def check_heartbeat(self, conn):
+        """
+        Pings a quiet client, or closes it once it has been silent for the idle timeout.
+
+        Runs from the timer wheel. Receiving data only records the time, so the next check is
+        scheduled here, for when the client could next need a ping or be reaped.
+
+        Parameters:
+            conn (Connection): The client to check.
+        """
+        if conn.closed:
+            return
+        idle = time.monotonic() - conn.last_seen
+        if idle >= self.idle_timeout:
+            logging.info(f"Closing idle client {conn.addr}: silent for {idle:.0f} seconds.")
+            conn.close()
+            return
+        if idle >= self.ping_interval:
+            conn.send(PING_MESSAGE)
+            delay = min(self.ping_interval, self.idle_timeout - idle)
+        else:
+            delay = self.ping_interval - idle
+        conn.heartbeat = self.timer_wheel.schedule(delay, self.check_heartbeat, conn)
+
+    def record(self, room, kind, color, a=0, b=0, c=0):
+        """
+        Appends an event to the journal of a room, if it keeps one.
+
+        Parameters:
+            room (Room): The room the event happened in.
+            kind (int): ROLL, MOVE, TURN or GAME_OVER.
+            color (str): The color the event concerns.
+            a (int, optional): The first argument of the event. Defaults to 0.
+            b (int, optional): The second argument of the event. Defaults to 0.
+            c (int, optional): The third argument of the event. Defaults to 0.
+        """
+        if room.journal is not None:
+            room.journal.append(kind, color, room.game_state.seq, a, b, c)
+
+    def sync_journals(self):
+        """
+        Hands the journals written to since the last sync to the journal thread and schedules
+        the next sync, so the event loop never waits for the disk.
+        """
+        journals = [room.journal for room in self.rooms.values()
+                    if room.journal is not None and room.journal.dirty]
+        if journals:
+            self.journal_executor.submit(sync_journals, journals)
+        self.timer_wheel.schedule(FSYNC_INTERVAL, self.sync_journals)
+
+    def log_metrics(self):
+        """
+        Logs a summary of the metrics and schedules the next log.
+        """
+        logging.info(f"Metrics: {self.metrics.summary()}")
+        self.timer_wheel.schedule(self.stats_interval, self.log_metrics)
+
+    def start_monitoring(self):
+        """
+        Schedules the periodic metrics log and starts the stats endpoint, as configured.
+        """
+        if self.stats_interval > 0:
+            self.timer_wheel.schedule(self.stats_interval, self.log_metrics)
+        if self.stats_port is not None:
+            self.stats_server = serve_stats(self.metrics, self.host, self.stats_port)
+
+    async def run_timers(self):
+        """
+        Advances the timer wheel and the turn timer heap once per tick until cancelled.
+        """
+        while True:
+            await asyncio.sleep(self.timer_wheel.tick)
+            self.timer_wheel.advance()
+            self.turn_timers.advance()
+
+    def start_timers(self):
+        """
+        Starts the task driving the timers on the running event loop.
+        """
+        self.timers_task = asyncio.create_task(self.run_timers())
+        if self.journal_executor is not None:
+            self.timer_wheel.schedule(FSYNC_INTERVAL, self.sync_journals)
+        if self.match_queue is not None:
+            self.timer_wheel.schedule(MATCH_INTERVAL, self.run_matchmaking)
+
+    def start_turn_clock(self, room):
+        """
+        Starts the clock of the player whose turn it is in a room and schedules its expiry.
+
+        Parameters:
+            room (Room): The room whose turn starts.
+        """
+        if room.turn_clock is None or room.rules.winner() is not None:
+            return
+        if room.clock_timer is not None:
+            self.turn_timers.cancel(room.clock_timer)
+        color = room.rules.turn_color
+        seconds = room.turn_clock.start(color)
+        room.clock_timer = self.turn_timers.schedule(seconds, self.expire_turn, room, color)
+
+    def expire_turn(self, room, color):
+        """
+        Handles a player running out of time, by passing its turn or ending the game.
+
+        Parameters:
+            room (Room): The room whose clock expired.
+            color (str): The color whose turn timed out.
+        """
+        room.clock_timer = None
+        if room.rules.turn_color != color or room.rules.winner() is not None:
+            return
+        room.turn_clock.stop()
+        if room.turn_clock.on_timeout == "forfeit":
+            logging.info(f"Room {room.room_id}: {color} ran out of time and forfeits.")
+            room.rules.forfeit(color)
+            self.end_game(room)
+        else:
+            logging.info(f"Room {room.room_id}: {color} ran out of time, passing the turn.")
+            self.advance_turn(room)
+
+    def advance_turn(self, room):
+        """
+        Passes the turn to the other player of a room and restarts the clock.
+
+        Parameters:
+            room (Room): The room whose turn ends.
+        """
+        if room.turn_clock is not None:
+            room.turn_clock.stop()
+        room.rules.end_turn()
+        self.record(room, TURN, room.rules.turn_color)
+        self.notify_turn(room)
+        self.start_turn_clock(room)
+        self.play_bot_turn(room)
+
+    def end_game(self, room):
+        """
+        Announces the winner of a room to its players and spectators and stops its clock.
+
+        Parameters:
+            room (Room): The room whose game is over.
+        """
+        if room.clock_timer is not None:
+            self.turn_timers.cancel(room.clock_timer)
+            room.clock_timer = None
+        winner = room.rules.winner()
+        self.record(room, GAME_OVER, winner, room.rules.forfeited is not None)
+        self.store_result(room, winner)
+        logging.info(f"Room {room.room_id}: {winner} has won!")
+        message = encode_message({"type": "game_over", "data": winner})
+        for conn in room.players:
+            conn.send(message)
+        self.send_to_spectators(room, message)
+
+    def store_result(self, room, winner):
+        """
+        Queues the result of a finished game to be stored, if the server keeps results.
+
+        Parameters:
+            room (Room): The room whose game is over.
+            winner (str): The winning color.
+        """
+        if self.results is None:
+            return
+        rules = room.rules
+        started_at = room.started_at or time.time()
+        self.results.record(GameResult(
+            room.room_id, room.names.get("white"), room.names.get("black"), winner,
+            rules.forfeited is not None, rules.pip_count("white"), rules.pip_count("black"),
+            room.moves, started_at, time.time() - started_at))
+
+    def start_game(self, room):
+        """
+        Starts the game of a room whose seats have all been taken for the first time.
+
+        Parameters:
+            room (Room): The room whose game starts.
+        """
+        room.started_at = time.time()
+        self.start_turn_clock(room)
+        self.play_bot_turn(room)
+
+    def seat_bot(self, room, conn):
+        """
+        Gives the free seat of a room to a bot, at the request of the player waiting there.
+
+        Parameters:
+            room (Room): The room of the player.
+            conn (Connection): The player who asked for a bot.
+        """
+        if room.is_full() or self.bot_workers <= 0:
+            logging.debug(f"Refused a bot to client {conn.addr} in room {room.room_id}.")
+            return
+        if self.bot_pool is None:
+            self.bot_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.bot_workers, mp_context=multiprocessing.get_context("spawn"))
+        room.bot_color = room.free_color()
+        room.names[room.bot_color] = BOT_NAME
+        self.stop_waiting(room)
+        logging.info(f"A bot took the {room.bot_color} seat of room {room.room_id}.")
+        self.start_game(room)
+
+    def play_bot_turn(self, room):
+        """
+        Rolls for the bot of a room if it is its turn, and has its moves computed by the pool.
+
+        Parameters:
+            room (Room): The room whose turn starts.
+        """
+        rules = room.rules
+        if room.bot_color is None or rules.turn_color != room.bot_color or rules.winner() is not None:
+            return
+        rules.roll()
+        self.record(room, ROLL, room.bot_color, *rules.dice[:2])
+        self.broadcast_dice(room)
+        future = asyncio.get_running_loop().run_in_executor(
+            self.bot_pool, choose_moves, room.game_state.state.tobytes(), room.bot_color, list(rules.dice))
+        future.add_done_callback(functools.partial(self.apply_bot_moves, room, room.game_state.seq))
+
+    def apply_bot_moves(self, room, seq, future):
+        """
+        Plays the moves computed for a bot on the event loop, then ends its turn.
+
+        Moves computed for a turn that is already over, because the clock expired or the
+        room was closed meanwhile, are dropped. A bot whose moves could not be computed forfeits.
+
+        Parameters:
+            room (Room): The room of the bot.
+            seq (int): The sequence number of the state the moves were computed from.
+            future (asyncio.Future): The future holding the moves.
+        """
+        rules = room.rules
+        if (future.cancelled() or self.rooms.get(room.room_id) is not room or room.game_state.seq != seq
+                or rules.turn_color != room.bot_color or rules.winner() is not None):
+            return
+        color = room.bot_color
+        try:
+            moves = future.result()
+        except Exception as e:
+            logging.error(f"The bot of room {room.room_id} failed: {e}")
+            rules.forfeit(color)
+            self.end_game(room)
+            return
+        for source, target, die in moves:
+            error = rules.validate_move(color, source, target, die)
+            if error is not None:
+                logging.warning(f"Rejected bot move {(source, target, die)} in room {room.room_id}: {error}")
+                break
+            self.play_move(room, color, source, target, die)
+            if rules.winner() is not None:
+                return
+        self.advance_turn(room)
+
+    def play_move(self, room, color, source, target, die, trace=None):
+        """
+        Applies a validated move, shares it with the room and ends the game if it was won.
+
+        Parameters:
+            room (Room): The room the move is played in.
+            color (str): The color of the moving player.
+            source (int): The point the checker leaves, or BAR, from white's point of view.
+            target (int): The point the checker lands on, or OFF, from white's point of view.
+            die (int): The die used.
+            trace (tuple, optional): The trace sent with the move. Defaults to None.
+        """
+        changes = room.rules.apply_move(color, source, target, die)
+        self.moves.inc()
+        room.moves += 1
+        self.record(room, MOVE, color, source, target, die)
+        started = time.monotonic_ns()
+        self.broadcast_state_delta(room, changes, trace=trace)
+        if self.tracer is not None:
+            self.tracer.span(trace, "broadcast", started)
+        if room.rules.winner() is not None:
+            self.end_game(room)
+
+    def stats(self):
+        """
+        Collects the load of the server.
+
+        Returns:
+            dict: The number of active rooms, connected clients, held seats and moves applied so far.
+        """
+        return {
+            "rooms": len(self.rooms),
+            "clients": sum(len(room.players) + len(room.spectators) for room in self.rooms.values()),
+            "held_seats": sum(len(room.held_seats) for room in self.rooms.values()),
+            "moves": self.moves.value
+        }
+
+    def send_game_state(self, room, conn):
+        """
+        Sends a full snapshot of the game state of a room to one of its players.
+
+        Parameters:
+            room (Room): The room whose state is sent.
+            conn (Connection): The player to send the snapshot to.
+        """
+        conn.send(room.game_state.snapshot_message(room.seat_colors.get(conn, "white")))
+
+    def send_to_spectators(self, room, message):
+        """
+        Queues the same encoded message for every spectator of a room.
+
+        A spectator with more than SPECTATOR_LAG_LIMIT messages waiting is caught up with the
+        cached snapshot of the room instead, so a slow watcher never holds up the others.
+
+        Parameters:
+            room (Room): The room whose spectators receive the message.
+            message (bytes): The framed message, from white's point of view.
+        """
+        for conn in room.spectators:
+            if len(conn.outbound) >= SPECTATOR_LAG_LIMIT:
+                conn.catch_up(room.game_state.snapshot_message("white"))
+            else:
+                conn.send(message)
+
+    def watch_room(self, room, conn, room_id):
+        """
+        Turns a connection into a spectator of another room.
+
+        The connection gives up its seat, or stops watching its previous room, and receives
+        the cached snapshot of the watched room from white's point of view.
+
+        Parameters:
+            room (Room): The room the connection is currently in.
+            conn (Connection): The connection that asked to watch.
+            room_id (int): The id of the room to watch.
+
+        Returns:
+            Room: The room the connection is now in.
+        """
+        target = self.rooms.get(room_id)
+        if target is None:
+            logging.warning(f"Client {conn.addr} asked to watch unknown room {room_id}.")
+            return room
+        self.close_room_seat(room, conn)
+        self.add_spectator(target, conn)
+        return target
+
+    def add_spectator(self, room, conn):
+        """
+        Adds a spectator to a room and sends it the cached snapshot from white's point of view.
+
+        Parameters:
+            room (Room): The room to watch.
+            conn (Connection or Route): The spectator.
+        """
+        room.spectators.add(conn)
+        conn.send(SPECTATOR_MESSAGE + room.game_state.snapshot_message("white"))
+        logging.info(f"Client {conn.addr} is watching room {room.room_id} ({len(room.spectators)} spectators)")
+
+    def broadcast_state_delta(self, room, changes, exclude_conn=None, trace=None):
+        """
+        Sends the latest change of the game state of a room to its players.
+
+        Only the changed slots are sent, each player receiving them from its own point of view.
+        The delta is encoded once per point of view and the same bytes are queued for every
+        player sharing it; spectators share white's.
+
+        Parameters:
+            room (Room): The room whose state changed.
+            changes (list of tuple): The (slot, value) pairs that changed, from white's point of view.
+            exclude_conn (Connection, optional): The player to skip, typically the one
+                                                 who initiated the change. Defaults to None.
+            trace (tuple, optional): The trace of the move that caused the change, passed on
+                                     with a new timestamp. Defaults to None.
+        """
+        started = time.perf_counter()
+        if trace is not None:
+            trace = new_trace(trace[0])
+        messages = {}
+        for conn in room.players:
+            if conn is exclude_conn:
+                continue
+            color = room.seat_colors[conn]
+            if color not in messages:
+                messages[color] = self.delta_message(room, color, changes, trace)
+            conn.send(messages[color])
+        if room.spectators:
+            if "white" not in messages:
+                messages["white"] = self.delta_message(room, "white", changes, trace)
+            self.send_to_spectators(room, messages["white"])
+        self.broadcast_time.observe(time.perf_counter() - started)
+
+    def delta_message(self, room, color, changes, trace):
+        """
+        Encodes the delta of the latest change of a room for one point of view.
+
+        Parameters:
+            room (Room): The room whose state changed.
+            color (str): The point of view, "white" or "black".
+            changes (list of tuple): The (slot, value) pairs that changed, from white's point of view.
+            trace (tuple or None): The trace to send with the delta.
+
+        Returns:
+            bytes: The framed state delta.
+        """
+        data = room.game_state.delta(color, changes)
+        if trace is not None:
+            data["trace"] = trace
+        return encode_message({"type": "state_delta", "data": data})
+
+    def notify_turn(self, room):
+        """
+        Notifies the players of a room about whose turn it is.
+
+        Parameters:
+            room (Room): The room whose players are notified.
+        """
+        for conn in room.players:
+            conn.send(TURN_MESSAGES[room.seat_colors[conn] == room.rules.turn_color])
+
+    def broadcast_dice(self, room):
+        """
+        Sends the dice rolled in a room to its players.
+
+        Parameters:
+            room (Room): The room in which the dice were rolled.
+        """
+        message = encode_message({"type": "dice", "data": room.rules.dice})
+        for conn in room.players:
+            conn.send(message)
+        self.send_to_spectators(room, message)
+
+    def send_correction(self, room, conn):
+        """
+        Resynchronizes a player whose request was rejected.
+
+        Sends the player's turn status, a snapshot of the board and, if it is the player's turn,
+        the dice left to play, undoing whatever the client applied on its own.
+
+        Parameters:
+            room (Room): The room the player is seated in.
+            conn (Connection): The player to resynchronize.
+        """
+        color = room.seat_colors[conn]
+        messages = [
+            {"type": "turn", "data": color == room.rules.turn_color},
+            {"type": "game_state", "data": room.game_state.snapshot(color)}
+        ]
+        if color == room.rules.turn_color and room.rules.has_rolled:
+            messages.append({"type": "dice", "data": room.rules.dice})
+        conn.send(encode_messages(messages))
+
+    def new_session_token(self):
+        """
+        Draws the session token of a new seat.
+
+        Returns:
+            bytes: SESSION_TOKEN_SIZE random bytes.
+        """
+        return secrets.token_bytes(SESSION_TOKEN_SIZE)
+
+    def seat_player(self, room, conn):
+        """
+        Seats a new player in a room and greets it.
+
+        The player receives its color, a new session token, its turn status and a snapshot
+        of the game. The game starts as soon as every seat is taken.
+
+        Parameters:
+            room (Room): The room to seat the player in.
+            conn (Connection or Route): The new player.
+        """
+        color = room.add_player(conn)
+        if conn.name is not None:
+            room.names[color] = conn.name
+        token = self.new_session_token()
+        room.tokens[conn] = token
+        self.sessions[token] = room
+        if room.is_full() and room.started_at is None:
+            self.start_game(room)
+        conn.send(encode_messages([
+            {"type": "color", "data": color},
+            {"type": "session", "data": token},
+            {"type": "turn", "data": color == room.rules.turn_color},
+            {"type": "game_state", "data": room.game_state.snapshot(color)}
+        ]))
+        logging.info(f"Client connected: {conn.addr} assigned color: {color} in room {room.room_id}")
+
+    def join_room(self, conn, routes):
+        """
+        Seats a connection in one more game, over a new route.
+
+        The route is paired like a new connection, in the oldest room waiting for an
+        opponent that the connection is not in yet, or queued for matchmaking.
+
+        Parameters:
+            conn (Connection): The connection that asked to join.
+            routes (dict): The routes of the connection, as (room, route) pairs keyed by room id.
+        """
+        if self.match_queue is not None:
+            self.enqueue(conn, routes)
+            return
+        room = self.assign_room(conn=conn)
+        route = Route(conn, room.room_id)
+        routes[room.room_id] = (room, route)
+        self.seat_player(room, route)
+
+    def handle_routed_request(self, conn, routes, request):
+        """
+        Processes a request a connection sent for one of its routes.
+
+        A routed watch or resume request opens a route to the room it names, as a spectator
+        or in the held seat, without affecting the other games of the connection. A leave
+        request closes a route, giving up its seat for good. Any other request is handled
+        as if the route were a connection of its own.
+
+        Parameters:
+            conn (Connection): The connection that sent the request.
+            routes (dict): The routes of the connection, as (room, route) pairs keyed by room id.
+            request (dict): The deserialized request, with its 'room' key.
+        """
+        request_type = request["type"]
+        if request_type == "watch":
+            target = self.rooms.get(request["data"])
+            if target is None or target.room_id in routes:
+                logging.warning(f"Client {conn.addr} cannot watch room {request['data']}.")
+                return
+            route = Route(conn, target.room_id)
+            routes[target.room_id] = (target, route)
+            self.add_spectator(target, route)
+            return
+        if request_type == "resume":
+            token = request["data"]
+            target = self.sessions.get(token)
+            if target is None or token not in target.held_seats or target.room_id in routes:
+                logging.info(f"Client {conn.addr} could not resume: unknown or expired session.")
+                return
+            route = Route(conn, target.room_id)
+            routes[target.room_id] = (target, route)
+            self.restore_seat(target, route, token)
+            return
+        if request["room"] not in routes:
+            logging.debug(f"Ignored {request_type} request from {conn.addr} for room {request['room']}")
+            return
+        if request_type == "leave":
+            room, route = routes.pop(request["room"])
+            self.close_room_seat(room, route)
+            return
+        room, route = routes[request["room"]]
+        self.handle_request(room, route, request)
+
+    def claims_room(self, request):
+        """
+        Checks if the first request of a new connection takes it to a room of its own choice.
+
+        Parameters:
+            request (dict): The deserialized request.
+
+        Returns:
+            bool: True if the request resumes a held seat or watches an existing room, without
+                  a room id, False otherwise.
+        """
+        if "room" in request:
+            return False
+        if request["type"] == "resume":
+            target = self.sessions.get(request["data"])
+            return target is not None and request["data"] in target.held_seats
+        return request["type"] == "watch" and request["data"] in self.rooms
+
+    def handle_lobby_request(self, conn, request):
+        """
+        Processes a request from a connection waiting in the lobby, with matchmaking on, or
+        from a new connection whose first request claims a room without matchmaking.
+
+        A queue request puts the connection in the matchmaking queue, and a play_bot request
+        seats it right away in a new room against a bot. Watch and resume requests take it
+        out of the queue to watch a room or take back a held seat; a connection that cannot
+        resume is closed, as it has no game to fall back on.
+
+        Parameters:
+            conn (Connection): The connection that sent the request.
+            request (dict): The deserialized request.
+        """
+        request_type = request["type"]
+        if request_type == "ping":
+            conn.send(PONG_MESSAGE)
+        elif request_type == "queue":
+            if not any(ticket.player[1] is None for ticket in conn.tickets):
+                self.enqueue(conn)
+        elif request_type == "play_bot":
+            if self.bot_workers <= 0:
+                logging.debug(f"Refused a bot to client {conn.addr} in the lobby.")
+                return
+            self.dequeue(conn)
+            conn.room = self.create_room(next(self.room_ids))
+            self.seat_player(conn.room, conn)
+            self.seat_bot(conn.room, conn)
+        elif request_type == "watch":
+            target = self.rooms.get(request["data"])
+            if target is None:
+                logging.warning(f"Client {conn.addr} asked to watch unknown room {request['data']}.")
+                return
+            self.dequeue(conn)
+            conn.room = target
+            self.add_spectator(target, conn)
+        elif request_type == "resume":
+            token = request["data"]
+            target = self.sessions.get(token)
+            if target is None or token not in target.held_seats:
+                logging.info(f"Client {conn.addr} could not resume: unknown or expired session.")
+                conn.close()
+                return
+            self.dequeue(conn)
+            conn.room = target
+            self.restore_seat(target, conn, token)
+        else:
+            logging.debug(f"Ignored {request_type} request from {conn.addr} in the lobby")
+
+    def handle_request(self, room, conn, request):
+        """
+        Processes a single request received from a player.
+
+        Parameters:
+            room (Room): The room the player is seated in.
+            conn (Connection or Route): The player who sent the request.
+            request (dict): The deserialized request.
+        """
+        request_type = request["type"]
+        if request_type == "resync":
+            self.send_game_state(room, conn)
+            return
+        if request_type == "ping":
+            conn.send(PONG_MESSAGE)
+            return
+        if request_type == "pong":
+            return
+        color = room.seat_colors.get(conn)
+        if color is None:
+            logging.debug(f"Ignored {request_type} request from spectator {conn.addr}")
+            return
+        rules = room.rules
+        if request_type == "name":
+            room.names[color] = player_name(request["data"])
+        elif request_type == "play_bot":
+            self.seat_bot(room, conn)
+        elif request_type == "roll":
+            if color != rules.turn_color or rules.has_rolled or rules.winner() is not None:
+                self.send_correction(room, conn)
+                return
+            rules.roll()
+            self.record(room, ROLL, color, *rules.dice[:2])
+            self.broadcast_dice(room)
+        elif request_type == "move":
+            move = request["data"]
+            started = time.monotonic_ns()
+            source = to_board_point(color, move["from"])
+            target = to_board_point(color, move["to"])
+            if source is None or target is None:
+                error = "unknown point"
+            else:
+                error = rules.validate_move(color, source, target, move["die"])
+            if self.tracer is not None:
+                self.tracer.span(move.get("trace"), "validate", started)
+            if error is not None:
+                logging.debug(f"Rejected move {move} in room {room.room_id}: {error}")
+                self.send_correction(room, conn)
+                return
+            self.play_move(room, color, source, target, move["die"], move.get("trace"))
+        elif request_type == "turn_end":
+            if color != rules.turn_color or not rules.has_rolled or rules.has_legal_move(color):
+                self.send_correction(room, conn)
+                return
+            self.advance_turn(room)
+
+    async def client_handler(self, protocol, room_id=None):
+        """
+        Handles communication with a connected client.
+
+        Seats the client in a room, or with matchmaking on has it wait in the lobby, then
+        receives its requests until it disconnects. Without matchmaking and without a room
+        chosen by a supervisor, the client is seated when its first request other than its
+        name arrives, unless that request resumes a held seat or watches a room: a client
+        reconnecting would otherwise fill a stranger's room and start its game and clock.
+        Unrouted requests concern that room; a join request seats the client in one more
+        game, and routed requests are dispatched to the route of their room. When the client
+        disconnects, it leaves the matchmaking queue and the seats of all its rooms are held.
+        The time taken to decode and handle each request is observed per request type.
+
+        Parameters:
+            protocol (FrameProtocol): The protocol of the client's transport.
+            room_id (int, optional): The room chosen for the client by a supervisor. Defaults to None.
+        """
+        conn = Connection(protocol, metrics=self.metrics)
+        self.clients[conn] = asyncio.current_task()
+        self.connections.inc()
+        conn.heartbeat = self.timer_wheel.schedule(self.ping_interval, self.check_heartbeat, conn)
+        addr = conn.addr
+        routes = {}
+        if room_id is not None:
+            conn.room = self.assign_room(room_id)
+            self.seat_player(conn.room, conn)
+        pending = room_id is None and self.match_queue is None
+        try:
+            while True:
+                size = await protocol.receive()
+                if not size:
+                    logging.info(f"No data received. Client {addr} may have disconnected.")
+                    break
+                conn.last_seen = time.monotonic()
+                self.bytes_in.inc(size)
+                for payload in protocol.decoder:
+                    started = time.perf_counter()
+                    received = time.monotonic_ns()
+                    request = decode_message(payload)
+                    if self.tracer is not None and request["type"] == "move":
+                        trace = request["data"].get("trace")
+                        self.tracer.wire(trace, received)
+                        self.tracer.span(trace, "receive", received)
+                    logging.debug(f"Received request from {addr}: {request}")
+                    if request["type"] == "name" and "room" not in request:
+                        self.rename(conn, request["data"])
+                    if pending and request["type"] != "name":
+                        pending = False
+                        if not self.claims_room(request):
+                            conn.room = self.assign_room()
+                            self.seat_player(conn.room, conn)
+                    if "room" in request:
+                        self.handle_routed_request(conn, routes, request)
+                    elif request["type"] == "join":
+                        self.join_room(conn, routes)
+                    elif conn.room is None:
+                        self.handle_lobby_request(conn, request)
+                    elif request["type"] == "watch":
+                        conn.room = self.watch_room(conn.room, conn, request["data"])
+                    elif request["type"] == "resume":
+                        conn.room = self.resume_session(conn.room, conn, request["data"])
+                    else:
+                        self.handle_request(conn.room, conn, request)
+                    self.metrics.histogram(f"handle_seconds_{request['type']}").observe(
+                        time.perf_counter() - started)
+        except Exception as e:
+            logging.error(f"Error with client {addr}: {e}")
+        finally:
+            logging.info(f"Client {addr} disconnected.")
+            self.timer_wheel.cancel(conn.heartbeat)
+            if conn.tickets:
+                self.dequeue(conn, routes)
+            if conn.room is not None:
+                self.hold_seat(conn.room, conn)
+            for route_room, route in routes.values():
+                self.hold_seat(route_room, route)
+            conn.close()
+            del self.clients[conn]
+            self.connections.dec()
+
+    async def serve(self):
+        """
+        Starts listening for connections and serves them until cancelled.
+        """
+        raise_open_file_limit()
+        self.start_timers()
+        self.server = await asyncio.get_running_loop().create_server(
+            lambda: FrameProtocol(self.client_handler), self.host, self.port, backlog=LISTEN_BACKLOG)
+        self.start_monitoring()
+        logging.info(f"Async server started on {self.host}:{self.port}")
+        await self.server.serve_forever()
+
+    async def shutdown(self):
+        """
+        Stops the server in order: stops listening, closes the connections and waits for their
+        handlers to hold their seats, closes the journals on the journal thread and waits for
+        it, then stops the bot processes.
+        """
+        if self.timers_task is not None:
+            self.timers_task.cancel()
+        if self.server is not None:
+            self.server.close()
+        if self.stats_server is not None:
+            self.stats_server.shutdown()
+        for conn in self.clients:
+            conn.close()
+        if self.clients:
+            await asyncio.wait(list(self.clients.values()), timeout=SHUTDOWN_TIMEOUT)
+        if self.journal_executor is not None:
+            for room in self.rooms.values():
+                if room.journal is not None:
+                    self.journal_executor.submit(room.journal.close)
+            self.journal_executor.shutdown()
+        if self.bot_pool is not None:
+            self.bot_pool.shutdown(cancel_futures=True)
+
+    async def run(self):
+        """
+        Serves until SIGTERM is received or the task is cancelled, then shuts the server down.
+        """
+        loop = asyncio.get_running_loop()
+        stopped = asyncio.Event()
+        loop.add_signal_handler(signal.SIGTERM, stopped.set)
+        serve_task = asyncio.create_task(self.serve())
+        stop_task = asyncio.create_task(stopped.wait())
+        try:
+            await asyncio.wait((serve_task, stop_task), return_when=asyncio.FIRST_COMPLETED)
+            if serve_task.done():
+                serve_task.result()
+            logging.info("Server stopped.")
+        finally:
+            loop.remove_signal_handler(signal.SIGTERM)
+            stop_task.cancel()
+            await self.shutdown()
+            serve_task.cancel()
+            await asyncio.gather(serve_task, return_exceptions=True)
+
+    def start(self):
+        """
+        Starts the Game Server on a new event loop and blocks until it is stopped.
+
+        Stopping the server with SIGTERM or Ctrl-C also closes the journals, stops the bot
+        processes and writes the pending results.
+        """
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            logging.info("Server stopped.")
+        finally:
+            if self.results is not None:
+                self.results.close()
+            if self.tracer is not None:
+                self.tracer.close()
+
+
+def add_server_options(parser):
+    """
+    Adds the command line options shared by the asyncio and the sharded servers.
+
+    Parameters:
+        parser (argparse.ArgumentParser): The parser to extend.
+    """
+    parser.add_argument("--host", default="127.0.0.1", help="The IP address to bind the server.")
+    parser.add_argument("--port", type=int, default=12345, help="The port number to bind the server.")
+    parser.add_argument("--grace-period", type=float, default=SEAT_GRACE_PERIOD,
+                        help="The seconds the seat of a disconnected player is held for it to resume.")
+    parser.add_argument("--ping-interval", type=float, default=PING_INTERVAL,
+                        help="The seconds of silence after which a client is pinged.")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT,
+                        help="The seconds of silence after which a client is disconnected.")
+    parser.add_argument("--turn-clock", choices=("off",) + CLOCK_MODES, default=DEFAULT_TURN_CLOCK["mode"],
+                        help="A fixed budget per turn, or a fischer bank with an increment per turn.")
+    parser.add_argument("--turn-time", type=float, default=DEFAULT_TURN_CLOCK["budget"],
+                        help="The seconds per turn, or the initial bank of each player in fischer mode.")
+    parser.add_argument("--turn-increment", type=float, default=DEFAULT_TURN_CLOCK["increment"],
+                        help="The seconds added to a player's bank after each turn in fischer mode.")
+    parser.add_argument("--on-timeout", choices=TIMEOUT_ACTIONS, default=DEFAULT_TURN_CLOCK["on_timeout"],
+                        help="What happens to a player who runs out of time.")
+    parser.add_argument("--journal-dir", default=JOURNAL_DIR,
+                        help="The directory the journal of every game is written to.")
+    parser.add_argument("--no-journal", action="store_true", help="Do not keep game journals.")
+    parser.add_argument("--results-db", default=RESULTS_DB,
+                        help="The SQLite database the game results and player ratings are stored in.")
+    parser.add_argument("--no-results", action="store_true", help="Do not store game results.")
+    parser.add_argument("--bot-workers", type=int, default=BOT_WORKERS,
+                        help="The number of processes computing the moves of bots, or 0 to refuse bots.")
+    parser.add_argument("--stats-port", type=int, default=None,
+                        help="The port of the HTTP endpoint serving the metrics at /stats and /stats.json.")
+    parser.add_argument("--stats-interval", type=float, default=STATS_LOG_INTERVAL,
+                        help="The seconds between two logs of the metrics, or 0 to never log them.")
+    parser.add_argument("--trace-file", default=None,
+                        help="The file the server appends the spans of traced moves to.")
+    parser.add_argument("--matchmaking", action="store_true",
+                        help="Have clients queue in a lobby and pair them by rating instead of by arrival.")
+
+
+def server_options(args):
+    """
+    Converts the parsed shared command line options into AsyncGameServer keyword arguments.
+
+    Parameters:
+        args (argparse.Namespace): The parsed options.
+
+    Returns:
+        dict: The keyword arguments, without the host and port.
+    """
+    turn_clock = None
+    if args.turn_clock != "off":
+        turn_clock = {"mode": args.turn_clock, "budget": args.turn_time,
+                      "increment": args.turn_increment, "on_timeout": args.on_timeout}
+    return {
+        "grace_period": args.grace_period,
+        "ping_interval": args.ping_interval,
+        "idle_timeout": args.idle_timeout,
+        "turn_clock": turn_clock,
+        "journal_dir": None if args.no_journal else args.journal_dir,
+        "results_db": None if args.no_results else args.results_db,
+        "bot_workers": args.bot_workers,
+        "stats_port": args.stats_port,
+        "stats_interval": args.stats_interval,
+        "trace_file": args.trace_file,
+        "matchmaking": args.matchmaking
+    }
+
+
+def main():
+    """
+    The entry point of the asyncio Game Server.
+
+    Parses the command line options and starts the server.
+    """
+    parser = argparse.ArgumentParser(description="Asyncio Backgammon server hosting many games at once.")
+    add_server_options(parser)
+    args = parser.parse_args()
+    AsyncGameServer(args.host, args.port, **server_options(args)).start()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import random
+import time
+
+from matchmaking import MATCH_INTERVAL, MatchQueue
+
+QUEUED_PLAYERS = 50000
+ARRIVALS_PER_TICK = 50
+TICKS = 2000
+NARROW_WINDOW = 0.01
+
+
+def percentile(sorted_values, fraction):
+    """
+    Picks a percentile from sorted values.
+
+    Parameters:
+        sorted_values (list of float): The values, in ascending order.
+        fraction (float): The percentile, between 0 and 1.
+
+    Returns:
+        float: The value below which `fraction` of the values fall.
+    """
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run_ticks(queue, now, rng, label):
+    """
+    Runs TICKS ticks of MATCH_INTERVAL simulated seconds with ARRIVALS_PER_TICK new players
+    each and prints the p50, p99 and max time of a tick.
+
+    Parameters:
+        queue (MatchQueue): The queue, reading its time from `now`.
+        now (list of float): The simulated clock of the queue.
+        rng (random.Random): The generator of the ratings.
+        label (str): The name of the run.
+    """
+    ticks = []
+    paired = 0
+    waiting = 0
+    for _ in range(TICKS):
+        now[0] += MATCH_INTERVAL
+        for _ in range(ARRIVALS_PER_TICK):
+            queue.add(None, rng.gauss(1500.0, 300.0))
+        waiting += len(queue)
+        started = time.perf_counter()
+        paired += len(queue.match())
+        ticks.append(time.perf_counter() - started)
+    ticks.sort()
+    print(f"{label}: p50 {percentile(ticks, 0.5) * 1e6:.1f} us, p99 {percentile(ticks, 0.99) * 1e6:.1f} us, "
+          f"max {ticks[-1] * 1e6:.1f} us, {paired} pairs, {waiting // TICKS} waiting on average")
+
+
+def main():
+    """
+    Times the matchmaking queue with QUEUED_PLAYERS players waiting.
+
+    Fills the queue and drains the pairs that are ready at once, then runs steady ticks.
+    The same ticks are then run on a crowded queue, whose windows are so narrow and never
+    widen that nearly all of the QUEUED_PLAYERS players keep waiting.
+    """
+    rng = random.Random(1)
+    now = [0.0]
+    queue = MatchQueue(clock=lambda: now[0])
+
+    started = time.perf_counter()
+    for player in range(QUEUED_PLAYERS):
+        queue.add(player, rng.gauss(1500.0, 300.0))
+    added = time.perf_counter() - started
+    print(f"add: {added / QUEUED_PLAYERS * 1e6:.2f} us per player, {QUEUED_PLAYERS} players")
+
+    started = time.perf_counter()
+    pairs = queue.match()
+    print(f"first tick: {(time.perf_counter() - started) * 1000:.2f} ms, {len(pairs)} pairs, {len(queue)} left")
+
+    run_ticks(queue, now, rng, "steady ticks")
+
+    crowded = MatchQueue(NARROW_WINDOW, 0.0, clock=lambda: now[0])
+    for player in range(QUEUED_PLAYERS):
+        crowded.add(player, rng.gauss(1500.0, 300.0))
+    crowded.match()
+    run_ticks(crowded, now, rng, "crowded ticks")
+
+
+if __name__ == "__main__":
+    main()
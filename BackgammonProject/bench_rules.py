@@ -0,0 +1,207 @@
+import random
+import time
+import timeit
+
+from bot import random_moves
+from rules import BAR, BEAR_OFF_MASKS, COLORS, HOME_POINTS, OFF, SIGNS, TARGETS, Game, Position, to_board_point
+from state_codec import BAR_BLACK, BAR_WHITE, POINT_COUNT
+
+GAMES = 100
+SEED = 1
+LOOKUP_ROUNDS = 2000
+
+
+def arithmetic_target(color, point, die):
+    """
+    Computes the destination of a move with index arithmetic, the way the client used to.
+
+    Parameters:
+        color (str): The color of the moving player.
+        point (int): The point the checker leaves, or BAR.
+        die (int): The die value used.
+
+    Returns:
+        int: The destination point, or OFF if the move leaves the board.
+    """
+    if point == BAR:
+        return POINT_COUNT - die if color == "white" else die - 1
+    target = point - die if color == "white" else point + die
+    return target if 0 <= target < POINT_COUNT else OFF
+
+
+def loop_can_bear_off(state, color):
+    """
+    Checks if a color may bear off by walking the points, the way the client used to.
+
+    Parameters:
+        state (array): The decoded state, from white's point of view.
+        color (str): The color to check.
+
+    Returns:
+        bool: True if no checker of the color is on the bar or outside its home board.
+    """
+    sign = SIGNS[color]
+    home = HOME_POINTS[color]
+    bar = state[BAR_WHITE] if color == "white" else state[BAR_BLACK]
+    return bar == 0 and sum(state[i] * sign for i in range(POINT_COUNT) if i not in home and state[i] * sign > 0) == 0
+
+
+def check_plays(rolls):
+    """
+    Replays every play listed by legal_plays through Game.validate_move, the check the
+    servers make, and compares where it ends with the position listed alongside.
+
+    Parameters:
+        rolls (list of tuple): The (position, color, dice) to expand.
+
+    Returns:
+        int: The number of plays checked.
+
+    Raises:
+        AssertionError: If a play is rejected or ends on another position.
+    """
+    checked = 0
+    for position, color, dice in rolls:
+        for moves, expected in position.legal_plays(color, dice):
+            game = Game(position)
+            game.turn_color = color
+            game.dice = list(dice)
+            game.has_rolled = True
+            for move in moves:
+                reason = game.validate_move(color, *move)
+                assert reason is None, f"{color} {dice} {moves} rejected on {list(position.state)}: {reason}"
+                game.apply_move(color, *move)
+            assert game.position == expected, f"{color} {dice} {moves} does not reach the listed position"
+            checked += 1
+    return checked
+
+
+def time_masks(rolls):
+    """
+    Times the checks answered by the occupancy masks of a position.
+
+    Parameters:
+        rolls (list of tuple): The (position, color, dice) to check.
+    """
+    checks = {
+        "can_bear_off, masks": lambda position, color: position.can_bear_off(color),
+        "can_bear_off, loop": lambda position, color: loop_can_bear_off(position.state, color),
+        "prime_length": lambda position, color: position.prime_length(color),
+        "home_points_made": lambda position, color: position.home_points_made(color),
+    }
+    for label, check in checks.items():
+        started = time.perf_counter()
+        for position, color, _ in rolls:
+            check(position, color)
+        report(label, time.perf_counter() - started, len(rolls))
+
+
+def time_lookups():
+    """
+    Times a lookup in each move table against the arithmetic it replaces.
+
+    Every (color, point, die) triple is looked up LOOKUP_ROUNDS times; the time of the
+    same loop doing nothing is subtracted, so the figures are the cost of one lookup.
+    """
+    triples = [(color, point, die) for color in COLORS for point in range(POINT_COUNT + 1) for die in range(1, 7)]
+    position = Position()
+    lookups = {
+        "empty loop": lambda: [None for color, point, die in triples],
+        "TARGETS lookup": lambda: [TARGETS[color][point][die] for color, point, die in triples],
+        "arithmetic target": lambda: [arithmetic_target(color, point, die) for color, point, die in triples],
+        "BEAR_OFF_MASKS lookup": lambda: [BEAR_OFF_MASKS[color][point][die] for color, point, die in triples],
+        "to_board_point": lambda: [to_board_point(color, point) for color, point, die in triples],
+        "Position.target_for": lambda: [position.target_for(color, point, die) for color, point, die in triples],
+    }
+    count = len(triples) * LOOKUP_ROUNDS
+    baseline = None
+    for label, lookup in lookups.items():
+        seconds = timeit.timeit(lookup, number=LOOKUP_ROUNDS)
+        if baseline is None:
+            baseline = seconds
+            continue
+        print(f"{label:<28} {(seconds - baseline) / count * 1e9:8.1f} ns/lookup")
+
+
+def sample_rolls(games, rng):
+    """
+    Collects the positions and rolls of games played with random legal moves.
+
+    Parameters:
+        games (int): The number of games to play.
+        rng (random.Random): The generator of the dice and of the moves.
+
+    Returns:
+        list of tuple: The (position, color, dice) of every turn of every game.
+    """
+    rolls = []
+    for _ in range(games):
+        game = Game(rng=rng)
+        while game.winner() is None:
+            color = game.turn_color
+            dice = game.roll()
+            rolls.append((game.position, color, dice))
+            for move in random_moves(game.position.to_bytes(), color, dice, rng):
+                game.apply_move(color, *move)
+            game.end_turn()
+    return rolls
+
+
+def report(label, seconds, count, extra=""):
+    """
+    Prints the average time of one benchmarked operation.
+
+    Parameters:
+        label (str): The name of the operation.
+        seconds (float): The total time spent.
+        count (int): The number of operations timed.
+        extra (str, optional): More figures to print after the timing. Defaults to "".
+    """
+    print(f"{label:<28} {seconds / count * 1e6:8.2f} us/op {count:7d} ops {extra}")
+
+
+def main():
+    """
+    Times the move tables, then the occupancy masks and the legal play generator on the
+    rolls of GAMES games of random legal moves, after checking that the servers accept
+    every play the generator lists for these rolls.
+
+    Every roll is expanded into all its legal plays, separately for doubles and for the
+    other rolls. Then every single move of every roll is checked the way the servers
+    validate moves, and the legal first moves of every roll are listed.
+
+    Expanding a roll stays around a hundred microseconds for an ordinary roll and a few
+    hundred for a double in pure Python, even though the search plays and takes back moves
+    on one array: every distinct play still needs a Position of its own, and the dozens of
+    moves walked per roll each cost a few interpreted calls. Single digit microseconds
+    would take an extension module, which the project avoids to stay on the standard library.
+    """
+    time_lookups()
+    rolls = sample_rolls(GAMES, random.Random(SEED))
+    print(f"{check_plays(rolls)} legal plays replayed through validate_move")
+    time_masks(rolls)
+    doubles = [roll for roll in rolls if len(roll[2]) == 4]
+    singles = [roll for roll in rolls if len(roll[2]) == 2]
+
+    for label, sample in (("legal_plays, other rolls", singles), ("legal_plays, doubles", doubles)):
+        plays = 0
+        started = time.perf_counter()
+        for position, color, dice in sample:
+            plays += len(position.legal_plays(color, dice))
+        report(label, time.perf_counter() - started, len(sample), f"{plays / len(sample):6.1f} plays per roll")
+
+    moves = [(position, color, dice, move) for position, color, dice in rolls
+             for move in position.single_moves(color, dice)]
+    started = time.perf_counter()
+    legal = sum(position.is_legal_move(color, dice, move) for position, color, dice, move in moves)
+    report("is_legal_move", time.perf_counter() - started, len(moves), f"{legal} legal")
+
+    started = time.perf_counter()
+    for position, color, dice in rolls:
+        position.legal_moves(color, dice)
+    report("legal_moves", time.perf_counter() - started, len(rolls))
+    print(f"{len(rolls)} rolls over {GAMES} games")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import asyncio
+import pickle
+import socket
+import time
+import timeit
+
+from client import get_board_state
+from protocol import FrameDecoder, FrameProtocol, encode_message, decode_message
+from state_codec import encode_state, decode_state
+
+ITERATIONS = 100000
+BURST_MOVES = 64
+
+
+def pickle_game_state(triangles, bar_white, bar_black, white_boreoff, black_boreoff):
+    """
+    Builds and pickles a game state message the way the server and client used to.
+
+    Parameters:
+        triangles (list of Triangle): The 24 triangles of the board.
+        bar_white (int): The number of white pieces on the bar.
+        bar_black (int): The number of black pieces on the bar.
+        white_boreoff (int): The number of white pieces borne off.
+        black_boreoff (int): The number of black pieces borne off.
+
+    Returns:
+        bytes: The pickled message.
+    """
+    game_state = {
+        "triangles": [
+            {"index": t.index, "pieces_white": t.pieces_white, "pieces_black": t.pieces_black}
+            for t in triangles
+        ],
+        "bar_white": bar_white,
+        "bar_black": bar_black,
+        "white_boreoff": white_boreoff,
+        "black_boreoff": black_boreoff
+    }
+    return pickle.dumps({"type": "game_state", "data": game_state})
+
+
+def report(label, seconds, size):
+    """
+    Prints the timing and size of one benchmarked operation.
+
+    Parameters:
+        label (str): The name of the operation.
+        seconds (float): The total time spent on ITERATIONS runs.
+        size (int): The number of bytes produced by the encoder.
+    """
+    print(f"{label:<28} {seconds / ITERATIONS * 1e6:8.2f} us/op {size:6d} bytes")
+
+
+async def time_stream_bursts(burst, bursts):
+    """
+    Times receiving and decoding bursts of moves on the event loop, the way the asyncio
+    server used to with a stream reader, then with a FrameProtocol.
+
+    Parameters:
+        burst (bytes): The frames of one burst.
+        bursts (int): The number of bursts to receive.
+
+    Returns:
+        dict: The seconds spent per receive path.
+    """
+    messages = len(burst) // len(encode_message({"type": "move", "data": {"from": 0, "to": 5, "die": 5}}))
+    timings = {}
+
+    sender, receiver = socket.socketpair()
+    reader, writer = await asyncio.open_connection(sock=receiver)
+    decoder = FrameDecoder()
+    started = time.perf_counter()
+    for _ in range(bursts):
+        sender.sendall(burst)
+        decoded = 0
+        while decoded < messages:
+            decoder.feed(await reader.read(65536))
+            for payload in decoder:
+                decode_message(payload)
+                decoded += 1
+    timings["stream read decode"] = time.perf_counter() - started
+    writer.close()
+    sender.close()
+
+    sender, receiver = socket.socketpair()
+    _, protocol = await asyncio.get_running_loop().connect_accepted_socket(FrameProtocol, receiver)
+    started = time.perf_counter()
+    for _ in range(bursts):
+        sender.sendall(burst)
+        decoded = 0
+        while decoded < messages:
+            await protocol.receive()
+            for payload in protocol.decoder:
+                decode_message(payload)
+                decoded += 1
+    timings["protocol decode"] = time.perf_counter() - started
+    protocol.close()
+    sender.close()
+    return timings
+
+
+def main():
+    """
+    Compares the pickle based game state encoding with the binary state codec.
+
+    Measures encoding and decoding of the initial position, both for the bare state and
+    for a complete framed message, then the receive path of a burst of BURST_MOVES moves
+    read from a socket, copied out by `recv` or received in place by `recv_into`, and on
+    the event loop, read from a stream or received in place by a FrameProtocol.
+    """
+    triangles = get_board_state("white")
+    counters = (1, 0, 2, 0)
+
+    pickled = pickle_game_state(triangles, *counters)
+    report("pickle encode", timeit.timeit(lambda: pickle_game_state(triangles, *counters), number=ITERATIONS),
+           len(pickled))
+    report("pickle decode", timeit.timeit(lambda: pickle.loads(pickled), number=ITERATIONS), len(pickled))
+
+    encoded = encode_state(triangles, *counters)
+    report("state codec encode", timeit.timeit(lambda: encode_state(triangles, *counters), number=ITERATIONS),
+           len(encoded))
+    report("state codec decode", timeit.timeit(lambda: decode_state(encoded), number=ITERATIONS), len(encoded))
+
+    message = {"type": "game_state", "data": {"seq": 0, "state": encoded}}
+    frame = encode_message(message)
+    decoder = FrameDecoder()
+
+    def decode_frame():
+        decoder.feed(frame)
+        for payload in decoder:
+            decode_message(payload)
+
+    report("framed message encode", timeit.timeit(lambda: encode_message(message), number=ITERATIONS), len(frame))
+    report("framed message decode", timeit.timeit(decode_frame, number=ITERATIONS), len(frame))
+
+    burst = b"".join(encode_message({"type": "move", "data": {"from": 0, "to": 5, "die": 5}})
+                     for _ in range(BURST_MOVES))
+    sender, receiver = socket.socketpair()
+
+    def receive_burst_copied():
+        sender.sendall(burst)
+        decoder.feed(receiver.recv(len(burst)))
+        for payload in decoder:
+            decode_message(payload)
+
+    def receive_burst_in_place():
+        sender.sendall(burst)
+        decoder.recv_into(receiver)
+        for payload in decoder:
+            decode_message(payload)
+
+    bursts = ITERATIONS // BURST_MOVES
+    for label, receive_burst in (("burst recv decode", receive_burst_copied),
+                                 ("burst recv_into decode", receive_burst_in_place)):
+        seconds = timeit.timeit(receive_burst, number=bursts)
+        report(label, seconds * ITERATIONS / bursts, len(burst))
+    sender.close()
+    receiver.close()
+    for label, seconds in asyncio.run(time_stream_bursts(burst, bursts)).items():
+        report(f"burst {label}", seconds * ITERATIONS / bursts, len(burst))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import random
+
+from rules import BAR, OFF, OPPONENTS, PIPS_TO_OFF, SIGNS, Game, Position
+
+BEAR_OFF_SCORE = 100
+HIT_SCORE = 50
+MAKE_POINT_SCORE = 30
+BLOT_PENALTY = 20
+
+
+def score_move(state, color, source, target, die):
+    """
+    Rates a single move for the bot, higher being better.
+
+    Bearing off comes first, then hitting a blot, making a point and leaving no blot behind;
+    ties go to the move of the checker farthest from home.
+
+    Parameters:
+        state (array.array): The board before the move, from white's point of view.
+        color (str): The color of the bot.
+        source (int): The point the checker leaves, or BAR.
+        target (int): The point the checker lands on, or OFF.
+        die (int): The die used.
+
+    Returns:
+        float: The score of the move.
+    """
+    if target == OFF:
+        return BEAR_OFF_SCORE + die
+    sign = SIGNS[color]
+    score = 0.0
+    landing = state[target] * sign
+    if landing == -1:
+        score += HIT_SCORE + PIPS_TO_OFF[OPPONENTS[color]][target] / 10
+    elif landing == 1:
+        score += MAKE_POINT_SCORE
+    elif landing == 0:
+        score -= BLOT_PENALTY
+    if source != BAR and state[source] * sign == 2:
+        score -= BLOT_PENALTY
+    distance = PIPS_TO_OFF[color][source] if source != BAR else 25
+    return score + distance / 25
+
+
+def scratch_game(state, color, dice):
+    """
+    Builds a game on a private copy of a board, with a player about to move.
+
+    Parameters:
+        state (bytes): The encoded board, from white's point of view.
+        color (str): The color to move.
+        dice (list of int): The dice to play.
+
+    Returns:
+        Game: The game, whose moves never touch the original board.
+    """
+    game = Game(Position(bytes(state)))
+    game.turn_color = color
+    game.dice = list(dice)
+    game.has_rolled = True
+    return game
+
+
+def choose_moves(state, color, dice):
+    """
+    Plays the dice of a turn for the bot, one greedy move at a time.
+
+    The moves are tried from the best rated down and the first one that starts a legal play
+    of the dice left is made, which usually settles legality with a single search.
+
+    Runs in a worker process of the server's bot pool, so it only takes and returns plain,
+    picklable values and works on its own copy of the board.
+
+    Parameters:
+        state (bytes): The encoded board, from white's point of view.
+        color (str): The color of the bot.
+        dice (list of int): The dice to play.
+
+    Returns:
+        list of tuple: The (source, target, die) moves to play in order, from white's point of view.
+    """
+    game = scratch_game(state, color, dice)
+    moves = []
+    while game.dice and game.winner() is None:
+        position = game.position
+        options = position.single_moves(color, game.dice)
+        options.sort(key=lambda move: score_move(position.state, color, *move), reverse=True)
+        best = next((move for move in options if position.is_legal_move(color, game.dice, move)), None)
+        if best is None:
+            break
+        game.apply_move(color, *best)
+        moves.append(best)
+    return moves
+
+
+def random_moves(state, color, dice, rng=random):
+    """
+    Plays the dice of a turn with moves picked at random among the legal ones.
+
+    Parameters:
+        state (bytes): The encoded board, from white's point of view.
+        color (str): The color to move.
+        dice (list of int): The dice to play.
+        rng (random.Random, optional): The generator picking the moves. Defaults to the random module.
+
+    Returns:
+        list of tuple: The (source, target, die) moves to play in order, from white's point of view.
+    """
+    game = scratch_game(state, color, dice)
+    moves = []
+    while game.dice and game.winner() is None:
+        options = game.legal_moves(color)
+        if not options:
+            break
+        move = rng.choice(options)
+        game.apply_move(color, *move)
+        moves.append(move)
+    return moves
@@ -0,0 +1,441 @@
+import argparse
+import asyncio
+import collections
+import logging
+import os
+import random
+import socket
+import time
+
+from bot import choose_moves, random_moves
+from protocol import FrameProtocol, decode_message, encode_message
+from rules import VIEW_POINTS
+from state_codec import decode_state, mirror_state
+from state_sync import apply_changes, mirror_changes
+from tracing import Tracer, new_trace
+
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+POLICIES = ("heuristic", "random")
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 12345
+
+
+def wait_for_server(host, port, timeout=10.0):
+    """
+    Waits until a server accepts connections.
+
+    Parameters:
+        host (str): The IP address of the server.
+        port (int): The port number of the server.
+        timeout (float, optional): The seconds to wait at most. Defaults to 10.0.
+
+    Raises:
+        TimeoutError: If the server does not accept a connection in time.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection((host, port), timeout=1.0).close()
+            return
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"No server is listening on {host}:{port}.")
+            time.sleep(0.05)
+
+
+class BotConnection:
+    """
+    A connection to the server shared by the games of several headless clients.
+
+    The server seats the connection in a game when it connects; the first client added to
+    the connection plays that game with unrouted messages. Every further client sends a
+    join request and plays the game the server seats it in over a route, with messages
+    carrying the room id. A reader task dispatches the messages it receives to the client
+    of their room, and answers the pings of the server itself. With a Tracer, the time the
+    deltas spent on the wire and the time taken to decode them are recorded.
+    """
+
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, tracer=None):
+        """
+        Initializes a BotConnection.
+
+        Parameters:
+            host (str, optional): The IP address of the server. Defaults to SERVER_HOST.
+            port (int, optional): The port number of the server. Defaults to SERVER_PORT.
+            tracer (Tracer, optional): Records the spans of the deltas received. Defaults to None.
+        """
+        self.host = host
+        self.port = port
+        self.tracer = tracer
+        self.protocol = None
+        self.clients = {}
+        self.joining = collections.deque()
+        self.unclaimed = []
+        self.reader_task = None
+
+    async def open(self):
+        """
+        Connects to the server and starts dispatching the messages it sends.
+        """
+        loop = asyncio.get_running_loop()
+        _, self.protocol = await loop.create_connection(FrameProtocol, self.host, self.port)
+        self.reader_task = asyncio.create_task(self.dispatch())
+
+    def add(self, client):
+        """
+        Gives a client a game on the connection.
+
+        Parameters:
+            client (BotClient): The client; it receives the messages of its room from now on.
+        """
+        if None not in self.clients:
+            self.clients[None] = client
+            for message in self.unclaimed:
+                client.inbox.put_nowait(message)
+            self.unclaimed.clear()
+            return
+        self.joining.append(client)
+        self.send({"type": "join"})
+
+    def remove(self, client):
+        """
+        Takes a client off the connection, giving up its seat if it played over a route.
+
+        Parameters:
+            client (BotClient): The client to remove.
+        """
+        if self.clients.get(client.room) is client:
+            del self.clients[client.room]
+            if client.room is not None:
+                self.send({"type": "leave", "room": client.room})
+
+    def send(self, message):
+        """
+        Sends a message to the server.
+
+        Parameters:
+            message (dict): The message to send, with a 'room' key for a routed game.
+        """
+        if not self.protocol.transport.is_closing():
+            self.protocol.write(encode_message(message))
+
+    def route(self, message):
+        """
+        Finds the client a message from the server is meant for.
+
+        A routed message for a room without a client greets the oldest client waiting for
+        the reply to its join request; the server answers them in order. Unrouted messages
+        received before the first client is added are kept for it.
+
+        Parameters:
+            message (dict): The decoded message.
+
+        Returns:
+            BotClient or None: The client of the room, or None if nobody plays it.
+        """
+        room = message.get("room")
+        client = self.clients.get(room)
+        if client is None and room is not None and message["type"] == "color" and self.joining:
+            client = self.joining.popleft()
+            client.room = room
+            self.clients[room] = client
+        elif client is None and room is None and not self.clients:
+            self.unclaimed.append(message)
+        return client
+
+    async def dispatch(self):
+        """
+        Reads the messages of the server and queues each one for the client of its room.
+
+        When the server closes the connection, every client is woken up with None.
+        """
+        try:
+            while True:
+                if not await self.protocol.receive():
+                    break
+                for payload in self.protocol.decoder:
+                    received = time.monotonic_ns()
+                    message = decode_message(payload)
+                    if message["type"] == "ping":
+                        self.send({"type": "pong"})
+                        continue
+                    if self.tracer is not None and message["type"] == "state_delta":
+                        trace = message["data"].get("trace")
+                        self.tracer.wire(trace, received)
+                        self.tracer.span(trace, "decode", received)
+                    client = self.route(message)
+                    if client is not None:
+                        client.inbox.put_nowait(message)
+        except (ConnectionError, OSError) as e:
+            logging.debug(f"Connection to the server lost: {e}")
+        finally:
+            for client in list(self.clients.values()) + list(self.joining):
+                client.inbox.put_nowait(None)
+
+    def close(self):
+        """
+        Closes the connection to the server.
+        """
+        if self.protocol is not None:
+            self.protocol.close()
+        if self.reader_task is not None:
+            self.reader_task.cancel()
+
+
+class BotClient:
+    """
+    A headless client that plays a whole game against the server.
+
+    Speaks the same protocol as the Tkinter client: it keeps a copy of the board from the
+    snapshots and deltas it receives, rolls when the server gives it the turn, and plays
+    moves chosen by the heuristic of the server's bots or at random among the legal ones.
+    The time between each request and the reply it causes (the dice for a roll, the delta
+    for a move and the turn change for the end of a turn) is recorded as a round trip.
+    With a Tracer, every move is sent with a new trace and the spans of encoding the move
+    and of applying the deltas it causes are recorded. The client opens a connection of
+    its own, or plays its game over a BotConnection shared with other clients.
+    """
+
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, policy="heuristic", name=None, rng=None,
+                 tracer=None):
+        """
+        Initializes a BotClient.
+
+        Parameters:
+            host (str, optional): The IP address of the server. Defaults to SERVER_HOST.
+            port (int, optional): The port number of the server. Defaults to SERVER_PORT.
+            policy (str, optional): "heuristic" or "random". Defaults to "heuristic".
+            name (str, optional): The player name sent to the server. Defaults to None.
+            rng (random.Random, optional): The generator used by the random policy. Defaults to a new one.
+            tracer (Tracer, optional): Records the spans of the moves. Defaults to None.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy: {policy}")
+        self.host = host
+        self.port = port
+        self.policy = policy
+        self.name = name
+        self.rng = rng or random.Random()
+        self.tracer = tracer
+        self.connection = None
+        self.owns_connection = False
+        self.room = None
+        self.inbox = asyncio.Queue()
+        self.color = None
+        self.state = None
+        self.my_turn = False
+        self.winner = None
+        self.moves = 0
+        self.round_trips = []
+
+    async def connect(self, play_bot=False, connection=None):
+        """
+        Connects to the server and waits for its seat and the initial snapshot.
+
+        The client taking the seat of the connection sends its name and either asks for a
+        bot or queues for an opponent right away, which a server with matchmaking on needs
+        before it seats the connection; other servers ignore the queue request.
+
+        Parameters:
+            play_bot (bool, optional): True to ask the server for a bot opponent. Defaults to False.
+            connection (BotConnection, optional): The connection to play over, shared with other
+                                                  clients. Defaults to a new connection.
+
+        Raises:
+            ConnectionError: If the server seats the client as a spectator.
+        """
+        if connection is None:
+            connection = BotConnection(self.host, self.port, self.tracer)
+            await connection.open()
+            self.owns_connection = True
+        self.connection = connection
+        connection.add(self)
+        seated = connection.clients.get(None) is self
+        if seated:
+            if self.name:
+                self.send({"type": "name", "data": self.name})
+            self.send({"type": "play_bot" if play_bot else "queue"})
+        while self.state is None:
+            message = await self.receive()
+            if message["type"] == "color":
+                self.color = message["data"]
+            self.handle(message)
+        if self.color not in VIEW_POINTS:
+            raise ConnectionError("The server seated the bot as a spectator.")
+        if not seated:
+            if self.name:
+                self.send({"type": "name", "data": self.name})
+            if play_bot:
+                self.send({"type": "play_bot"})
+
+    async def receive(self):
+        """
+        Waits for the next message of the game from the server.
+
+        Returns:
+            dict: The decoded message.
+
+        Raises:
+            ConnectionError: If the server closed the connection.
+        """
+        message = await self.inbox.get()
+        if message is None:
+            raise ConnectionError("The server closed the connection.")
+        return message
+
+    def send(self, message):
+        """
+        Sends a message to the server.
+
+        Parameters:
+            message (dict): The message to send.
+        """
+        if self.room is not None:
+            message["room"] = self.room
+        self.connection.send(message)
+
+    def handle(self, message):
+        """
+        Updates the copy of the game with a message from the server.
+
+        Parameters:
+            message (dict): The decoded message.
+        """
+        message_type = message["type"]
+        if message_type == "game_state":
+            state = decode_state(message["data"]["state"])
+            self.state = state if self.color == "white" else mirror_state(state)
+        elif message_type == "state_delta":
+            started = time.monotonic_ns()
+            changes = message["data"]["changes"]
+            apply_changes(self.state, changes if self.color == "white" else mirror_changes(changes))
+            if self.tracer is not None:
+                self.tracer.span(message["data"].get("trace"), "apply", started)
+        elif message_type == "turn":
+            self.my_turn = message["data"]
+        elif message_type == "game_over":
+            self.winner = message["data"]
+
+    async def request(self, message, reply_type):
+        """
+        Sends a request and handles the messages received until its reply arrives.
+
+        Parameters:
+            message (dict): The request to send.
+            reply_type (str): The type of the message answering the request.
+
+        Returns:
+            dict: The reply, or the game_over message if the game ended first.
+
+        Raises:
+            RuntimeError: If the server rejected the request and sent a correction instead.
+        """
+        started = time.perf_counter()
+        if self.tracer is not None and message["type"] == "move":
+            encoding = time.monotonic_ns()
+            message["data"]["trace"] = trace = new_trace()
+            self.send(message)
+            self.tracer.span(trace, "encode", encoding)
+        else:
+            self.send(message)
+        while True:
+            reply = await self.receive()
+            self.handle(reply)
+            if reply["type"] == "game_state":
+                raise RuntimeError(f"The server rejected the {message['type']} request.")
+            if reply["type"] == reply_type or self.winner is not None:
+                self.round_trips.append(time.perf_counter() - started)
+                return reply
+
+    async def take_turn(self):
+        """
+        Rolls, plays the dice and ends the turn.
+        """
+        reply = await self.request({"type": "roll"}, "dice")
+        if self.winner is not None:
+            return
+        if self.policy == "heuristic":
+            moves = choose_moves(self.state.tobytes(), self.color, reply["data"])
+        else:
+            moves = random_moves(self.state.tobytes(), self.color, reply["data"], self.rng)
+        view = VIEW_POINTS[self.color]
+        for source, target, die in moves:
+            await self.request({"type": "move", "data": {"from": view[source], "to": view[target], "die": die}},
+                               "state_delta")
+            self.moves += 1
+            if self.winner is not None:
+                return
+        await self.request({"type": "turn_end"}, "turn")
+
+    async def play(self):
+        """
+        Plays until the game is over.
+
+        Returns:
+            str: The winning color.
+        """
+        while self.winner is None:
+            if self.my_turn:
+                await self.take_turn()
+            else:
+                self.handle(await self.receive())
+        return self.winner
+
+    def close(self):
+        """
+        Closes the connection to the server, or leaves the game of a shared connection.
+        """
+        if self.connection is None:
+            return
+        if self.owns_connection:
+            self.connection.close()
+        else:
+            self.connection.remove(self)
+
+
+async def play_games(args):
+    """
+    Connects, plays the games over a single connection and reports their outcomes.
+
+    Parameters:
+        args (argparse.Namespace): The parsed command line options.
+    """
+    tracer = Tracer(args.trace_file, f"bot {os.getpid()}") if args.trace_file else None
+    connection = BotConnection(args.host, args.port, tracer)
+    await connection.open()
+    clients = [BotClient(args.host, args.port, args.policy, args.name, tracer=tracer) for _ in range(args.games)]
+    try:
+        for client in clients:
+            await client.connect(play_bot=args.vs_bot, connection=connection)
+            route = f" over the route to room {client.room}" if client.room is not None else ""
+            logging.info(f"Playing {client.color}{route}.")
+        winners = await asyncio.gather(*(client.play() for client in clients))
+        for client, winner in zip(clients, winners):
+            logging.info(f"{winner.capitalize()} has won after {client.moves} moves of ours.")
+    finally:
+        connection.close()
+        if tracer is not None:
+            tracer.close()
+
+
+def main():
+    """
+    The entry point of the headless bot client.
+
+    Plays one game, or several at once over the same connection.
+    """
+    parser = argparse.ArgumentParser(description="Play Backgammon games against the server without a window.")
+    parser.add_argument("--host", default=SERVER_HOST, help="The IP address of the server.")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="The port number of the server.")
+    parser.add_argument("--policy", choices=POLICIES, default="heuristic", help="How the bot picks its moves.")
+    parser.add_argument("--name", default=None, help="The player name sent to the server.")
+    parser.add_argument("--vs-bot", action="store_true", help="Ask the server for a bot opponent.")
+    parser.add_argument("--trace-file", default=None, help="The file the spans of traced moves are appended to.")
+    parser.add_argument("--games", type=int, default=1, help="The number of games played over the connection.")
+    args = parser.parse_args()
+    asyncio.run(play_games(args))
+
+
+if __name__ == "__main__":
+    main()
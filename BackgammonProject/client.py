@@ -1,10 +1,27 @@
 import tkinter as tk
+import atexit
+import os
 import random
 import socket
-import pickle
 import threading
+import time
 import logging
 
+from bot import choose_moves
+from protocol import FrameDecoder, encode_messages, decode_message
+from rules import BAR, OFF, Position, to_board_point
+from state_codec import encode_state, decode_state, mirror_state, BAR_WHITE, BAR_BLACK, WHITE_BOREOFF, BLACK_BOREOFF
+from state_sync import apply_changes
+from tracing import Tracer, new_trace
+
+BAR_POINT = BAR
+OFF_POINT = OFF
+TRIANGLE_LAYOUT = tuple((23 - index, True) if index >= 12 else (11 - index, False) for index in range(24))
+CLICKED_TRIANGLES = {
+    True: tuple(None if col == 6 else 12 + col - (col > 6) for col in range(13)),
+    False: tuple(None if col == 6 else 11 - col + (col > 6) for col in range(13)),
+}
+
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
 
 SERVER_PORT = 12345
@@ -15,8 +32,115 @@ COLOR_TAN = "#D8B98A"
 BAR_COLOR = "#444"
 USED_DICE_COLOR = "#CCCCCC"
 UNUSED_DICE_COLOR = "white"
+RECONNECT_ATTEMPTS = 5
+RECONNECT_DELAY = 2.0
+SERVER_TIMEOUT = 60.0
+PLAYER_NAME = os.environ.get("BACKGAMMON_PLAYER", "")
+TRACE_FILE = os.environ.get("BACKGAMMON_TRACE", "")
 
 client_socket = None
+frame_decoder = FrameDecoder()
+session_token = None
+room_boards = {}
+tracer = Tracer(TRACE_FILE, f"client {os.getpid()}") if TRACE_FILE else None
+if tracer is not None:
+    atexit.register(tracer.close)
+
+
+def receive_message():
+    """
+    Receives the next complete message from the server.
+
+    Frames already buffered by the decoder are returned first; the socket is only read
+    when no complete frame is left in the buffer, straight into the buffer of the decoder.
+    When tracing, the time a traced delta spent on its way from the server and the time
+    taken to decode it are recorded.
+
+    Returns:
+        dict or None: The decoded message, or None if the server closed the connection.
+    """
+    global client_socket
+    while True:
+        for payload in frame_decoder:
+            if tracer is None:
+                return decode_message(payload)
+            received = time.monotonic_ns()
+            message = decode_message(payload)
+            if message["type"] == "state_delta":
+                trace = message["data"].get("trace")
+                tracer.wire(trace, received)
+                tracer.span(trace, "decode", received)
+            return message
+        if not frame_decoder.recv_into(client_socket):
+            return None
+
+
+def wait_for_message(message_type):
+    """
+    Receives messages from the server until one of the given type, answering its pings.
+
+    Used before the server has seated this client, which may take a while when it is
+    matching players by rating.
+
+    Parameters:
+        message_type (str): The type of the awaited message.
+
+    Returns:
+        dict or None: The message, or None if the server closed the connection.
+    """
+    while True:
+        message = receive_message()
+        if message is None or message["type"] == message_type:
+            return message
+        if message["type"] == "ping":
+            send_message_to_server({"type": "pong"})
+
+
+def reconnect_to_server():
+    """
+    Reconnects to the server after the connection dropped and resumes the game.
+
+    Sends the session token received when joining, so the server gives back the seat it
+    held for this player along with a snapshot of the game, and watches the rooms of the
+    spectator windows again. A server seating every new connection greets it first and
+    answers a failed resume with the token of the new seat; a server with matchmaking on
+    closes the connection instead. Retries RECONNECT_ATTEMPTS times, waiting RECONNECT_DELAY
+    seconds before each attempt.
+
+    Returns:
+        bool: True if the game was resumed, False otherwise.
+    """
+    global client_socket, frame_decoder
+    if session_token is None:
+        return False
+    for attempt in range(1, RECONNECT_ATTEMPTS + 1):
+        time.sleep(RECONNECT_DELAY)
+        try:
+            client_socket = socket.create_connection((SERVER_HOST, SERVER_PORT), timeout=SERVER_TIMEOUT)
+            frame_decoder = FrameDecoder()
+            send_message_to_server({"type": "resume", "data": session_token})
+            greeted = False
+            response = receive_message()
+            while response is not None:
+                if response["type"] == "session" and (response["data"] == session_token or greeted):
+                    break
+                if response["type"] == "game_state":
+                    greeted = True
+                elif response["type"] == "ping":
+                    send_message_to_server({"type": "pong"})
+                response = receive_message()
+        except OSError as e:
+            logging.warning(f"Reconnection attempt {attempt} failed: {e}")
+            continue
+        if response is not None and response["type"] == "session" and response["data"] == session_token:
+            logging.info("Reconnected to the server and resumed the game.")
+            for room_id in list(room_boards):
+                send_message_to_server({"type": "watch", "data": room_id}, room=room_id)
+            return True
+        logging.error("Could not resume the game: the seat is no longer held.")
+        client_socket.close()
+        return False
+    return False
 
 
 def listen_from_server(board_app):
@@ -24,51 +148,93 @@ def listen_from_server(board_app):
     Listens for messages from the server and updates the game state accordingly.
 
     Continuously receives data from the server, deserializes it, and performs actions based on
-    the message type, such as updating the game state or handling turn changes.
+    the message type, such as updating the game state or handling turn changes. Messages
+    routed to another room update the spectator board watching it, if any. Pings are
+    answered right away; a server silent for SERVER_TIMEOUT seconds is treated as a dropped
+    connection.
 
     Parameters:
-        board_app (BackgammonBoard): The instance of the BackgammonBoard to update.
+        board_app (BackgammonBoard): The board of the game the connection was seated in.
     """
-    global client_socket
+    global client_socket, session_token
     if client_socket is None:
         logging.error("Socket is not connected.")
         return
     while True:
         try:
-            data = client_socket.recv(4096)
-            if not data:
+            response = receive_message()
+            if response is None:
+                logging.warning("Connection to the server lost.")
+                if reconnect_to_server():
+                    board_app.client_sock = client_socket
+                    continue
                 break
-            response = pickle.loads(data)
             logging.debug(f"Server response: {response}")
             response_type = response.get("type")
             data = response.get("data")
+            board = room_boards.get(response["room"]) if "room" in response else board_app
+            if board is None:
+                continue
 
             if response_type == "game_state":
-                board_app.update_game_state(data)
+                board.update_game_state(data)
+            elif response_type == "state_delta":
+                board.apply_state_delta(data)
+            elif response_type == "dice":
+                board.receive_dice(data)
             elif response_type == "turn":
-                board_app.your_turn = data
-                logging.info(f"Your turn: {board_app.your_turn}")
+                board.set_turn(data)
+            elif response_type == "game_over":
+                board.receive_game_over(data)
+            elif board is not board_app:
+                continue
+            elif response_type == "session":
+                session_token = data
+            elif response_type == "ping":
+                send_message_to_server({"type": "pong"})
+        except OSError as e:
+            logging.error(f"Connection interrupted: {e}")
+            if reconnect_to_server():
+                board_app.client_sock = client_socket
+                continue
+            break
         except Exception as e:
             logging.error(f"Connection interrupted: {e}")
             break
 
 
-def send_message_to_server(msg):
+def send_message_to_server(msg, room=None):
     """
     Sends a serialized message to the server.
 
-    Serializes the provided message using pickle and sends it through the client socket.
+    Serializes the provided message into a length-prefixed frame and sends it through the client socket.
 
     Parameters:
         msg (dict): The message to send, typically containing 'type' and 'data' keys.
+        room (int, optional): The room the message is routed to. Defaults to None, which
+                              addresses the game the connection was seated in.
+    """
+    send_messages_to_server([msg], room)
+
+
+def send_messages_to_server(messages, room=None):
+    """
+    Sends a batch of serialized messages to the server with a single `sendall`.
+
+    Parameters:
+        messages (list of dict): The messages to send, in order.
+        room (int, optional): The room the messages are routed to. Defaults to None, which
+                              addresses the game the connection was seated in.
     """
     global client_socket
     if client_socket is None:
         logging.error("Socket is not connected.")
         return
+    if room is not None:
+        messages = [dict(msg, room=room) for msg in messages]
 
     try:
-        client_socket.send(pickle.dumps(msg))
+        client_socket.sendall(encode_messages(messages))
     except Exception as e:
         logging.error(f"Error sending message: {e}")
 
@@ -134,28 +300,6 @@ def get_triangle_coords(index, segment_width, width, height, is_top):
         return [x_left, height, x_right, height, (x_left + x_right) / 2, height / 2]
 
 
-def calculate_target_index(start_index, distance, for_ai):
-    """
-    Calculates the target index based on the start index and distance.
-
-    Adjusts the target index calculation based on whether the move is for the AI.
-
-    Parameters:
-        start_index (int): The starting index of the move (0-23).
-        distance (int): The distance to move.
-        for_ai (bool): True if the move is for the AI, False otherwise.
-
-    Returns:
-        int or None: The target index after moving, or None if out of bounds.
-    """
-    if for_ai:
-        start_index = 23 - start_index
-    target = start_index - distance
-    if 0 <= target < 24:
-        return 23 - target if for_ai else target
-    return None
-
-
 def get_triangle_index_and_orientation(index):
     """
     Determines the triangle index and its orientation (top or bottom).
@@ -166,16 +310,15 @@ def get_triangle_index_and_orientation(index):
     Returns:
         tuple: A tuple containing the adjusted index and a boolean indicating if it's on the top.
     """
-    if index >= 12:
-        return 23 - index, True
-    return 11 - index, False
+    return TRIANGLE_LAYOUT[index]
 
 
 class Triangle:
     """
     Represents a triangle on the Backgammon board.
 
-    Each triangle can hold a number of white and black pieces and can be highlighted for possible moves.
+    Each triangle shows a number of white and black pieces, copied from the position of the
+    board, and can be highlighted for possible moves.
     """
 
     def __init__(self, index):
@@ -192,45 +335,6 @@ class Triangle:
         self.pieces_black = 0
         self.highlight_color = None
 
-    def add_piece(self, color):
-        """
-        Adds a piece of the specified color to the triangle.
-
-        Parameters:
-            color (str): The color of the piece ("white" or "black").
-        """
-        if color == 'white':
-            self.pieces_white += 1
-        else:
-            self.pieces_black += 1
-
-    def remove_piece(self, color):
-        """
-        Removes a piece of the specified color from the triangle.
-
-        Parameters:
-            color (str): The color of the piece to remove ("white" or "black").
-        """
-        if color == 'white' and self.pieces_white > 0:
-            self.pieces_white -= 1
-        elif color == 'black' and self.pieces_black > 0:
-            self.pieces_black -= 1
-
-    def can_move(self, color):
-        """
-        Determines if a piece of the specified color can move from this triangle.
-
-        A move is possible if the opponent has fewer than two pieces on this triangle.
-
-        Parameters:
-            color (str): The color of the player ("white" or "black").
-
-        Returns:
-            bool: True if a move is possible, False otherwise.
-        """
-        opponent_count = self.pieces_black if color == 'white' else self.pieces_white
-        return opponent_count < 2
-
 
 class Dice:
     """
@@ -274,6 +378,35 @@ class Dice:
         self.has_rolled = True
         logging.info(f"Dice rolled: {self.rolls}")
 
+    def set_rolls(self, rolls):
+        """
+        Sets the dice of the current turn from a roll made by the server.
+
+        Parameters:
+            rolls (list of int): The dice to play, four times the same value for doubles.
+        """
+        self.rolls = list(rolls)
+        self.initial_roll_order = self.rolls.copy()
+        self.used_rolls = []
+        self.moves_used = 0
+        self.has_rolled = True
+        logging.info(f"Dice rolled: {self.rolls}")
+
+    def restore_rolls(self, remaining):
+        """
+        Restores the dice left to play after the server rejected a move.
+
+        Parameters:
+            remaining (list of int): The dice the server still considers unused.
+        """
+        used = list(self.initial_roll_order)
+        for die in remaining:
+            if die in used:
+                used.remove(die)
+        self.rolls = list(remaining)
+        self.used_rolls = used
+        self.moves_used = len(used)
+
     def reset_roll(self):
         """
         Resets the dice to their initial unrolled state.
@@ -286,6 +419,28 @@ class Dice:
         self.initial_roll_order = []
         self.moves_used = 0
 
+    def dice_for_distance(self, distance):
+        """
+        Finds the dice that `use_distance` would use for a distance, without using them.
+
+        Parameters:
+            distance (int): The distance to be covered by a piece.
+
+        Returns:
+            list of int: The die values covering the distance, or an empty list if none do.
+        """
+        if distance in self.rolls:
+            return [distance]
+        if self.rolls and len(set(self.rolls)) == 1:
+            face = self.rolls[0]
+            if distance % face == 0 and distance // face <= len(self.rolls):
+                return [face] * (distance // face)
+        for i, first in enumerate(self.rolls):
+            for second in self.rolls[i + 1:]:
+                if first + second == distance:
+                    return [first, second]
+        return []
+
     def use_distance(self, distance):
         """
         Marks a distance as used based on the current rolls.
@@ -462,11 +617,13 @@ class BackgammonBoard:
     and communication with the server for networked gameplay.
     """
 
-    def __init__(self, parent, player_color="white", networked=False, client_sock=None):
+    def __init__(self, parent, player_color="white", networked=False, client_sock=None, spectator=False,
+                 room=None):
         """
         Initializes a BackgammonBoard instance.
 
-        Sets up the board state, canvas, UI elements, and network thread if applicable.
+        Sets up the board state, canvas, UI elements, and network thread if applicable. A board
+        watching another room is updated by the network thread of the connection it shares.
 
         Parameters:
             parent (tk.Frame): The parent Tkinter frame.
@@ -476,12 +633,20 @@ class BackgammonBoard:
                                         False for local play against AI. Defaults to False.
             client_sock (socket.socket, optional): The client socket for networked play.
                                                    Defaults to None.
+            spectator (bool, optional): True to watch a networked game without playing.
+                                        Defaults to False.
+            room (int, optional): The room watched over a route of the connection. Defaults
+                                  to None, the game the connection was seated in.
         """
         self.parent = parent
+        self.room = room
+        self.spectator = spectator
         self.player_color = player_color
         self.networked = networked
         self.client_sock = client_sock
         self.triangles = get_board_state(player_color)
+        self.position = Position()
+        self.move_options = {}
         self.dice = Dice()
 
         self.bar_white = 0
@@ -518,33 +683,148 @@ class BackgammonBoard:
         self.current_player_color = player_color
         self.ai_color = "black" if self.current_player_color == "white" else "white"
 
-        self.your_turn = True if self.current_player_color == "white" else False
+        self.your_turn = self.current_player_color == "white" and not spectator
         self.network_thread = None
 
-        if self.networked and self.client_sock:
+        self.synced_state = decode_state(encode_state(self.triangles, self.bar_white, self.bar_black,
+                                                      self.white_boreoff, self.black_boreoff))
+        self.state_seq = 0
+        self.awaiting_snapshot = False
+        self.game_ended = False
+        self.clicked_at = None
+
+        if self.networked and room is not None:
+            room_boards[room] = self
+        elif self.networked and self.client_sock:
             self.network_thread = threading.Thread(target=listen_from_server, args=(self,),
                                                    daemon=True)
             self.network_thread.start()
 
-    def update_game_state(self, game_state):
+    def update_game_state(self, snapshot):
         """
-        Updates the game state based on data received from the server.
+        Updates the game state based on a full snapshot received from the server.
 
-        Synchronizes the local game state with the server-provided state.
+        Synchronizes the local game state with the server-provided state and adopts its
+        sequence number, so the following deltas can be applied on top of it.
 
         Parameters:
-            game_state (dict): A dictionary containing the updated game state,
-                               including triangles, bar counts, and boreoff counts.
-        """
-        for triangle_data in game_state["triangles"]:
-            index = triangle_data["index"]
-            self.triangles[index].pieces_white = triangle_data["pieces_white"]
-            self.triangles[index].pieces_black = triangle_data["pieces_black"]
-
-        self.bar_white = game_state["bar_white"]
-        self.bar_black = game_state["bar_black"]
-        self.white_boreoff = game_state["white_boreoff"]
-        self.black_boreoff = game_state["black_boreoff"]
+            snapshot (dict): The sequence number ('seq') and the decoded game state ('state').
+        """
+        self.synced_state = snapshot["state"]
+        self.state_seq = snapshot["seq"]
+        self.awaiting_snapshot = False
+        self.load_state(self.synced_state)
+
+    def apply_state_delta(self, delta):
+        """
+        Applies a state delta received from the server.
+
+        Deltas that are older than the local state are ignored. If a delta skips a sequence
+        number, the local state can no longer be patched and a full snapshot is requested.
+
+        Parameters:
+            delta (dict): The sequence number ('seq') and the changed (slot, value) pairs ('changes').
+        """
+        if delta["seq"] <= self.state_seq:
+            return
+        if delta["seq"] != self.state_seq + 1:
+            if not self.awaiting_snapshot:
+                logging.warning(f"Missed state updates ({self.state_seq} -> {delta['seq']}). Requesting snapshot.")
+                self.awaiting_snapshot = True
+                send_message_to_server({"type": "resync"}, room=self.room)
+            return
+        apply_changes(self.synced_state, delta["changes"])
+        self.state_seq = delta["seq"]
+        if not self.your_turn:
+            started = time.monotonic_ns()
+            self.load_state(self.synced_state)
+            if tracer is not None:
+                tracer.span(delta.get("trace"), "redraw", started)
+
+    def set_turn(self, your_turn):
+        """
+        Applies the turn status sent by the server.
+
+        If the turn is taken away while dice are still being played, for instance because
+        the turn clock ran out, the remaining dice are discarded.
+
+        Parameters:
+            your_turn (bool): True if it is this player's turn.
+        """
+        if self.your_turn and not your_turn and self.dice.has_rolled:
+            logging.info("The server ended your turn.")
+            self.dice.reset_roll()
+            self.bore_off_button.config(state=tk.DISABLED)
+            self.canvas.delete("all")
+            self.draw_board(self.canvas.winfo_width(), self.canvas.winfo_height())
+        self.your_turn = your_turn
+        logging.info(f"Your turn: {self.your_turn}")
+
+    def receive_game_over(self, winner):
+        """
+        Ends the game announced by the server, whether it was won on the board or by forfeit.
+
+        Parameters:
+            winner (str): The color of the winner.
+        """
+        if self.game_ended:
+            return
+        logging.info(f"{winner.capitalize()} has won!")
+        self.end_game()
+
+    def receive_dice(self, rolls):
+        """
+        Handles the dice sent by the server.
+
+        The first dice of a turn start it; dice received after a roll correct the local
+        dice after the server rejected a move.
+
+        Parameters:
+            rolls (list of int): The dice rolled, or left to play, for the current turn.
+        """
+        if not self.your_turn:
+            return
+        if self.dice.has_rolled:
+            self.dice.restore_rolls(rolls)
+            self.canvas.delete("all")
+            self.draw_board(self.canvas.winfo_width(), self.canvas.winfo_height())
+            return
+        self.dice.set_rolls(rolls)
+        self.start_rolled_turn()
+
+    def load_state(self, game_state):
+        """
+        Replaces the position of the board with a decoded game state and redraws it.
+
+        Parameters:
+            game_state (array): The decoded game state from this player's point of view,
+                                holding one signed count per triangle (positive for white,
+                                negative for black) followed by the bar and boreoff counts.
+        """
+        state = game_state if self.player_color == "white" else mirror_state(game_state)
+        self.position = Position(state)
+        self.show_position(game_state)
+
+    def show_position(self, game_state=None):
+        """
+        Copies the position onto the triangles and counters and redraws the board.
+
+        Parameters:
+            game_state (array, optional): The position already seen from this player's point
+                                          of view. Defaults to None, which converts it.
+        """
+        if game_state is None:
+            state = self.position.state
+            game_state = state if self.player_color == "white" else mirror_state(state)
+        for triangle in self.triangles:
+            count = game_state[triangle.index]
+            triangle.pieces_white = count if count > 0 else 0
+            triangle.pieces_black = -count if count < 0 else 0
+
+        self.bar_white = game_state[BAR_WHITE]
+        self.bar_black = game_state[BAR_BLACK]
+        self.white_boreoff = game_state[WHITE_BOREOFF]
+        self.black_boreoff = game_state[BLACK_BOREOFF]
         self.update_counters()
 
         self.canvas.delete("all")
@@ -563,104 +843,65 @@ class BackgammonBoard:
         """
         Handles the bore-off action for the current player.
 
-        Attempts to bear off pieces based on the current dice rolls. If successful,
-        updates the game state and checks for the end of the turn or game.
+        Bears off the selected checker if it can leave the board, or else the checker that
+        the highest die bears off, then checks for the end of the turn.
         """
+        self.clicked_at = time.monotonic_ns()
         color = self.current_player_color
-        home_indices = range(0, 6)
-
-        for roll in sorted(self.dice.rolls, reverse=True):
-            for index in reversed(home_indices):
-                triangle = self.triangles[index]
-                if ((color == 'white' and triangle.pieces_white > 0) or
-                    (color == 'black' and triangle.pieces_black > 0)) and index - roll <= -1:
-                    self.bore_off(triangle, color, roll)
-                    self.canvas.delete("all")
-                    self.draw_board(self.canvas.winfo_width(), self.canvas.winfo_height())
-                    self.check_end_of_turn()
-                    return
-        logging.info("No valid pieces to bear off with the current dice.")
+        hops = self.move_options.get(OFF_POINT)
+        if hops is None:
+            moves = [move for move in self.position.legal_moves(color, self.dice.rolls) if move[1] == OFF]
+            if moves:
+                source, _, die = max(moves, key=lambda move: move[2])
+                hops = [(self.view_point(source), OFF_POINT, die)]
+        if not hops:
+            logging.info("No valid pieces to bear off with the current dice.")
+            return
+        self.play_hops(color, hops)
+        self.reset_highlights()
+        self.selected_triangle = None
+        self.bore_off_button.config(state=tk.DISABLED)
+        if self.game_ended:
+            return
+        self.canvas.delete("all")
+        self.draw_board(self.canvas.winfo_width(), self.canvas.winfo_height())
+        self.check_end_of_turn()
 
-    def bore_off(self, triangle, color, dice_value):
+    def view_point(self, point):
         """
-        Bores off a piece from the board.
+        Converts a point between the view of the board and white's point of view.
 
-        Removes a piece from the specified triangle, updates the bore-off count,
-        uses the corresponding dice value, and checks for game end conditions.
+        The board is drawn from this player's point of view, moving towards triangle 0, while
+        the position is kept from white's; the conversion is its own inverse.
 
         Parameters:
-            triangle (Triangle): The triangle from which to bore off a piece.
-            color (str): The color of the player performing the bore-off ("white" or "black").
-            dice_value (int): The dice value used to perform the bore-off.
-        """
-        triangle.remove_piece(color)
-        if color == 'white':
-            self.white_boreoff += 1
-        else:
-            self.black_boreoff += 1
+            point (int): The point to convert (OFF, 0-23 or BAR).
 
-        self.update_counters()
-        self.dice.use_distance(dice_value)
-        self.send_game_state()
-        self.bore_off_button.config(state=tk.DISABLED)
-        self.check_game_end()
+        Returns:
+            int: The converted point.
+        """
+        return to_board_point(self.player_color, point)
 
-    def move_piece(self, start_index, target_index):
+    def play_hops(self, color, hops):
         """
-        Moves a piece from start_index to target_index.
+        Plays moves on the position, uses their dice and shows the result.
 
-        Handles capturing opponent pieces if present and updates the game state accordingly.
+        The moves of this player are sent to the server in networked games.
 
         Parameters:
-            start_index (int): The index of the triangle from which to move a piece.
-            target_index (int): The index of the triangle to which to move the piece.
+            color (str): The color of the moving player ("white" or "black").
+            hops (list of tuple): The (from, to, die) moves, from the board's point of view,
+                                  with 24 for the bar and -1 for bearing off.
         """
         if not self.your_turn and self.networked is True:
             logging.warning("Not your turn!")
             return
-        start_triangle = self.triangles[start_index]
-        target_triangle = self.triangles[target_index]
-        distance_used = abs(start_index - target_index)
-
-        if self.current_player_color == 'white' and target_triangle.pieces_black == 1:
-            target_triangle.remove_piece('black')
-            self.bar_black += 1
-        elif self.current_player_color == 'black' and target_triangle.pieces_white == 1:
-            target_triangle.remove_piece('white')
-            self.bar_white += 1
-
-        start_triangle.remove_piece(self.current_player_color)
-        target_triangle.add_piece(self.current_player_color)
-
-        self.dice.use_distance(distance_used)
-        self.send_game_state()
-
-    def reenter_piece(self, color, target_index):
-        """
-        Reenters a piece from the bar onto the board.
-
-        Handles capturing opponent pieces if necessary and updates the bar counts.
-
-        Parameters:
-            color (str): The color of the player reentering a piece ("white" or "black").
-            target_index (int): The index of the triangle where the piece will reenter.
-        """
-        triangle = self.triangles[target_index]
-        opponent_color = 'white' if color == 'black' else 'black'
-        if opponent_color == 'white' and triangle.pieces_white == 1:
-            triangle.remove_piece('white')
-            self.bar_white += 1
-        elif opponent_color == 'black' and triangle.pieces_black == 1:
-            triangle.remove_piece('black')
-            self.bar_black += 1
-
-        triangle.add_piece(color)
-        if color == 'white':
-            self.bar_white -= 1
-        else:
-            self.bar_black -= 1
-
-        self.send_game_state()
+        self.send_moves(hops)
+        for source, target, die in hops:
+            self.position, _ = self.position.apply_move(color, self.view_point(source), self.view_point(target), die)
+            self.dice.use_distance(die)
+        self.show_position()
+        self.check_game_end()
 
     def roll_dice(self):
         """
@@ -676,22 +917,34 @@ class BackgammonBoard:
             logging.info("It's AI's turn; you can't roll.")
             return
         if not self.dice.has_rolled:
-            self.dice.roll()
-            if not self.has_valid_moves(self.current_player_color):
-                logging.info(f"No valid moves for {self.current_player_color}. Passing turn.")
-                self.dice.reset_roll()
-                self.switch_player()
+            if self.networked is True:
+                send_message_to_server({"type": "roll"})
                 return
-
-            if ((self.current_player_color == 'white' and self.bar_white > 0) or
-                    (self.current_player_color == 'black' and self.bar_black > 0)):
-                logging.info("Player has pieces on the bar. Highlighting reentry options.")
-                self.highlight_bar_reentry_options()
-
-            self.canvas.delete("all")
-            self.draw_board(self.canvas.winfo_width(), self.canvas.winfo_height())
+            self.dice.roll()
+            self.start_rolled_turn()
         else:
             logging.info("Already rolled")
+            self.check_end_of_turn()
+
+    def start_rolled_turn(self):
+        """
+        Starts playing the dice that were just rolled.
+
+        Passes the turn if no move is possible, highlights reentry options if pieces
+        are on the bar, and updates the game board accordingly.
+        """
+        if not self.has_valid_moves(self.current_player_color):
+            logging.info(f"No valid moves for {self.current_player_color}. Passing turn.")
+            self.dice.reset_roll()
+            self.switch_player()
+            return
+
+        if self.position.on_bar(self.current_player_color) > 0:
+            logging.info("Player has pieces on the bar. Highlighting reentry options.")
+            self.highlight_bar_reentry_options()
+
+        self.canvas.delete("all")
+        self.draw_board(self.canvas.winfo_width(), self.canvas.winfo_height())
         self.check_end_of_turn()
 
     def switch_player(self):
@@ -710,6 +963,7 @@ class BackgammonBoard:
 
         if self.current_player_color == self.ai_color and self.networked is False:
             self.ai_move()
+            return
 
         self.bore_off_button.config(state=tk.DISABLED)
         self.canvas.delete("all")
@@ -717,9 +971,7 @@ class BackgammonBoard:
 
     def has_valid_moves(self, color):
         """
-        Checks if the current player has any valid moves.
-
-        Evaluates all possible moves based on the current dice rolls and board state.
+        Checks if a player can use any of the dice left.
 
         Parameters:
             color (str): The color of the player to check ("white" or "black").
@@ -727,67 +979,7 @@ class BackgammonBoard:
         Returns:
             bool: True if there are valid moves available, False otherwise.
         """
-        if not self.dice.rolls:
-            return False
-
-        if (color == 'white' and self.bar_white > 0) or (color == 'black' and self.bar_black > 0):
-            for roll in self.dice.rolls:
-                reentry_index = self.get_reentry_index(is_ai=(color == self.ai_color), dice_value=roll)
-                if reentry_index is not None:
-                    logging.debug(f"Valid reentry move found for {color} with roll {roll}")
-                    return True
-            logging.debug(f"No valid reentry moves for {color}")
-            return False
-
-        for start_index, triangle in enumerate(self.triangles):
-            piece_count = triangle.pieces_white if color == 'white' else triangle.pieces_black
-            if piece_count > 0:
-                for roll in self.dice.rolls:
-                    for_ai = (color == self.ai_color)
-                    target_index = calculate_target_index(start_index, roll, for_ai=for_ai)
-                    if target_index is not None and self.triangles[target_index].can_move(color):
-                        return True
-                    if self.check_bearing_off(is_ai=for_ai):
-                        return True
-        return False
-
-    def check_bearing_off(self, is_ai):
-        """
-        Checks if the player can bear off their pieces.
-
-        Evaluates whether all pieces are in the home zone and no pieces are on the bar
-        to determine if bearing off is possible.
-
-        Parameters:
-            is_ai (bool): True if checking for AI, False for human player.
-
-        Returns:
-            bool: True if bearing off is possible, False otherwise.
-        """
-        home_indices = range(0, 6) if not is_ai else range(18, 24)
-        current_color = self.current_player_color if not is_ai else self.ai_color
-
-        pieces_boredoff = self.white_boreoff if current_color == "white" else self.black_boreoff
-        pieces_on_bar = self.bar_white if current_color == "white" else self.bar_black
-
-        pieces_in_home_zone = sum(
-            self.triangles[i].pieces_white if current_color == "white"
-            else self.triangles[i].pieces_black
-            for i in home_indices
-        )
-
-        pieces_outside_home_zone = sum(
-            self.triangles[i].pieces_white if current_color == "white"
-            else self.triangles[i].pieces_black
-            for i in range(24) if i not in home_indices
-        )
-
-        total_pieces = pieces_boredoff + pieces_on_bar + pieces_in_home_zone + pieces_outside_home_zone
-
-        if total_pieces != 15 or pieces_outside_home_zone > 0:
-            return False
-
-        return True
+        return self.position.has_legal_move(color, self.dice.rolls)
 
     def check_end_of_turn(self):
         """
@@ -795,6 +987,8 @@ class BackgammonBoard:
 
         If there are no remaining dice or no valid moves, it resets the dice and switches the turn.
         """
+        if self.game_ended:
+            return
         if not self.dice.rolls or not self.has_valid_moves(self.current_player_color):
             logging.info(f"{self.current_player_color.capitalize()} has no dice left. Switching turn.")
             self.dice.reset_roll()
@@ -806,11 +1000,9 @@ class BackgammonBoard:
 
         Determines if either player has borne off all their pieces and ends the game if so.
         """
-        if self.white_boreoff == 15:
-            logging.info("White has won!")
-            self.end_game()
-        elif self.black_boreoff == 15:
-            logging.info("Black has won!")
+        winner = self.position.winner()
+        if winner is not None:
+            logging.info(f"{winner.capitalize()} has won!")
             self.end_game()
 
     def end_game(self):
@@ -820,158 +1012,32 @@ class BackgammonBoard:
         Clears the canvas and terminates the Tkinter main loop.
         """
         logging.info("Game over!")
+        self.game_ended = True
         self.canvas.delete("all")
         self.parent.destroy()
 
     def ai_move(self):
         """
-        Handles the AI's move logic.
+        Plays the turn of the local AI.
 
-        Automates the AI's decision-making process to perform valid moves based on dice rolls,
-        including reentry from the bar and bearing off.
+        Rolls the dice and plays the moves chosen by the same heuristic as the server's bots,
+        then passes the turn back.
         """
         if self.current_player_color != self.ai_color:
             return
-
         if not self.dice.has_rolled:
             self.dice.roll()
             logging.info(f"AI rolled: {self.dice.rolls}")
-
-            if not self.has_valid_moves(self.current_player_color):
-                logging.info(f"No valid moves for {self.current_player_color}. Passing turn.")
-                self.dice.reset_roll()
-                self.switch_player()
-                return
-
-        move_made = False
-
-        while (self.ai_color == 'white' and self.bar_white > 0) or \
-                (self.ai_color == 'black' and self.bar_black > 0):
-            used_any = self.ai_reentry()
-            if used_any:
-                move_made = True
-            else:
-                logging.info("AI passing turn.")
-                break
-
-        if (self.ai_color == 'white' and self.bar_white > 0) or \
-                (self.ai_color == 'black' and self.bar_black > 0):
-            logging.info("AI still has pieces on the bar but no reentry moves. Passing turn.")
-            self.dice.reset_roll()
-            self.switch_player()
-            return
-
-        self.ai_bear_off()
-
-        if ((self.ai_color == 'white' and self.bar_white == 0) or
-            (self.ai_color == 'black' and self.bar_black == 0)) and self.dice.rolls:
-
-            while self.dice.rolls:
-                for roll in self.dice.rolls[:]:
-                    start_index = self.find_ai_start_for_roll(roll)
-                    if start_index is not None:
-                        target_index = calculate_target_index(start_index, roll, for_ai=True)
-                        if target_index is not None and self.triangles[target_index].can_move(self.ai_color):
-                            self.move_piece(start_index, target_index)
-                            move_made = True
-                            if not self.has_valid_moves(self.ai_color):
-                                logging.info(f"No valid moves for {self.ai_color} after a move. Ending turn.")
-                                self.dice.reset_roll()
-                                self.switch_player()
-                                return
-                else:
-                    break
-
-        if not self.dice.rolls or not move_made:
-            logging.info("AI has no valid moves or finished its dice. Passing turn.")
-        self.check_end_of_turn()
-
-    def ai_bear_off(self):
-        """
-        Handles the AI's bearing off logic.
-
-        If the AI can bear off, it attempts to remove pieces from the home zone based on dice rolls.
-        """
-        color = self.ai_color
-        if not self.check_bearing_off(is_ai=True):
+        moves = choose_moves(self.position.to_bytes(), self.ai_color, self.dice.rolls)
+        if moves:
+            self.play_hops(self.ai_color, [(self.view_point(source), self.view_point(target), die)
+                                           for source, target, die in moves])
+        else:
+            logging.info(f"No valid moves for {self.ai_color}. Passing turn.")
+        if self.game_ended:
             return
-
-        home_indices = range(18, 24)
-        while self.dice.rolls:
-            used_any_die = False
-            for roll in sorted(self.dice.rolls, reverse=True):
-                piece_borne_off = False
-
-                for index in home_indices:
-                    piece_count = (self.triangles[index].pieces_white if color == 'white'
-                                   else self.triangles[index].pieces_black)
-                    if piece_count > 0:
-                        target_index = index + roll
-                        if target_index == 24:
-                            self.bore_off(self.triangles[index], color, roll)
-                            piece_borne_off = True
-                            break
-                        elif target_index > 24:
-                            pieces_beyond = sum(
-                                self.triangles[i].pieces_white if color == 'white'
-                                else self.triangles[i].pieces_black
-                                for i in home_indices if i < index
-                            )
-                            if pieces_beyond == 0:
-                                self.bore_off(self.triangles[index], color, roll)
-                                piece_borne_off = True
-                                break
-
-                if piece_borne_off:
-                    used_any_die = True
-                    break
-            if not used_any_die:
-                break
-
-        self.canvas.delete("all")
-        self.draw_board(self.canvas.winfo_width(), self.canvas.winfo_height())
-
-    def find_ai_start_for_roll(self, roll):
-        """
-        Finds a starting index for the AI to make a move based on the roll.
-
-        Searches for a valid starting triangle that can move based on the current roll.
-
-        Parameters:
-            roll (int): The dice value being considered for the move.
-
-        Returns:
-            int or None: The index of the triangle to move from, or None if no valid move found.
-        """
-        for index, triangle in enumerate(self.triangles):
-            count = triangle.pieces_white if self.ai_color == 'white' else triangle.pieces_black
-            if count > 0:
-                target_index = calculate_target_index(index, roll, for_ai=True)
-                if target_index is not None and self.triangles[target_index].can_move(self.ai_color):
-                    return index
-        return None
-
-    def ai_reentry(self):
-        """
-        Handles the AI's reentry from the bar.
-
-        Attempts to reenter pieces from the bar based on available dice rolls.
-
-        Returns:
-            bool: True if a reentry move was made, False otherwise.
-        """
-        used_any_die = False
-
-        for roll in self.dice.rolls[:]:
-            target_index = self.get_reentry_index(is_ai=True, dice_value=roll)
-            if target_index is not None:
-                self.reenter_piece(self.ai_color, target_index)
-                self.dice.use_distance(roll)
-                used_any_die = True
-                if (self.ai_color == 'white' and self.bar_white == 0) or (
-                        self.ai_color == 'black' and self.bar_black == 0):
-                    break
-        return used_any_die
+        self.dice.reset_roll()
+        self.switch_player()
 
     def on_resize(self, event):
         """
@@ -995,79 +1061,57 @@ class BackgammonBoard:
         Parameters:
             event (tk.Event): The event object containing click coordinates.
         """
+        self.clicked_at = time.monotonic_ns()
         if not self.your_turn and self.networked is True:
             logging.warning("Not your turn!")
             return
         if not self.segment_width:
             return
 
-        if self.current_player_color == self.ai_color:
+        color = self.current_player_color
+        if color == self.ai_color:
             return
 
-        if ((self.current_player_color == 'white' and self.bar_white > 0) or
-                (self.current_player_color == 'black' and self.bar_black > 0)):
-
+        if self.position.on_bar(color) > 0:
             clicked_index = self.get_triangle_index_by_click(event.x, event.y)
             if clicked_index is not None and self.triangles[clicked_index].highlight_color == 'green':
-                self.reenter_piece(self.current_player_color, clicked_index)
-                distance_used = self.reentry_distance_for_index(clicked_index)
-                if distance_used is not None:
-                    self.dice.use_distance(distance_used)
-                if self.dice.rolls:
-                    if not ((self.current_player_color == 'white' and self.bar_white > 0) or
-                            (self.current_player_color == 'black' and self.bar_black > 0)):
-                        self.reset_highlights()
-                    else:
-                        self.highlight_bar_reentry_options()
+                die = next(die for die in set(self.dice.rolls) if self.entry_index(color, die) == clicked_index)
+                self.play_hops(color, [(BAR_POINT, clicked_index, die)])
+                if self.game_ended:
+                    return
+                if self.dice.rolls and self.position.on_bar(color) > 0:
+                    self.highlight_bar_reentry_options()
                 else:
-                    logging.info(f"{self.current_player_color.capitalize()} cannot make more moves. Passing turn.")
+                    self.reset_highlights()
                     self.check_end_of_turn()
                 self.canvas.delete("all")
                 self.draw_board(self.canvas.winfo_width(), self.canvas.winfo_height())
-
             else:
-                if not self.dice.rolls:
-                    possible = any(
-                        self.get_reentry_index(is_ai=False, dice_value=roll) is not None
-                        for roll in self.dice.rolls
-                    )
-                    if not possible:
-                        logging.info(f"{self.current_player_color.capitalize()} cannot reenter. Passing turn.")
-                        self.check_end_of_turn()
+                logging.info("Pieces on the bar must reenter first.")
             return
 
-        segment_width = self.segment_width
-        height = self.canvas.winfo_height()
-        is_top_row = event.y < height / 2
-
-        col = int(event.x // segment_width)
-        if col == 6:
+        index = self.get_triangle_index_by_click(event.x, event.y)
+        if index is None:
             logging.info("Clicked on the bar")
             return
-        col = col if col < 6 else col - 1
-
-        if is_top_row:
-            index = col + 12
-        else:
-            index = 11 - col
 
         logging.info(f"Clicked on triangle {index}")
 
         if self.selected_triangle is None:
-            triangle = self.triangles[index]
-            has_pieces = (triangle.pieces_white if self.current_player_color == "white" else triangle.pieces_black)
-            if has_pieces > 0:
+            if self.position.checkers(color, self.view_point(index)) > 0:
                 self.selected_triangle = index
                 self.highlight_possible_moves(index)
             else:
                 logging.info("No pieces to select here.")
         else:
             if 0 <= index < 24 and self.triangles[index].highlight_color == "green":
-                self.move_piece(self.selected_triangle, index)
+                self.play_hops(color, self.move_options[index])
+                if self.game_ended:
+                    return
                 self.reset_highlights()
                 self.selected_triangle = None
-                if not self.dice.rolls or not self.has_valid_moves(self.current_player_color):
-                    logging.info(f"{self.current_player_color.capitalize()} has no dice left. Passing turn.")
+                if not self.dice.rolls or not self.has_valid_moves(color):
+                    logging.info(f"{color.capitalize()} has no dice left. Passing turn.")
                     self.check_end_of_turn()
             else:
                 logging.info("Invalid move")
@@ -1093,64 +1137,67 @@ class BackgammonBoard:
         if not self.segment_width:
             return None
         col = int(x // self.segment_width)
-        if col == 6:
-            return None
-        col = col if col < 6 else col - 1
+        row = CLICKED_TRIANGLES[y < self.canvas.winfo_height() / 2]
+        return row[col] if 0 <= col < len(row) else None
 
-        height = self.canvas.winfo_height()
-        is_top_row = y < height / 2
-
-        index = col + 12 if is_top_row else 11 - col
-
-        return index if 0 <= index < 24 else None
-
-    def reentry_distance_for_index(self, target_index):
+    def entry_index(self, color, die):
         """
-        Determines the distance used for reentry based on the target index.
-
-        Calculates the corresponding dice value needed to reenter a piece at the specified index.
+        Finds the triangle a checker of the bar enters on with a die.
 
         Parameters:
-            target_index (int): The index of the triangle where the piece will reenter.
+            color (str): The color of the checker ("white" or "black").
+            die (int): The die value used.
 
         Returns:
-            int or None: The distance (dice value) used for reentry, or None if invalid.
+            int or None: The index of the triangle, from the board's point of view, or None
+                         if the entry point is blocked or entering with that die would
+                         leave playable dice unused.
         """
-        dist = 24 - target_index
-        if 18 <= target_index <= 23 and dist in self.dice.rolls:
-            return dist
+        for source, target, legal_die in self.position.legal_moves(color, self.dice.rolls):
+            if source == BAR and legal_die == die:
+                return self.view_point(target)
         return None
 
-    def get_reentry_index(self, is_ai, dice_value):
+    def reachable_targets(self, color, start_index):
         """
-        Gets the reentry index based on dice value and player type.
+        Finds every triangle a checker can reach with one or more of the dice left.
 
-        Determines the appropriate triangle index for reentry based on the dice roll
-        and whether the player is AI or human.
+        A move using several dice is only offered if each of its hops starts a legal play
+        of the dice left, and is played one hop per die.
 
         Parameters:
-            is_ai (bool): True if the player is AI, False otherwise.
-            dice_value (int): The dice value being used for reentry.
+            color (str): The color of the moving player ("white" or "black").
+            start_index (int): The index of the triangle the checker leaves.
 
         Returns:
-            int or None: The target triangle index for reentry, or None if invalid.
+            dict: The (from, to, die) hops reaching every target, keyed by its index from the
+                  board's point of view, -1 for bearing off.
         """
-        if is_ai:
-            reentry_index = dice_value - 1
-            if 0 <= reentry_index <= 5 and self.triangles[reentry_index].can_move(self.ai_color):
-                return reentry_index
-        else:
-            reentry_index = 24 - dice_value
-            if 18 <= reentry_index <= 23 and self.triangles[reentry_index].can_move(self.current_player_color):
-                return reentry_index
-        return None
+        options = {}
+
+        def explore(position, source, dice, hops):
+            for move_source, target, die in position.legal_moves(color, dice):
+                if move_source != source:
+                    continue
+                view_target = self.view_point(target)
+                path = hops + [(self.view_point(source), view_target, die)]
+                if view_target not in options or len(path) < len(options[view_target]):
+                    options[view_target] = path
+                if target != OFF and len(dice) > 1:
+                    after, _ = position.apply_move(color, source, target, die)
+                    remaining = list(dice)
+                    remaining.remove(die)
+                    explore(after, target, remaining, path)
+
+        explore(self.position, self.view_point(start_index), self.dice.rolls, [])
+        return options
 
     def highlight_possible_moves(self, start_index):
         """
         Highlights possible moves from the selected triangle.
 
-        Evaluates all potential moves based on current dice rolls and updates the UI
-        to indicate valid target triangles.
+        Marks every triangle the selected checker can reach with the dice left, and enables
+        the bore-off button if it can leave the board.
 
         Parameters:
             start_index (int): The index of the selected triangle.
@@ -1161,46 +1208,17 @@ class BackgammonBoard:
             logging.info("No dice left to use.")
             return
 
-        dice_values = sorted(self.dice.rolls)
-        possible_moves = list(dice_values)
-
-        if len(dice_values) >= 2:
-            combined_move = dice_values[0] + dice_values[1]
-            if self.is_combined_move_partially_valid(start_index, dice_values[:2]):
-                possible_moves.append(combined_move)
-
-        if len(set(dice_values)) == 1:
-            face = dice_values[0]
-            count = len(dice_values)
-            for i in range(2, count + 1):
-                combined = face * i
-                if not self.is_partial_double_move_valid(start_index, face, i):
-                    break
-                possible_moves.append(combined)
-
-        possible_moves = sorted(set(possible_moves))
-
-        valid_moves_found = False
-        color = self.current_player_color
-
-        for move_dist in possible_moves:
-            target_index = calculate_target_index(start_index, move_dist, for_ai=False)
-            if target_index is not None and self.triangles[target_index].can_move(color):
+        self.move_options = self.reachable_targets(self.current_player_color, start_index)
+        for target_index in self.move_options:
+            if target_index == OFF_POINT:
+                self.bore_off_button.config(state=tk.NORMAL)
+            else:
                 self.triangles[target_index].highlight_color = "green"
-                valid_moves_found = True
-
-        if self.check_bearing_off(is_ai=False):
-            for index in (reversed(range(0, 6))):
-                for roll in dice_values:
-                    if index - roll == -1:
-                        self.bore_off_button.config(state=tk.NORMAL)
-                        valid_moves_found = True
 
-        if not valid_moves_found:
+        if not self.move_options:
             logging.info("No valid moves available with the current dice.")
         else:
-            greens = [t.index for t in self.triangles if t.highlight_color == "green"]
-            logging.debug(f"Highlighted possible moves: {greens}")
+            logging.debug(f"Highlighted possible moves: {sorted(self.move_options)}")
 
     def highlight_bar_reentry_options(self):
         """
@@ -1210,8 +1228,8 @@ class BackgammonBoard:
         """
         can_reenter = False
         self.reset_highlights()
-        for d in self.dice.rolls:
-            possible_index = self.get_reentry_index(is_ai=False, dice_value=d)
+        for d in set(self.dice.rolls):
+            possible_index = self.entry_index(self.current_player_color, d)
             if possible_index is not None:
                 self.triangles[possible_index].highlight_color = "green"
                 can_reenter = True
@@ -1229,53 +1247,7 @@ class BackgammonBoard:
         """
         for t in self.triangles:
             t.highlight_color = None
-
-    def is_combined_move_partially_valid(self, start_index, dice_pair):
-        """
-        Checks if a combined move is partially valid.
-
-        Evaluates whether combining two dice rolls results in a valid move.
-
-        Parameters:
-            start_index (int): The index of the starting triangle.
-            dice_pair (list of int): A list containing two dice values.
-
-        Returns:
-            bool: True if the combined move is valid, False otherwise.
-        """
-        first_move, second_move = dice_pair
-        first_target = calculate_target_index(start_index, first_move, for_ai=False)
-        second_target = calculate_target_index(start_index, second_move, for_ai=False)
-        color = self.current_player_color
-
-        if (first_target is not None and self.triangles[first_target].can_move(color)) \
-                or (second_target is not None and self.triangles[second_target].can_move(color)):
-            return True
-        return False
-
-    def is_partial_double_move_valid(self, start_index, face, count):
-        """
-        Checks if a partial double move is valid.
-
-        Determines if multiple moves using the same dice face are possible.
-
-        Parameters:
-            start_index (int): The index of the starting triangle.
-            face (int): The dice face value being used.
-            count (int): The number of times the dice face is used.
-
-        Returns:
-            bool: True if all partial moves are valid, False otherwise.
-        """
-        current_index = start_index
-        color = self.current_player_color
-
-        for _ in range(count):
-            next_index = calculate_target_index(current_index, face, for_ai=False)
-            if next_index is None or not self.triangles[next_index].can_move(color):
-                return False
-            current_index = next_index
-        return True
+        self.move_options = {}
 
     def draw_board(self, width, height):
         """
@@ -1392,25 +1364,37 @@ class BackgammonBoard:
                 fill="white", outline="black", width=2
             )
 
-    def send_game_state(self):
+    def send_moves(self, hops):
         """
-        Sends the current game state to the server.
+        Sends moves to the server, which validates them against its own copy of the game.
 
-        Serializes and transmits the game state, including triangles, bar counts,
-        and boreoff counts, to synchronize with the server.
-        """
-        game_state = {
-            "triangles": [
-                {"index": t.index, "pieces_white": t.pieces_white, "pieces_black": t.pieces_black}
-                for t in self.triangles
-            ],
-            "bar_white": self.bar_white,
-            "bar_black": self.bar_black,
-            "white_boreoff": self.white_boreoff,
-            "black_boreoff": self.black_boreoff
-        }
-        send_message_to_server({"type": "game_state", "data": game_state})
+        Points are sent from this player's point of view; the server answers with a state
+        delta for each legal move and with a full correction if a move is rejected. When
+        tracing, each move starts a trace, whose first spans are the handling of the click
+        and the encoding of the move.
 
+        Parameters:
+            hops (list of tuple): The (from, to, die) moves to send, with 24 for the bar
+                                  and -1 for bearing off.
+        """
+        if not self.networked or not hops:
+            return
+        messages = [
+            {"type": "move", "data": {"from": source, "to": target, "die": die}}
+            for source, target, die in hops
+        ]
+        if tracer is None:
+            send_messages_to_server(messages)
+            return
+        encoding = time.monotonic_ns()
+        for message in messages:
+            message["data"]["trace"] = new_trace()
+        send_messages_to_server(messages)
+        for message in messages:
+            trace = message["data"]["trace"]
+            if self.clicked_at is not None:
+                tracer.span(trace, "click", self.clicked_at, encoding)
+            tracer.span(trace, "encode", encoding)
 
 class MainMenu:
     """
@@ -1442,6 +1426,10 @@ class MainMenu:
                                  command=self.menu_vs_human)
         button_human.pack(pady=5)
 
+        button_server_ai = tk.Button(self.menu_frame, text="Play vs Server AI", font=("Helvetica", 14),
+                                     command=lambda: self.menu_vs_human(bot=True))
+        button_server_ai.pack(pady=5)
+
     def menu_vs_ai(self):
         """
         Handles the selection of playing against AI.
@@ -1461,11 +1449,14 @@ class MainMenu:
                                  command=lambda: self.start_board(is_white=False))
         button_black.pack(pady=5)
 
-    def menu_vs_human(self):
+    def menu_vs_human(self, bot=False):
         """
         Handles the selection of playing against a human via network.
 
         Destroys the main menu and initiates a connection to the server.
+
+        Parameters:
+            bot (bool, optional): True to play against a bot hosted by the server. Defaults to False.
         """
         self.menu_frame.destroy()
         self.sub_frame = tk.Frame(self.root, padx=20, pady=20)
@@ -1474,29 +1465,40 @@ class MainMenu:
         label = tk.Label(self.sub_frame, text="Connecting to server...", font=("Helvetica", 14))
         label.pack(pady=5)
 
-        threading.Thread(target=self.connect_to_server, daemon=True).start()
+        threading.Thread(target=self.connect_to_server, args=(bot,), daemon=True).start()
 
-    def connect_to_server(self):
+    def connect_to_server(self, bot=False):
         """
         Connects to the game server for multiplayer gameplay.
 
         Attempts to establish a socket connection to the server and initializes the game board
-        upon successful connection. Handles connection errors gracefully by providing feedback
-        and retry options to the user.
+        upon successful connection. The player's name and the request for a bot or for an
+        opponent are sent before waiting for a seat, as a server matching players by rating
+        only seats the ones that asked. Handles connection errors gracefully by providing
+        feedback and retry options to the user.
+
+        Parameters:
+            bot (bool, optional): True to ask the server for a bot opponent. Defaults to False.
         """
-        global client_socket
+        global client_socket, frame_decoder, session_token
+        session_token = None
         try:
             client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            client_socket.settimeout(SERVER_TIMEOUT)
             client_socket.connect((SERVER_HOST, SERVER_PORT))
             logging.info(f"Connected to server: {SERVER_HOST}:{SERVER_PORT}")
 
-            data = client_socket.recv(4096)
-            response = pickle.loads(data)
-            starting_color = response.get("color")
-            is_white = starting_color == "white"
+            frame_decoder = FrameDecoder()
+            requests = [{"type": "play_bot" if bot else "queue"}]
+            if PLAYER_NAME:
+                requests.insert(0, {"type": "name", "data": PLAYER_NAME})
+            send_messages_to_server(requests)
+            response = wait_for_message("color")
+            starting_color = response.get("data")
+            is_white = starting_color != "black"
 
-            self.start_board(networked=True, client_sock=client_socket, is_white=is_white)
-            threading.Thread(target=listen_from_server, args=(self.board_app,), daemon=True).start()
+            self.start_board(networked=True, client_sock=client_socket, is_white=is_white,
+                             spectator=starting_color == "spectator")
 
         except Exception as e:
             logging.error(f"Error connecting to server: {e}")
@@ -1508,16 +1510,16 @@ class MainMenu:
             )
             error_label.pack(pady=5)
             retry_button = tk.Button(
-                self.menu_frame, text="Retry", font=("Helvetica", 14), command=self.menu_vs_human
+                self.menu_frame, text="Retry", font=("Helvetica", 14), command=lambda: self.menu_vs_human(bot)
             )
             retry_button.pack(pady=5)
 
-    def start_board(self, is_white, networked=False, client_sock=None):
+    def start_board(self, is_white, networked=False, client_sock=None, spectator=False):
         """
         Initializes the game board.
 
         Destroys any existing sub-frames and sets up the BackgammonBoard instance along with the
-        "Roll Dice" button.
+        "Roll Dice" button and, for networked games, a field to watch other rooms.
 
         Parameters:
             is_white (bool): True if the player chooses white, False for black.
@@ -1525,6 +1527,8 @@ class MainMenu:
                                         False for local play against AI. Defaults to False.
             client_sock (socket.socket, optional): The client socket for networked play.
                                                    Defaults to None.
+            spectator (bool, optional): True to watch the game from white's side without
+                                        playing. Defaults to False.
         """
         if self.sub_frame is not None:
             self.sub_frame.destroy()
@@ -1533,10 +1537,55 @@ class MainMenu:
 
         color = "white" if is_white else "black"
         self.board_app = BackgammonBoard(self.frame_board, player_color=color, networked=networked,
-                                         client_sock=client_sock)
-        button_roll = tk.Button(self.frame_board, text="Roll Dice", font=("Helvetica", 14),
-                                command=self.board_app.roll_dice)
-        button_roll.pack(pady=5, side=tk.BOTTOM)
+                                         client_sock=client_sock, spectator=spectator)
+        if not spectator:
+            button_roll = tk.Button(self.frame_board, text="Roll Dice", font=("Helvetica", 14),
+                                    command=self.board_app.roll_dice)
+            button_roll.pack(pady=5, side=tk.BOTTOM)
+        if networked:
+            watch_frame = tk.Frame(self.frame_board)
+            watch_frame.pack(pady=5, side=tk.BOTTOM)
+            room_entry = tk.Entry(watch_frame, width=8, font=("Helvetica", 14))
+            room_entry.pack(side=tk.LEFT, padx=5)
+            button_watch = tk.Button(watch_frame, text="Watch Room", font=("Helvetica", 14),
+                                     command=lambda: self.watch_room(room_entry.get()))
+            button_watch.pack(side=tk.LEFT)
+
+    def watch_room(self, room_text):
+        """
+        Opens a window watching another room over the connection of the current game.
+
+        The server routes the messages of the watched room to this connection, and they are
+        dispatched to the board of the new window. Closing the window leaves the room.
+
+        Parameters:
+            room_text (str): The id of the room to watch, as typed by the user.
+        """
+        try:
+            room_id = int(room_text)
+        except ValueError:
+            logging.warning(f"Not a room id: {room_text!r}")
+            return
+        if room_id in room_boards:
+            return
+        window = tk.Toplevel(self.root)
+        window.title(f"Backgammon - Room {room_id}")
+        window.geometry("800x600")
+        BackgammonBoard(window, networked=True, client_sock=client_socket, spectator=True, room=room_id)
+        window.protocol("WM_DELETE_WINDOW", lambda: self.stop_watching(room_id, window))
+        send_message_to_server({"type": "watch", "data": room_id}, room=room_id)
+
+    def stop_watching(self, room_id, window):
+        """
+        Leaves a watched room and closes its window.
+
+        Parameters:
+            room_id (int): The id of the watched room.
+            window (tk.Toplevel): The window of the room.
+        """
+        room_boards.pop(room_id, None)
+        send_message_to_server({"type": "leave"}, room=room_id)
+        window.destroy()
 
 
 def main():
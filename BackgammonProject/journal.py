@@ -0,0 +1,273 @@
+import argparse
+import logging
+import mmap
+import os
+import struct
+import time
+
+from rules import COLORS, RulesEngine
+from state_codec import WHITE_BOREOFF, BLACK_BOREOFF
+from state_sync import VersionedState
+
+JOURNAL_DIR = "journals"
+JOURNAL_MAGIC = b"BGJ1"
+JOURNAL_BUFFER_SIZE = 1 << 16
+FSYNC_INTERVAL = 5.0
+HEADER = struct.Struct("<4sHHId")
+RECORD = struct.Struct("<dHBBbbbx")
+KIND_OFFSET = 10
+
+ROLL = 1
+MOVE = 2
+TURN = 3
+GAME_OVER = 4
+KIND_NAMES = {ROLL: "roll", MOVE: "move", TURN: "turn", GAME_OVER: "game_over"}
+
+
+class JournalWriter:
+    """
+    Appends the events of one game to a binary journal file.
+
+    The file starts with a header holding the room id and the start time of the game,
+    followed by fixed-size records of RECORD.size bytes: the wall clock time, the sequence
+    number of the game state after the event, the kind of event, the color it concerns and
+    three signed bytes whose meaning depends on the kind:
+
+    - roll: the two dice.
+    - move: the source point (24 for the bar), the destination point (-1 when bearing off)
+      and the die, from white's point of view.
+    - turn: unused; the color is the player whose turn starts.
+    - game_over: 1 if the game was forfeited; the color is the winner.
+
+    Records go through a large write buffer; `flush` hands them to the operating system and
+    `sync` makes them durable, which the server does periodically rather than per record.
+    The buffer is locked internally, so a background thread may sync the journal while the
+    server appends to it.
+    """
+
+    def __init__(self, path, room_id):
+        """
+        Creates the journal file and writes its header.
+
+        Parameters:
+            path (str): The path of the journal file.
+            room_id (int): The id of the room whose game is recorded.
+        """
+        self.path = path
+        self.file = open(path, "ab", buffering=JOURNAL_BUFFER_SIZE)
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(JOURNAL_MAGIC, 1, RECORD.size, room_id, time.time()))
+        self.dirty = True
+
+    def append(self, kind, color, seq, a=0, b=0, c=0):
+        """
+        Appends one record to the journal.
+
+        Parameters:
+            kind (int): ROLL, MOVE, TURN or GAME_OVER.
+            color (str): The color the event concerns ("white" or "black").
+            seq (int): The sequence number of the game state after the event.
+            a (int, optional): The first argument of the event. Defaults to 0.
+            b (int, optional): The second argument of the event. Defaults to 0.
+            c (int, optional): The third argument of the event. Defaults to 0.
+        """
+        self.file.write(RECORD.pack(time.time(), seq & 0xFFFF, kind, COLORS.index(color), a, b, c))
+        self.dirty = True
+
+    def flush(self):
+        """
+        Writes the buffered records to the operating system.
+
+        Returns:
+            bool: True if there was anything to flush, False otherwise.
+        """
+        if not self.dirty or self.file.closed:
+            return False
+        self.dirty = False
+        self.file.flush()
+        return True
+
+    def sync(self):
+        """
+        Flushes the buffered records and waits until they are on disk.
+        """
+        if self.flush():
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        """
+        Syncs and closes the journal.
+        """
+        if self.file.closed:
+            return
+        self.sync()
+        self.file.close()
+
+
+def sync_journals(journals):
+    """
+    Makes the records of several journals durable, logging the journals that fail.
+
+    Parameters:
+        journals (list of JournalWriter): The journals to sync.
+    """
+    for journal in journals:
+        try:
+            journal.sync()
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not sync journal {journal.path}: {e}")
+
+
+def open_journal(directory, room_id):
+    """
+    Creates the journal of a new game in a directory.
+
+    Parameters:
+        directory (str): The directory holding the journals; created if needed.
+        room_id (int): The id of the room whose game is recorded.
+
+    Returns:
+        JournalWriter: The writer of the new journal.
+    """
+    os.makedirs(directory, exist_ok=True)
+    name = f"room-{room_id:08d}-{time.time_ns()}.bgj"
+    return JournalWriter(os.path.join(directory, name), room_id)
+
+
+class JournalReader:
+    """
+    Reads a journal file through a read-only memory map.
+
+    Records are decoded on demand with `struct.unpack_from` straight from the mapped pages,
+    so scanning a journal never builds a list of its records, and columns of single byte
+    fields (such as the kind of every record) can be extracted with one strided slice.
+    """
+
+    def __init__(self, path):
+        """
+        Maps a journal file and checks its header.
+
+        Parameters:
+            path (str): The path of the journal file.
+
+        Raises:
+            ValueError: If the file is not a journal.
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError(f"{path} is too short to be a journal.")
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, _, record_size, self.room_id, self.started_at = HEADER.unpack_from(self.map)
+        if magic != JOURNAL_MAGIC or record_size != RECORD.size:
+            self.map.close()
+            raise ValueError(f"{path} is not a journal.")
+        self.count = (size - HEADER.size) // RECORD.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        """
+        Counts the complete records of the journal; a torn record at the end is ignored.
+
+        Returns:
+            int: The number of records.
+        """
+        return self.count
+
+    def record(self, index):
+        """
+        Decodes a single record.
+
+        Parameters:
+            index (int): The index of the record.
+
+        Returns:
+            tuple: The time, sequence number, kind, color index and the three arguments.
+        """
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return RECORD.unpack_from(self.map, HEADER.size + index * RECORD.size)
+
+    def __iter__(self):
+        """
+        Yields the records one by one, decoded from the mapped file.
+
+        Yields:
+            tuple: The time, sequence number, kind, color index and the three arguments.
+        """
+        end = HEADER.size + self.count * RECORD.size
+        return RECORD.iter_unpack(memoryview(self.map)[HEADER.size:end])
+
+    def kinds(self):
+        """
+        Extracts the kind of every record with a single strided copy.
+
+        Returns:
+            bytes: One byte per record holding its kind.
+        """
+        start = HEADER.size + KIND_OFFSET
+        return self.map[start:start + self.count * RECORD.size:RECORD.size]
+
+    def count_kinds(self):
+        """
+        Counts the records of each kind.
+
+        Returns:
+            dict: The number of records per kind name.
+        """
+        kinds = self.kinds()
+        return {name: kinds.count(kind) for kind, name in KIND_NAMES.items()}
+
+    def replay(self):
+        """
+        Replays the moves of the journal on a fresh board.
+
+        Returns:
+            VersionedState: The state of the game after the last recorded event.
+        """
+        game_state = VersionedState()
+        rules = RulesEngine(game_state)
+        for _, _, kind, color, a, b, c in self:
+            if kind == ROLL:
+                rules.dice = [a, a, a, a] if a == b else [a, b]
+                rules.has_rolled = True
+            elif kind == MOVE:
+                rules.apply_move(COLORS[color], a, b, c)
+            elif kind == TURN:
+                rules.turn_color = COLORS[color]
+                rules.dice = []
+                rules.has_rolled = False
+        return game_state
+
+    def close(self):
+        """
+        Unmaps the journal file.
+        """
+        self.map.close()
+
+
+def main():
+    """
+    Summarizes journal files: the number of records of each kind, the duration of the game
+    and the borne off checkers after replaying it.
+    """
+    parser = argparse.ArgumentParser(description="Summarize Backgammon game journals.")
+    parser.add_argument("paths", nargs="+", help="The journal files to read.")
+    args = parser.parse_args()
+    for path in args.paths:
+        with JournalReader(path) as reader:
+            counts = ", ".join(f"{name}: {count}" for name, count in reader.count_kinds().items())
+            duration = reader.record(len(reader) - 1)[0] - reader.started_at if len(reader) else 0.0
+            state = reader.replay().state
+            print(f"{path}: room {reader.room_id}, {len(reader)} records ({counts}), {duration:.1f} s, "
+                  f"borne off white {state[WHITE_BOREOFF]} black {state[BLACK_BOREOFF]}")
+
+
+if __name__ == "__main__":
+    main()
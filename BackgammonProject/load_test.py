@@ -0,0 +1,223 @@
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from async_server import raise_open_file_limit
+from bot_client import POLICIES, SERVER_HOST, SERVER_PORT, BotClient, BotConnection, wait_for_server
+
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+SERVERS = ("async", "sharded", "threaded", "none")
+RSS_SAMPLE_INTERVAL = 0.5
+SETTLE_DELAY = 1.0
+STOP_TIMEOUT = 10.0
+
+
+def server_command(server, port, workers, data_dir, matchmaking=False):
+    """
+    Builds the command starting a local server for the load test.
+
+    The journals and results of the test games go to a scratch directory, and seats are
+    not held after a disconnect, so the connection probing for the server does not keep
+    the first seat taken.
+
+    Parameters:
+        server (str): "async", "sharded" or "threaded".
+        port (int): The port number the server listens on.
+        workers (int): The number of worker processes of the sharded server.
+        data_dir (str): The directory receiving the journals and the results database.
+        matchmaking (bool, optional): True to have the asyncio or sharded server pair the
+                                      clients by rating. Defaults to False.
+
+    Returns:
+        list of str: The command line.
+    """
+    journal_dir = os.path.join(data_dir, "journals")
+    results_db = os.path.join(data_dir, "results.db")
+    if server == "threaded":
+        return [sys.executable, "-c",
+                f"import server; server.GameServer(port={port}, grace_period=0, journal_dir={journal_dir!r}, "
+                f"results_db={results_db!r}).start()"]
+    script = "sharding.py" if server == "sharded" else "async_server.py"
+    command = [sys.executable, script, "--port", str(port), "--grace-period", "0",
+               "--journal-dir", journal_dir, "--results-db", results_db]
+    if server == "sharded":
+        command += ["--workers", str(workers)]
+    if matchmaking:
+        command.append("--matchmaking")
+    return command
+
+
+def process_rss(pid):
+    """
+    Measures the resident memory of a process and of all its descendants.
+
+    Parameters:
+        pid (int): The id of the process.
+
+    Returns:
+        int or None: The resident set size in bytes, or None where /proc is not available.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:"))
+        children = []
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+    except (OSError, StopIteration):
+        return None
+    return rss + sum(process_rss(child) or 0 for child in children)
+
+
+def percentile(sorted_values, fraction):
+    """
+    Picks a percentile from sorted values.
+
+    Parameters:
+        sorted_values (list of float): The values, in ascending order.
+        fraction (float): The percentile, between 0 and 1.
+
+    Returns:
+        float: The value below which `fraction` of the values fall, or 0.0 if there are none.
+    """
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def sample_rss(pid, peak):
+    """
+    Records the peak resident memory of the server until cancelled.
+
+    Parameters:
+        pid (int): The id of the server process.
+        peak (list of int): A one item list updated with the peak in bytes.
+    """
+    while True:
+        rss = process_rss(pid)
+        if rss is not None:
+            peak[0] = max(peak[0], rss)
+        await asyncio.sleep(RSS_SAMPLE_INTERVAL)
+
+
+async def run_games(args, pid):
+    """
+    Plays the games of the load test concurrently and reports the measurements.
+
+    The clients of each game connect one after the other, so the server pairs them
+    together, then every game is played at once. With matchmaking, the clients connect all
+    at once instead, as none of them is seated before the server pairs it. With several
+    games per connection, the clients of a seat share connections, each playing its games
+    over routes. The server is given SETTLE_DELAY seconds to see the clients leave before
+    the test goes on.
+
+    Parameters:
+        args (argparse.Namespace): The parsed command line options.
+        pid (int or None): The id of the server process whose memory is measured.
+    """
+    clients = []
+    connections = {}
+    pending = []
+    for game in range(args.games):
+        for seat in range(1 if args.vs_bot else 2):
+            client = BotClient(args.host, args.port, args.policy, name=f"load-{game}-{seat}")
+            connection = None
+            if args.games_per_connection > 1:
+                key = (game // args.games_per_connection, seat)
+                if key not in connections:
+                    connections[key] = BotConnection(args.host, args.port)
+                    await connections[key].open()
+                connection = connections[key]
+            if args.matchmaking:
+                pending.append(client.connect(play_bot=args.vs_bot, connection=connection))
+            else:
+                await client.connect(play_bot=args.vs_bot, connection=connection)
+            clients.append(client)
+    await asyncio.gather(*pending)
+    logging.info(f"{len(clients)} clients connected over {len(connections) or len(clients)} connections, "
+                 f"playing {args.games} games.")
+
+    peak = [0]
+    sampler = asyncio.create_task(sample_rss(pid, peak)) if pid is not None else None
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(client.play() for client in clients), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    if sampler is not None:
+        sampler.cancel()
+    for client in clients:
+        client.close()
+    for connection in connections.values():
+        connection.close()
+    await asyncio.sleep(SETTLE_DELAY)
+
+    failures = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+    for failure in failures[:5]:
+        logging.error(f"Client failed: {failure!r}")
+    moves = sum(client.moves for client in clients)
+    round_trips = sorted(rtt for client in clients for rtt in client.round_trips)
+    rss = f"{peak[0] / (1 << 20):.1f} MB" if peak[0] else "n/a"
+    logging.info(f"Games: {args.games}, clients failed: {len(failures)}, time: {elapsed:.2f} s")
+    logging.info(f"Client moves: {moves} ({moves / elapsed if elapsed > 0 else 0.0:.0f}/s), "
+                 f"requests: {len(round_trips)}")
+    logging.info(f"Round trip p50: {percentile(round_trips, 0.5) * 1000:.2f} ms, "
+                 f"p99: {percentile(round_trips, 0.99) * 1000:.2f} ms, max: {percentile(round_trips, 1.0) * 1000:.2f} ms")
+    logging.info(f"Server peak RSS: {rss}")
+
+
+def main():
+    """
+    The entry point of the load test.
+
+    Starts a local server unless told to use a running one, plays the games and stops
+    the server again. The server is given SETTLE_DELAY seconds to see the connection
+    probing for it leave, so the sharded supervisor does not pair the first player with it.
+    """
+    parser = argparse.ArgumentParser(description="Play many concurrent bot games against a Backgammon server.")
+    parser.add_argument("--server", choices=SERVERS, default="async",
+                        help="The server to start, or none to use one that is already running.")
+    parser.add_argument("--host", default=SERVER_HOST, help="The IP address of the server.")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="The port number of the server.")
+    parser.add_argument("--pid", type=int, default=None, help="The process whose memory is measured with --server none.")
+    parser.add_argument("--workers", type=int, default=2, help="The number of workers of the sharded server.")
+    parser.add_argument("--games", type=int, default=100, help="The number of concurrent games.")
+    parser.add_argument("--policy", choices=POLICIES, default="heuristic", help="How the bots pick their moves.")
+    parser.add_argument("--vs-bot", action="store_true", help="Play every game against a bot hosted by the server.")
+    parser.add_argument("--games-per-connection", type=int, default=1,
+                        help="The number of games each client connection takes part in.")
+    parser.add_argument("--matchmaking", action="store_true",
+                        help="Start the server with matchmaking on and connect the clients all at once.")
+    args = parser.parse_args()
+    if args.server == "threaded" and args.games != 1:
+        parser.error("The threaded server hosts a single game; use --games 1.")
+    if args.server == "threaded" and args.matchmaking:
+        parser.error("The threaded server has no matchmaking.")
+
+    raise_open_file_limit()
+    if args.server == "none":
+        asyncio.run(run_games(args, args.pid))
+        return
+    with tempfile.TemporaryDirectory() as data_dir:
+        process = subprocess.Popen(server_command(args.server, args.port, args.workers, data_dir, args.matchmaking),
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+        try:
+            wait_for_server(args.host, args.port)
+            time.sleep(SETTLE_DELAY)
+            asyncio.run(run_games(args, process.pid))
+        finally:
+            process.terminate()
+            try:
+                process.wait(STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                logging.warning("The server did not stop in time and was killed.")
+                process.kill()
+                process.wait()
+
+
+if __name__ == "__main__":
+    main()
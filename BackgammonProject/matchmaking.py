@@ -0,0 +1,222 @@
+import bisect
+import heapq
+import itertools
+import math
+import time
+
+BASE_WINDOW = 50.0
+WINDOW_GROWTH = 50.0
+WIDEN_INTERVAL = 5.0
+MATCH_INTERVAL = 0.5
+WAIT_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class Ticket:
+    """
+    Represents a player waiting in a MatchQueue.
+    """
+
+    __slots__ = ("rating", "seq", "enqueued_at", "player", "group", "queued")
+
+    def __init__(self, rating, seq, enqueued_at, player, group):
+        """
+        Initializes a Ticket.
+
+        Parameters:
+            rating (float): The rating the player is matched by.
+            seq (int): The order the ticket was created in, which breaks ties between equal ratings.
+            enqueued_at (float): The monotonic time the player started waiting at.
+            player (object): The player, or whatever identifies it to the caller.
+            group (object): The tickets sharing a group are never paired together.
+        """
+        self.rating = rating
+        self.seq = seq
+        self.enqueued_at = enqueued_at
+        self.player = player
+        self.group = group
+        self.queued = True
+
+
+class MatchQueue:
+    """
+    Pairs waiting players of similar ratings, widening the rating window of each player the
+    longer it waits.
+
+    The window of a player starts at `base_window` rating points and grows by `growth` points
+    every `widen_interval` seconds. Two players can be paired once the gap between their
+    ratings fits in the window of either of them.
+
+    Tickets are kept sorted by rating, with bisect, so the closest opponents of a player are
+    always its neighbours. For every pair of neighbours the queue computes when the gap
+    between them will fit a window and pushes that time on a heap. Pairing is then a matter
+    of popping the pairs that became due: one is skipped if either player left or another
+    player arrived between them since, and pairing two players makes their former
+    neighbours adjacent, which pushes a new candidate pair. Adding or removing a player
+    costs a binary search, a list insertion or deletion and a heap push, and a call to
+    `match` only touches the pairs it makes or skips, so a tick stays cheap with tens of
+    thousands of players waiting.
+    """
+
+    def __init__(self, base_window=BASE_WINDOW, growth=WINDOW_GROWTH, widen_interval=WIDEN_INTERVAL,
+                 clock=time.monotonic):
+        """
+        Initializes an empty MatchQueue.
+
+        Parameters:
+            base_window (float, optional): The rating window of a player that just arrived.
+                                           Defaults to BASE_WINDOW.
+            growth (float, optional): The points the window widens by at each step. Defaults to WINDOW_GROWTH.
+            widen_interval (float, optional): The seconds between two steps. Defaults to WIDEN_INTERVAL.
+            clock (callable, optional): The monotonic clock to read the time from.
+                                        Defaults to time.monotonic.
+        """
+        self.base_window = base_window
+        self.growth = growth
+        self.widen_interval = widen_interval
+        self.clock = clock
+        self.keys = []
+        self.tickets = []
+        self.candidates = []
+        self.seqs = itertools.count()
+
+    def __len__(self):
+        """
+        Counts the waiting players.
+
+        Returns:
+            int: The number of tickets in the queue.
+        """
+        return len(self.tickets)
+
+    def add(self, player, rating, group=None, enqueued_at=None):
+        """
+        Puts a player in the queue.
+
+        Parameters:
+            player (object): The player, or whatever identifies it to the caller.
+            rating (float): The rating of the player.
+            group (object, optional): The tickets sharing a group are never paired together.
+                                      Defaults to None, which pairs the player with anyone.
+            enqueued_at (float, optional): The monotonic time the player started waiting at.
+                                           Defaults to now.
+
+        Returns:
+            Ticket: The ticket of the player, needed to remove or re-rate it.
+        """
+        if enqueued_at is None:
+            enqueued_at = self.clock()
+        ticket = Ticket(rating, next(self.seqs), enqueued_at, player, group)
+        index = bisect.bisect_left(self.keys, (rating, ticket.seq))
+        self.keys.insert(index, (rating, ticket.seq))
+        self.tickets.insert(index, ticket)
+        if index > 0:
+            self.push_candidate(self.tickets[index - 1], ticket)
+        if index + 1 < len(self.tickets):
+            self.push_candidate(ticket, self.tickets[index + 1])
+        return ticket
+
+    def remove(self, ticket):
+        """
+        Takes a player out of the queue; does nothing if it was already paired or removed.
+
+        Parameters:
+            ticket (Ticket): The ticket of the player.
+        """
+        if not ticket.queued:
+            return
+        index = self.index(ticket)
+        del self.keys[index]
+        del self.tickets[index]
+        ticket.queued = False
+        if 0 < index < len(self.tickets):
+            self.push_candidate(self.tickets[index - 1], self.tickets[index])
+
+    def rerate(self, ticket, rating):
+        """
+        Changes the rating of a waiting player, who keeps the time it has waited so far.
+
+        Parameters:
+            ticket (Ticket): The ticket of the player.
+            rating (float): The new rating.
+
+        Returns:
+            Ticket: The new ticket of the player, replacing the given one.
+        """
+        self.remove(ticket)
+        return self.add(ticket.player, rating, ticket.group, ticket.enqueued_at)
+
+    def index(self, ticket):
+        """
+        Finds the position of a queued ticket in rating order.
+
+        Parameters:
+            ticket (Ticket): The ticket to look for.
+
+        Returns:
+            int: The index of the ticket.
+        """
+        return bisect.bisect_left(self.keys, (ticket.rating, ticket.seq))
+
+    def ready_at(self, ticket, gap):
+        """
+        Computes when the window of a waiting player becomes wide enough for a rating gap.
+
+        Parameters:
+            ticket (Ticket): The ticket of the player.
+            gap (float): The rating gap to an opponent.
+
+        Returns:
+            float: The monotonic time, or infinity if the window never gets that wide.
+        """
+        if gap <= self.base_window:
+            return ticket.enqueued_at
+        if self.growth <= 0:
+            return math.inf
+        return ticket.enqueued_at + math.ceil((gap - self.base_window) / self.growth) * self.widen_interval
+
+    def push_candidate(self, lower, upper):
+        """
+        Schedules the pairing of two neighbouring players for when either accepts their gap.
+
+        Parameters:
+            lower (Ticket): The player with the lower rating.
+            upper (Ticket): The player right above it.
+        """
+        if lower.group is not None and lower.group == upper.group:
+            return
+        gap = upper.rating - lower.rating
+        ready = min(self.ready_at(lower, gap), self.ready_at(upper, gap))
+        if ready < math.inf:
+            heapq.heappush(self.candidates, (ready, lower.seq, upper.seq, lower, upper))
+
+    def match(self, now=None):
+        """
+        Pairs every pair of neighbouring players whose gap fits the window of either of them.
+
+        Pairs are made in the order their windows became wide enough, so players who have
+        waited the longest for a given gap are served first.
+
+        Parameters:
+            now (float, optional): The current monotonic time. Defaults to now.
+
+        Returns:
+            list of tuple: The tickets of every pair, the lower rated first.
+        """
+        if now is None:
+            now = self.clock()
+        pairs = []
+        candidates = self.candidates
+        while candidates and candidates[0][0] <= now:
+            _, _, _, lower, upper = heapq.heappop(candidates)
+            if not (lower.queued and upper.queued):
+                continue
+            index = self.index(lower)
+            if index + 1 >= len(self.tickets) or self.tickets[index + 1] is not upper:
+                continue
+            del self.keys[index:index + 2]
+            del self.tickets[index:index + 2]
+            lower.queued = upper.queued = False
+            pairs.append((lower, upper))
+            if 0 < index < len(self.tickets):
+                self.push_candidate(self.tickets[index - 1], self.tickets[index])
+        return pairs
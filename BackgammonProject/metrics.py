@@ -0,0 +1,367 @@
+import bisect
+import http.server
+import json
+import logging
+import threading
+
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+STATS_LOG_INTERVAL = 60.0
+
+
+class Counter:
+    """
+    A value that only goes up, such as the number of bytes received.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        """
+        Initializes a Counter at zero.
+        """
+        self.value = 0
+
+    def inc(self, amount=1):
+        """
+        Adds to the counter.
+
+        Parameters:
+            amount (int, optional): The amount to add. Defaults to 1.
+        """
+        self.value += amount
+
+    def read(self):
+        """
+        Reads the counter.
+
+        Returns:
+            int: The current value.
+        """
+        return self.value
+
+
+class Gauge:
+    """
+    A value that goes up and down, such as the number of connected clients.
+
+    A gauge is either set by the server or computed by a function when it is read, which
+    suits values the server already keeps, like the number of rooms.
+    """
+
+    __slots__ = ("value", "function")
+
+    def __init__(self, function=None):
+        """
+        Initializes a Gauge.
+
+        Parameters:
+            function (callable, optional): Computes the value when the gauge is read. Defaults to None.
+        """
+        self.value = 0
+        self.function = function
+
+    def set(self, value):
+        """
+        Sets the gauge.
+
+        Parameters:
+            value (float): The new value.
+        """
+        self.value = value
+
+    def inc(self, amount=1):
+        """
+        Raises the gauge.
+
+        Parameters:
+            amount (int, optional): The amount to add. Defaults to 1.
+        """
+        self.value += amount
+
+    def dec(self, amount=1):
+        """
+        Lowers the gauge.
+
+        Parameters:
+            amount (int, optional): The amount to subtract. Defaults to 1.
+        """
+        self.value -= amount
+
+    def read(self):
+        """
+        Reads the gauge.
+
+        Returns:
+            float: The current value.
+        """
+        return self.function() if self.function is not None else self.value
+
+
+class Histogram:
+    """
+    Counts observations in fixed buckets, such as the time taken to handle a message.
+
+    Observing a value is a binary search over the bucket bounds and one increment, so the
+    servers can afford it for every message. Percentiles are estimated as the upper bound of
+    the bucket they fall in; values above the last bound fall in an overflow bucket whose
+    bound is infinite.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        """
+        Initializes an empty Histogram.
+
+        Parameters:
+            bounds (tuple of float, optional): The upper bounds of the buckets, in ascending
+                                               order. Defaults to LATENCY_BUCKETS.
+        """
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """
+        Records an observation.
+
+        Parameters:
+            value (float): The observed value.
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, fraction):
+        """
+        Estimates a percentile of the observations.
+
+        Parameters:
+            fraction (float): The percentile, between 0 and 1.
+
+        Returns:
+            float: The upper bound of the bucket holding the percentile, or 0.0 if nothing
+                   was observed.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def read(self):
+        """
+        Reads the histogram.
+
+        Returns:
+            dict: The count, sum, p50 and p99 of the observations and the cumulative count
+                  of every bucket, keyed by its upper bound.
+        """
+        buckets = {}
+        seen = 0
+        for bound, count in zip(self.bounds + ("+Inf",), list(self.counts)):
+            seen += count
+            buckets[str(bound)] = seen
+        return {"count": self.count, "sum": self.sum, "p50": self.percentile(0.5),
+                "p99": self.percentile(0.99), "buckets": buckets}
+
+
+class MetricsRegistry:
+    """
+    Holds the counters, gauges and histograms of a server by name.
+
+    Metrics are created on first use. Looking one up costs a dictionary access, and the
+    servers keep a reference to the ones they update most. Updates take no lock: on the threaded
+    server an increment racing with another one may rarely be lost, which is fine for
+    monitoring and keeps the cost of a metric to a few attribute operations.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty MetricsRegistry.
+        """
+        self.metrics = {}
+
+    def get(self, name, kind, *args):
+        """
+        Looks up a metric, creating it on first use.
+
+        Parameters:
+            name (str): The name of the metric.
+            kind (type): Counter, Gauge or Histogram.
+            *args: The arguments passed to the constructor of a new metric.
+
+        Returns:
+            Counter, Gauge or Histogram: The metric.
+
+        Raises:
+            TypeError: If the name is taken by a metric of another kind.
+        """
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = kind(*args)
+        elif type(metric) is not kind:
+            raise TypeError(f"Metric {name} is a {type(metric).__name__}, not a {kind.__name__}.")
+        return metric
+
+    def counter(self, name):
+        """
+        Looks up a counter, creating it on first use.
+
+        Parameters:
+            name (str): The name of the counter.
+
+        Returns:
+            Counter: The counter.
+        """
+        return self.get(name, Counter)
+
+    def gauge(self, name, function=None):
+        """
+        Looks up a gauge, creating it on first use.
+
+        Parameters:
+            name (str): The name of the gauge.
+            function (callable, optional): Computes the value of a new gauge when it is read.
+                                           Defaults to None.
+
+        Returns:
+            Gauge: The gauge.
+        """
+        return self.get(name, Gauge, function)
+
+    def histogram(self, name, bounds=LATENCY_BUCKETS):
+        """
+        Looks up a histogram, creating it on first use.
+
+        Parameters:
+            name (str): The name of the histogram.
+            bounds (tuple of float, optional): The bucket bounds of a new histogram.
+                                               Defaults to LATENCY_BUCKETS.
+
+        Returns:
+            Histogram: The histogram.
+        """
+        return self.get(name, Histogram, bounds)
+
+    def snapshot(self):
+        """
+        Reads every metric.
+
+        Returns:
+            dict: The value of every counter and gauge, and the reading of every histogram,
+                  keyed by name.
+        """
+        return {name: metric.read() for name, metric in sorted(list(self.metrics.items()))}
+
+    def to_json(self):
+        """
+        Renders every metric as JSON.
+
+        Returns:
+            str: The JSON document.
+        """
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_text(self):
+        """
+        Renders every metric as plain text, one value per line.
+
+        Histograms are written as a cumulative `_bucket` line per bound followed by their
+        `_count` and `_sum`, in the layout used by Prometheus.
+
+        Returns:
+            str: The text.
+        """
+        lines = []
+        for name, value in self.snapshot().items():
+            if isinstance(value, dict):
+                for bound, count in value["buckets"].items():
+                    lines.append(f'{name}_bucket{{le="{bound}"}} {count}')
+                lines.append(f"{name}_count {value['count']}")
+                lines.append(f"{name}_sum {value['sum']:.6f}")
+            else:
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """
+        Sums up every metric on one line, for the periodic log.
+
+        Histograms are shown by their count, p50 and p99, and skipped while empty.
+
+        Returns:
+            str: The summary.
+        """
+        parts = []
+        for name, value in self.snapshot().items():
+            if not isinstance(value, dict):
+                parts.append(f"{name}={value}")
+            elif value["count"]:
+                parts.append(f"{name}=n{value['count']}/p50 {value['p50']:g}/p99 {value['p99']:g}")
+        return " ".join(parts)
+
+
+class StatsRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Answers GET /stats with the metrics as plain text and GET /stats.json as JSON.
+    """
+
+    registry = None
+
+    def do_GET(self):
+        """
+        Sends the metrics of the registry in the format matching the path.
+        """
+        if self.path == "/stats":
+            body, content_type = self.registry.to_text(), "text/plain; charset=utf-8"
+        elif self.path == "/stats.json":
+            body, content_type = self.registry.to_json(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        """
+        Logs the requests at debug level instead of writing them to stderr.
+        """
+        logging.debug(f"Stats request from {self.client_address}: {format % args}")
+
+
+def serve_stats(registry, host, port):
+    """
+    Serves the metrics of a registry over HTTP from a daemon thread.
+
+    The endpoint is meant for local monitoring, so it should be bound to a loopback address.
+
+    Parameters:
+        registry (MetricsRegistry): The metrics to serve.
+        host (str): The IP address to bind the endpoint.
+        port (int): The port number to bind the endpoint.
+
+    Returns:
+        http.server.ThreadingHTTPServer: The running endpoint, or None if it could not be bound.
+    """
+    handler = type("BoundStatsRequestHandler", (StatsRequestHandler,), {"registry": registry})
+    try:
+        server = http.server.ThreadingHTTPServer((host, port), handler)
+    except OSError as e:
+        logging.error(f"Could not serve stats on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"Serving stats on http://{host}:{port}/stats")
+    return server
@@ -0,0 +1,585 @@
+import asyncio
+import struct
+
+from state_codec import STATE_SIZE, decode_state
+
+HEADER = struct.Struct("!I")
+SEQ = struct.Struct("!I")
+DELTA_HEADER = struct.Struct("!IB")
+CHANGE = struct.Struct("!Bb")
+MOVE = struct.Struct("!bbB")
+TRACE = struct.Struct("!QQ")
+MAX_FRAME_SIZE = 1 << 20
+RECEIVE_BUFFER_SIZE = 1 << 16
+RECEIVE_SIZE = 4096
+COLORS = ("white", "black")
+ROLES = COLORS + ("spectator",)
+ROOM_ID = struct.Struct("!I")
+ROUTED = 0
+ROUTE = struct.Struct("!BI")
+SESSION_TOKEN_SIZE = 16
+MAX_NAME_SIZE = 32
+
+
+class ProtocolError(Exception):
+    """
+    Raised when a peer sends data that does not follow the framed protocol.
+    """
+
+
+def encode_frame(payload):
+    """
+    Wraps a payload into a length-prefixed frame.
+
+    Each frame starts with a 4 byte big-endian length followed by the payload itself,
+    so the receiver can split a byte stream back into messages regardless of how the
+    TCP segments were coalesced or split.
+
+    Parameters:
+        payload (bytes): The payload to frame.
+
+    Returns:
+        bytes: The framed payload.
+    """
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Frame of {len(payload)} bytes exceeds the limit of {MAX_FRAME_SIZE} bytes.")
+    return HEADER.pack(len(payload)) + payload
+
+
+def _encode_empty(data):
+    return b""
+
+
+def _decode_empty(body):
+    if body:
+        raise ProtocolError("Unexpected message body.")
+    return None
+
+
+def _encode_flag(data):
+    return b"\x01" if data else b"\x00"
+
+
+def _decode_flag(body):
+    if len(body) != 1:
+        raise ProtocolError("Flag messages carry exactly one byte.")
+    return body[0] == 1
+
+
+def _encode_color(data):
+    return bytes((ROLES.index(data),))
+
+
+def _decode_color(body):
+    if len(body) != 1 or body[0] >= len(ROLES):
+        raise ProtocolError("Invalid color message.")
+    return ROLES[body[0]]
+
+
+def _encode_room_id(data):
+    return ROOM_ID.pack(data)
+
+
+def _decode_room_id(body):
+    if len(body) != ROOM_ID.size:
+        raise ProtocolError("Invalid room id.")
+    return ROOM_ID.unpack(body)[0]
+
+
+def _encode_snapshot(data):
+    return SEQ.pack(data["seq"]) + bytes(data["state"])
+
+
+def _decode_snapshot(body):
+    if len(body) < SEQ.size:
+        raise ProtocolError("Truncated game state message.")
+    try:
+        state = decode_state(body[SEQ.size:])
+    except ValueError as e:
+        raise ProtocolError(str(e)) from e
+    return {"seq": SEQ.unpack_from(body)[0], "state": state}
+
+
+def _encode_trace(data):
+    trace = data.get("trace")
+    return TRACE.pack(*trace) if trace is not None else b""
+
+
+def _decode_trace(body, size, data):
+    if len(body) == size + TRACE.size:
+        data["trace"] = TRACE.unpack_from(body, size)
+    elif len(body) != size:
+        raise ProtocolError("Message length does not match its type.")
+    return data
+
+
+def _encode_delta(data):
+    changes = data["changes"]
+    parts = [DELTA_HEADER.pack(data["seq"], len(changes))]
+    parts.extend(CHANGE.pack(slot, value) for slot, value in changes)
+    parts.append(_encode_trace(data))
+    return b"".join(parts)
+
+
+def _decode_delta(body):
+    if len(body) < DELTA_HEADER.size:
+        raise ProtocolError("Truncated state delta message.")
+    seq, count = DELTA_HEADER.unpack_from(body)
+    size = DELTA_HEADER.size + count * CHANGE.size
+    if len(body) not in (size, size + TRACE.size):
+        raise ProtocolError("State delta length does not match its change count.")
+    changes = list(CHANGE.iter_unpack(body[DELTA_HEADER.size:size]))
+    if any(slot >= STATE_SIZE for slot, _ in changes):
+        raise ProtocolError("State delta refers to an unknown slot.")
+    return _decode_trace(body, size, {"seq": seq, "changes": changes})
+
+
+def _encode_move(data):
+    return MOVE.pack(data["from"], data["to"], data["die"]) + _encode_trace(data)
+
+
+def _decode_move(body):
+    if len(body) < MOVE.size:
+        raise ProtocolError("Invalid move message.")
+    source, target, die = MOVE.unpack_from(body)
+    return _decode_trace(body, MOVE.size, {"from": source, "to": target, "die": die})
+
+
+def _encode_dice(data):
+    return bytes(data)
+
+
+def _decode_dice(body):
+    if len(body) > 4 or any(not 1 <= die <= 6 for die in body):
+        raise ProtocolError("Invalid dice message.")
+    return list(body)
+
+
+def _encode_token(data):
+    return bytes(data)
+
+
+def _decode_token(body):
+    if len(body) != SESSION_TOKEN_SIZE:
+        raise ProtocolError("Invalid session token.")
+    return bytes(body)
+
+
+def _encode_name(data):
+    return data.encode("utf-8")[:MAX_NAME_SIZE].decode("utf-8", "ignore").encode("utf-8")
+
+
+def _decode_name(body):
+    if not body or len(body) > MAX_NAME_SIZE:
+        raise ProtocolError("Invalid player name.")
+    try:
+        return bytes(body).decode("utf-8")
+    except UnicodeDecodeError as e:
+        raise ProtocolError("Invalid player name.") from e
+
+
+MESSAGE_CODECS = {
+    "color": (1, _encode_color, _decode_color),
+    "turn": (2, _encode_flag, _decode_flag),
+    "game_state": (3, _encode_snapshot, _decode_snapshot),
+    "move": (4, _encode_move, _decode_move),
+    "turn_end": (5, _encode_empty, _decode_empty),
+    "state_delta": (6, _encode_delta, _decode_delta),
+    "resync": (7, _encode_empty, _decode_empty),
+    "roll": (8, _encode_empty, _decode_empty),
+    "dice": (9, _encode_dice, _decode_dice),
+    "watch": (10, _encode_room_id, _decode_room_id),
+    "session": (11, _encode_token, _decode_token),
+    "resume": (12, _encode_token, _decode_token),
+    "ping": (13, _encode_empty, _decode_empty),
+    "pong": (14, _encode_empty, _decode_empty),
+    "game_over": (15, _encode_color, _decode_color),
+    "name": (16, _encode_name, _decode_name),
+    "play_bot": (17, _encode_empty, _decode_empty),
+    "join": (18, _encode_empty, _decode_empty),
+    "leave": (19, _encode_empty, _decode_empty),
+    "queue": (20, _encode_empty, _decode_empty),
+}
+MESSAGE_TYPES = {code: (msg_type, decode) for msg_type, (code, _, decode) in MESSAGE_CODECS.items()}
+
+
+def encode_message(msg):
+    """
+    Serializes a message and wraps it into a frame.
+
+    The payload is a one byte message type followed by a compact binary body whose
+    layout depends on the type. Game state snapshots carry a sequence number and the
+    28 byte layout of `state_codec`; state deltas carry a sequence number and only the
+    (slot, value) pairs that changed. A move is three bytes: the source point (24 for
+    the bar), the destination point (-1 when bearing off) and the die used. Moves and
+    state deltas may end with an optional 'trace': a 64-bit trace id and the monotonic
+    time in nanoseconds at which the sender sent the message.
+
+    A message with a 'room' key is routed: its payload is prefixed with the ROUTED code and
+    the 4 byte room id, so one connection can take part in several games at once.
+
+    Parameters:
+        msg (dict): The message to send, containing a 'type' and, depending on the type, a 'data'
+                    and a 'room' key.
+
+    Returns:
+        bytes: The framed message, ready to be written to a socket.
+
+    Raises:
+        ProtocolError: If the message type is unknown.
+    """
+    try:
+        code, encode, _ = MESSAGE_CODECS[msg["type"]]
+    except KeyError as e:
+        raise ProtocolError(f"Unknown message type: {msg.get('type')}") from e
+    room = msg.get("room")
+    prefix = ROUTE.pack(ROUTED, room) if room is not None else b""
+    return encode_frame(prefix + bytes((code,)) + encode(msg.get("data")))
+
+
+def encode_messages(messages):
+    """
+    Serializes several messages into one buffer.
+
+    Lets the caller send a whole batch of messages with a single `sendall`.
+
+    Parameters:
+        messages (iterable of dict): The messages to send.
+
+    Returns:
+        bytes: The concatenated frames.
+    """
+    return b"".join(encode_message(msg) for msg in messages)
+
+
+def route_frames(room_id, frames):
+    """
+    Routes already encoded frames to a room.
+
+    Lets a server encode a message once for every player of a room and route the same
+    frames to each connection that takes part in the room alongside other games.
+
+    Parameters:
+        room_id (int): The id of the room the frames belong to.
+        frames (bytes): One or more concatenated unrouted frames.
+
+    Returns:
+        bytes: The routed frames.
+    """
+    prefix = ROUTE.pack(ROUTED, room_id)
+    routed = []
+    offset = 0
+    while offset < len(frames):
+        (length,) = HEADER.unpack_from(frames, offset)
+        start = offset + HEADER.size
+        routed.append(HEADER.pack(ROUTE.size + length) + prefix + frames[start:start + length])
+        offset = start + length
+    return b"".join(routed)
+
+
+def routed_room(frames):
+    """
+    Finds the room already encoded frames are routed to.
+
+    Parameters:
+        frames (bytes): One or more concatenated frames, as queued for a connection.
+
+    Returns:
+        int: The id of the room the first frame is routed to, or None if it is not routed.
+    """
+    if len(frames) < HEADER.size + ROUTE.size or frames[HEADER.size] != ROUTED:
+        return None
+    return ROUTE.unpack_from(frames, HEADER.size)[1]
+
+
+def decode_message(payload):
+    """
+    Deserializes the payload of a frame back into a message.
+
+    Unlike unpickling, decoding never executes anything on behalf of the peer, so it is
+    safe to use on data received from untrusted sockets. The decoded message never refers
+    to the payload, so a payload that is a view of a receive buffer can be reused afterwards.
+
+    Parameters:
+        payload (bytes-like): The payload of a single frame.
+
+    Returns:
+        dict: The decoded message, with 'type' and 'data' keys, and a 'room' key if it was routed.
+
+    Raises:
+        ProtocolError: If the payload is empty, has an unknown type or a malformed body.
+    """
+    if not payload:
+        raise ProtocolError("Empty message.")
+    room = None
+    if payload[0] == ROUTED:
+        if len(payload) <= ROUTE.size or payload[ROUTE.size] == ROUTED:
+            raise ProtocolError("Invalid routed message.")
+        room = ROUTE.unpack_from(payload)[1]
+        payload = payload[ROUTE.size:]
+    try:
+        msg_type, decode = MESSAGE_TYPES[payload[0]]
+    except KeyError as e:
+        raise ProtocolError(f"Unknown message code: {payload[0]}") from e
+    message = {"type": msg_type, "data": decode(payload[1:])}
+    if room is not None:
+        message["room"] = room
+    return message
+
+
+class FrameDecoder:
+    """
+    Incrementally splits a byte stream into frames, in a buffer allocated up front.
+
+    Sockets receive straight into the free tail of the buffer with `recv_into`, and asyncio
+    transports through a FrameProtocol; bytes read some other way are copied there by
+    `feed`. Iterating over the decoder yields the payload
+    of every complete frame as a memoryview of the buffer, so a message is decoded in place
+    and no bytes are copied before the decoder of its type reads its fields. Incomplete
+    frames stay buffered until the rest of their bytes arrive.
+
+    Consumed bytes are only dropped when the free tail runs out, by moving the unread bytes
+    to the front, so a frame is always contiguous. The buffer only grows to fit a frame
+    larger than itself, which the maximum frame size bounds.
+
+    A payload is only valid until the next call to `feed`, `recv_into` or `tail`; decode it
+    before receiving more.
+    """
+
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE, buffer_size=RECEIVE_BUFFER_SIZE):
+        """
+        Initializes a FrameDecoder with an empty buffer.
+
+        Parameters:
+            max_frame_size (int, optional): The largest payload accepted from the peer.
+                                            Defaults to MAX_FRAME_SIZE.
+            buffer_size (int, optional): The initial size of the buffer in bytes.
+                                         Defaults to RECEIVE_BUFFER_SIZE.
+        """
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+        self.max_frame_size = max_frame_size
+
+    def reserve(self, size):
+        """
+        Makes room for at least `size` more bytes after the buffered ones.
+
+        Parameters:
+            size (int): The number of bytes about to be received.
+        """
+        if len(self.buffer) - self.end >= size:
+            return
+        pending = self.end - self.start
+        if pending + size > len(self.buffer):
+            buffer = bytearray(max(2 * len(self.buffer), pending + size))
+            buffer[:pending] = self.view[self.start:self.end]
+            self.buffer = buffer
+            self.view = memoryview(buffer)
+        else:
+            self.view[:pending] = self.view[self.start:self.end]
+        self.start = 0
+        self.end = pending
+
+    def tail(self):
+        """
+        Makes room for at least RECEIVE_SIZE more bytes and returns the free tail of the buffer.
+
+        Returns:
+            memoryview: The free tail, to receive into before calling `advance`.
+        """
+        self.reserve(RECEIVE_SIZE)
+        return self.view[self.end:]
+
+    def advance(self, count):
+        """
+        Adds the bytes received into the free tail to the buffered ones.
+
+        Parameters:
+            count (int): The number of bytes received.
+        """
+        self.end += count
+
+    def recv_into(self, sock):
+        """
+        Receives bytes from a socket straight into the buffer.
+
+        Parameters:
+            sock (socket.socket): The socket to read from.
+
+        Returns:
+            int: The number of bytes received, 0 if the peer closed the connection.
+        """
+        received = sock.recv_into(self.tail())
+        self.advance(received)
+        return received
+
+    def feed(self, data):
+        """
+        Copies received bytes into the buffer.
+
+        Parameters:
+            data (bytes-like): The bytes received from the socket.
+        """
+        self.reserve(len(data))
+        self.view[self.end:self.end + len(data)] = data
+        self.end += len(data)
+
+    def __iter__(self):
+        """
+        Yields the payload of every complete frame in the buffer.
+
+        Frames that are not consumed by the caller stay buffered for the next iteration.
+
+        Yields:
+            memoryview: The payload of the next complete frame, valid until more bytes
+                        are received.
+
+        Raises:
+            ProtocolError: If the peer announces a frame larger than the allowed maximum.
+        """
+        while self.end - self.start >= HEADER.size:
+            (length,) = HEADER.unpack_from(self.buffer, self.start)
+            if length > self.max_frame_size:
+                raise ProtocolError(f"Frame of {length} bytes exceeds the limit of {self.max_frame_size} bytes.")
+            payload_start = self.start + HEADER.size
+            payload_end = payload_start + length
+            if payload_end > self.end:
+                return
+            self.start = payload_end
+            yield self.view[payload_start:payload_end]
+        if self.start == self.end:
+            self.start = self.end = 0
+
+    def decode(self, data):
+        """
+        Feeds received bytes and decodes every complete message.
+
+        Parameters:
+            data (bytes): The bytes received from the socket.
+
+        Returns:
+            list of dict: The decoded messages, in the order they were sent.
+        """
+        self.feed(data)
+        return [decode_message(payload) for payload in self]
+
+
+class FrameProtocol(asyncio.BufferedProtocol):
+    """
+    Receives the frames of an asyncio connection straight into a FrameDecoder.
+
+    The event loop reads into the free tail of the decoder's buffer, returned by `get_buffer`,
+    and `buffer_updated` advances its end, so no bytes object is allocated per read and the
+    bytes are never copied before decoding. A coroutine waits for data with `receive`, then
+    iterates over the decoder. Writes go straight to the transport; `drain` waits while the
+    transport holds more than its high water mark of unsent bytes.
+    """
+
+    def __init__(self, client_connected_cb=None):
+        """
+        Initializes a FrameProtocol with an empty decoder.
+
+        Parameters:
+            client_connected_cb (coroutine function, optional): Run as a task with the protocol
+                                                                once connected. Defaults to None.
+        """
+        self.decoder = FrameDecoder()
+        self.client_connected_cb = client_connected_cb
+        self.transport = None
+        self.task = None
+        self.received = 0
+        self.closed = False
+        self.readable = asyncio.Event()
+        self.writable = asyncio.Event()
+        self.writable.set()
+
+    def connection_made(self, transport):
+        """
+        Keeps the transport and starts the connected callback, if any.
+        """
+        self.transport = transport
+        if self.client_connected_cb is not None:
+            self.task = asyncio.get_running_loop().create_task(self.client_connected_cb(self))
+
+    def get_buffer(self, sizehint):
+        """
+        Returns the free tail of the decoder's buffer for the event loop to read into.
+        """
+        return self.decoder.tail()
+
+    def buffer_updated(self, nbytes):
+        """
+        Adds the bytes the event loop read to the decoder and wakes the receiving coroutine.
+        """
+        self.decoder.advance(nbytes)
+        self.received += nbytes
+        self.readable.set()
+
+    def eof_received(self):
+        """
+        Marks the connection closed by the peer and lets the transport close.
+        """
+        self.closed = True
+        self.readable.set()
+
+    def connection_lost(self, exc):
+        """
+        Marks the connection closed and wakes the coroutines waiting on it.
+        """
+        self.closed = True
+        self.readable.set()
+        self.writable.set()
+
+    def pause_writing(self):
+        """
+        Makes `drain` wait, as the transport holds too many unsent bytes.
+        """
+        self.writable.clear()
+
+    def resume_writing(self):
+        """
+        Lets `drain` return, as the transport sent enough of its buffered bytes.
+        """
+        self.writable.set()
+
+    async def receive(self):
+        """
+        Waits until bytes were received since the previous call.
+
+        Returns:
+            int: The number of bytes received since the previous call, 0 once the peer
+                 closed the connection and every received byte was reported.
+        """
+        while not self.received and not self.closed:
+            self.readable.clear()
+            await self.readable.wait()
+        received, self.received = self.received, 0
+        return received
+
+    def write(self, data):
+        """
+        Sends bytes to the peer without blocking.
+
+        Parameters:
+            data (bytes): The bytes to send.
+        """
+        self.transport.write(data)
+
+    async def drain(self):
+        """
+        Waits until the transport accepts more data.
+
+        Raises:
+            ConnectionResetError: If the connection is closed.
+        """
+        await self.writable.wait()
+        if self.transport.is_closing():
+            raise ConnectionResetError("Connection lost.")
+
+    def close(self):
+        """
+        Closes the transport, once its buffered bytes are sent.
+        """
+        self.transport.close()
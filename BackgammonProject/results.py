@@ -0,0 +1,327 @@
+import argparse
+import collections
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+RESULTS_DB = "results.db"
+BATCH_SIZE = 256
+BATCH_INTERVAL = 1.0
+MAX_PENDING = 10000
+INITIAL_RATING = 1500.0
+K_FACTOR = 32.0
+BOT_NAME = "bot"
+RESERVED_NAMES = frozenset({BOT_NAME})
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    room_id INTEGER NOT NULL,
+    white TEXT,
+    black TEXT,
+    winner TEXT NOT NULL,
+    forfeit INTEGER NOT NULL,
+    white_pips INTEGER NOT NULL,
+    black_pips INTEGER NOT NULL,
+    moves INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_by_white ON games (white, started_at);
+CREATE INDEX IF NOT EXISTS games_by_black ON games (black, started_at);
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    rating REAL NOT NULL,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS players_by_rating ON players (rating);
+"""
+
+GameResult = collections.namedtuple(
+    "GameResult", "room_id white black winner forfeit white_pips black_pips moves started_at duration")
+
+
+def player_name(name):
+    """
+    Checks the name a client sent for its player.
+
+    The name of the server's bots is reserved, so that no player can take over their
+    rating and history.
+
+    Parameters:
+        name (str): The name sent by the client.
+
+    Returns:
+        str or None: The name, or None if it is empty or reserved, which leaves the player
+                     unnamed and its games unrated.
+    """
+    if name in RESERVED_NAMES:
+        logging.debug(f"Refused the reserved player name {name!r}.")
+        return None
+    return name or None
+
+
+def expected_score(rating, opponent_rating):
+    """
+    Computes the Elo expectation of a player against an opponent.
+
+    Parameters:
+        rating (float): The rating of the player.
+        opponent_rating (float): The rating of the opponent.
+
+    Returns:
+        float: The expected score of the player, between 0 and 1.
+    """
+    return 1.0 / (1.0 + 10.0 ** ((opponent_rating - rating) / 400.0))
+
+
+def update_ratings(winner_rating, loser_rating, k_factor=K_FACTOR):
+    """
+    Applies the result of one game to the Elo ratings of its players.
+
+    Parameters:
+        winner_rating (float): The rating of the winner before the game.
+        loser_rating (float): The rating of the loser before the game.
+        k_factor (float, optional): The largest possible rating change. Defaults to K_FACTOR.
+
+    Returns:
+        tuple: The new ratings of the winner and the loser.
+    """
+    change = k_factor * (1.0 - expected_score(winner_rating, loser_rating))
+    return winner_rating + change, loser_rating - change
+
+
+class ResultStore:
+    """
+    Persists finished games and player ratings in a SQLite database.
+
+    The server only queues results; a writer thread owns the database connection and
+    stores whatever arrived within BATCH_INTERVAL seconds (at most BATCH_SIZE results) in a
+    single transaction, so finishing a game never waits for the disk. Ratings are updated
+    in the same transaction as the game, one game at a time, so they only ever depend on
+    the previous ratings of the two players. Games between unnamed players are stored but
+    not rated. The writer thread also keeps every rating in memory, loaded when the database
+    is opened and updated after each commit, so the server can read them without a query.
+    At most `max_pending` results wait to be written; further results, and every result
+    once the database could not be opened, are dropped and logged rather than kept in memory.
+    """
+
+    def __init__(self, path=RESULTS_DB, batch_size=BATCH_SIZE, batch_interval=BATCH_INTERVAL,
+                 max_pending=MAX_PENDING):
+        """
+        Initializes a ResultStore and starts its writer thread.
+
+        Parameters:
+            path (str, optional): The path of the database. Defaults to RESULTS_DB.
+            batch_size (int, optional): The most results written per transaction. Defaults to BATCH_SIZE.
+            batch_interval (float, optional): The seconds a result may wait for others to be
+                                              written with. Defaults to BATCH_INTERVAL.
+            max_pending (int, optional): The most results waiting to be written. Defaults to MAX_PENDING.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.pending = queue.Queue(max_pending)
+        self.failed = False
+        self.ratings = {}
+        self.writer_thread = threading.Thread(target=self.write_results, daemon=True)
+        self.writer_thread.start()
+
+    def record(self, result):
+        """
+        Queues a finished game to be written, without blocking.
+
+        Parameters:
+            result (GameResult): The result of the game.
+        """
+        if self.failed:
+            logging.warning(f"Dropped the result of room {result.room_id}: the results database is unavailable.")
+            return
+        try:
+            self.pending.put_nowait(result)
+        except queue.Full:
+            logging.warning(f"Dropped the result of room {result.room_id}: {self.pending.maxsize} results "
+                            f"are already waiting to be written.")
+
+    def rating(self, name):
+        """
+        Reads the rating of a player from memory, without blocking.
+
+        Parameters:
+            name (str or None): The name of the player.
+
+        Returns:
+            float: The rating of the player, or INITIAL_RATING if it has not been rated yet.
+        """
+        return self.ratings.get(name, INITIAL_RATING)
+
+    def write_results(self):
+        """
+        Writes the queued results in batches until the store is closed.
+        """
+        try:
+            connection = sqlite3.connect(self.path, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self.ratings.update(connection.execute("SELECT name, rating FROM players"))
+        except sqlite3.Error as e:
+            logging.error(f"Could not open the results database {self.path}: {e}")
+            self.failed = True
+            self.drop_pending()
+            return
+        closed = False
+        while not closed:
+            result = self.pending.get()
+            if result is None:
+                break
+            batch = [result]
+            deadline = time.monotonic() + self.batch_interval
+            while len(batch) < self.batch_size:
+                try:
+                    result = self.pending.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if result is None:
+                    closed = True
+                    break
+                batch.append(result)
+            try:
+                self.write_batch(connection, batch)
+            except sqlite3.Error as e:
+                logging.error(f"Could not store {len(batch)} game results: {e}")
+        connection.close()
+
+    def write_batch(self, connection, batch):
+        """
+        Stores a batch of results and the rating changes they cause in one transaction.
+
+        Parameters:
+            connection (sqlite3.Connection): The connection of the writer thread.
+            batch (list of GameResult): The results to store.
+        """
+        ratings = {}
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT INTO games (room_id, white, black, winner, forfeit, white_pips, black_pips, "
+                "moves, started_at, duration) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            for result in batch:
+                if result.white and result.black and result.white != result.black:
+                    ratings.update(self.rate_game(connection, result))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self.ratings.update(ratings)
+        logging.debug(f"Stored {len(batch)} game results.")
+
+    def rate_game(self, connection, result):
+        """
+        Updates the ratings and records of the two players of a game.
+
+        Parameters:
+            connection (sqlite3.Connection): The connection of the writer thread.
+            result (GameResult): The result of the game.
+
+        Returns:
+            dict: The new ratings of the two players, keyed by name.
+        """
+        winner, loser = (result.white, result.black) if result.winner == "white" else (result.black, result.white)
+        ratings = {}
+        for name in (winner, loser):
+            connection.execute("INSERT OR IGNORE INTO players (name, rating, games, wins) VALUES (?, ?, 0, 0)",
+                               (name, INITIAL_RATING))
+            ratings[name] = connection.execute("SELECT rating FROM players WHERE name = ?", (name,)).fetchone()[0]
+        ratings[winner], ratings[loser] = update_ratings(ratings[winner], ratings[loser])
+        for name in (winner, loser):
+            connection.execute("UPDATE players SET rating = ?, games = games + 1, wins = wins + ? WHERE name = ?",
+                               (ratings[name], name == winner, name))
+        return ratings
+
+    def drop_pending(self):
+        """
+        Discards the results waiting to be written, once they never can be.
+        """
+        dropped = 0
+        while True:
+            try:
+                result = self.pending.get_nowait()
+            except queue.Empty:
+                break
+            if result is not None:
+                dropped += 1
+        if dropped:
+            logging.warning(f"Dropped {dropped} game results that could not be stored.")
+
+    def close(self):
+        """
+        Writes the results still queued and stops the writer thread.
+        """
+        if self.writer_thread.is_alive():
+            self.pending.put(None)
+        self.writer_thread.join()
+
+
+def player_history(connection, name, limit=20):
+    """
+    Looks up the latest games of a player.
+
+    Parameters:
+        connection (sqlite3.Connection): A connection to the results database.
+        name (str): The name of the player.
+        limit (int, optional): The most games returned. Defaults to 20.
+
+    Returns:
+        list of tuple: The start time, color, opponent, winner, move count and duration of
+                       each game, latest first.
+    """
+    return connection.execute(
+        "SELECT started_at, 'white', black, winner, moves, duration FROM games WHERE white = ? "
+        "UNION ALL "
+        "SELECT started_at, 'black', white, winner, moves, duration FROM games WHERE black = ? "
+        "ORDER BY started_at DESC LIMIT ?", (name, name, limit)).fetchall()
+
+
+def top_players(connection, limit=10):
+    """
+    Looks up the best rated players.
+
+    Parameters:
+        connection (sqlite3.Connection): A connection to the results database.
+        limit (int, optional): The number of players returned. Defaults to 10.
+
+    Returns:
+        list of tuple: The name, rating, games and wins of each player, best first.
+    """
+    return connection.execute("SELECT name, rating, games, wins FROM players ORDER BY rating DESC LIMIT ?",
+                              (limit,)).fetchall()
+
+
+def main():
+    """
+    Prints the leaderboard, or the rating and latest games of one player.
+    """
+    parser = argparse.ArgumentParser(description="Show Backgammon ratings and game history.")
+    parser.add_argument("player", nargs="?", help="The player whose games are shown.")
+    parser.add_argument("--db", default=RESULTS_DB, help="The path of the results database.")
+    parser.add_argument("--limit", type=int, default=20, help="The number of rows shown.")
+    args = parser.parse_args()
+    connection = sqlite3.connect(args.db)
+    if args.player is None:
+        for name, rating, games, wins in top_players(connection, args.limit):
+            print(f"{rating:7.1f}  {name}  ({wins}/{games} won)")
+        return
+    row = connection.execute("SELECT rating, games, wins FROM players WHERE name = ?", (args.player,)).fetchone()
+    if row is not None:
+        print(f"{args.player}: rating {row[0]:.1f}, {row[2]}/{row[1]} won")
+    for started_at, color, opponent, winner, moves, duration in player_history(connection, args.player, args.limit):
+        outcome = "won" if winner == color else "lost"
+        print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(started_at))}  {color} vs {opponent or '?'}: "
+              f"{outcome} in {moves} moves, {duration:.0f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1031 @@
+import random
+
+from state_codec import (POINT_COUNT, BAR_WHITE, BAR_BLACK, WHITE_BOREOFF, BLACK_BOREOFF, STATE_SIZE, decode_state,
+                         initial_state)
+
+BAR = 24
+OFF = -1
+COLORS = ("white", "black")
+COLOR_INDEX = {"white": 0, "black": 1}
+OPPONENTS = {"white": "black", "black": "white"}
+SIGNS = {"white": 1, "black": -1}
+BAR_SLOTS = {"white": BAR_WHITE, "black": BAR_BLACK}
+BOREOFF_SLOTS = {"white": WHITE_BOREOFF, "black": BLACK_BOREOFF}
+HOME_POINTS = {"white": range(0, 6), "black": range(18, 24)}
+CHECKERS = 15
+ZOBRIST_SEED = 0x6261636B67616D6D
+
+
+def _build_targets(color):
+    """
+    Precomputes the destination of every (point, die) pair for a color.
+
+    Parameters:
+        color (str): The color of the moving player ("white" or "black").
+
+    Returns:
+        tuple: For each point, then for BAR, a tuple indexed by die value (index 0 unused)
+               holding the destination point, or OFF if the move leaves the board. From the
+               bar, the destination is the entry point of the die.
+    """
+    direction = -1 if color == "white" else 1
+    start = POINT_COUNT if color == "white" else -1
+    targets = []
+    for point in range(POINT_COUNT):
+        row = [None]
+        for die in range(1, 7):
+            target = point + direction * die
+            row.append(target if 0 <= target < POINT_COUNT else OFF)
+        targets.append(tuple(row))
+    targets.append((None,) + tuple(start + direction * die for die in range(1, 7)))
+    return tuple(targets)
+
+
+def _build_bear_off_masks(color):
+    """
+    Precomputes what every (point, die) pair needs to bear a checker off, for a color.
+
+    A die equal to the distance of the checker to the end of the board always bears it off
+    once the color may bear off; a higher die only does if no checker of the color stands
+    farther from the end.
+
+    Parameters:
+        color (str): The color of the moving player ("white" or "black").
+
+    Returns:
+        tuple: For each point, then for BAR, a tuple indexed by die value (index 0 unused)
+               holding the bitmask of the points that must hold no checker of the color,
+               0 for an exact die, or None if the move does not leave the board.
+    """
+    home = HOME_POINTS[color]
+    masks = []
+    for point in range(POINT_COUNT):
+        pips = PIPS_TO_OFF[color][point]
+        farther = sum(1 << other for other in home if PIPS_TO_OFF[color][other] > pips)
+        row = [None]
+        for die in range(1, 7):
+            if point not in home or die < pips:
+                row.append(None)
+            else:
+                row.append(0 if die == pips else farther)
+        masks.append(tuple(row))
+    masks.append((None,) * 7)
+    return tuple(masks)
+
+
+PIPS_TO_OFF = {
+    "white": tuple(point + 1 for point in range(POINT_COUNT)),
+    "black": tuple(POINT_COUNT - point for point in range(POINT_COUNT)),
+}
+SOURCE_PIPS = {color: PIPS_TO_OFF[color] + (25,) for color in COLORS}
+TARGETS = {color: _build_targets(color) for color in COLORS}
+BEAR_OFF_MASKS = {color: _build_bear_off_masks(color) for color in COLORS}
+BOARD_MASK = (1 << POINT_COUNT) - 1
+HOME_MASKS = {color: sum(1 << point for point in HOME_POINTS[color]) for color in COLORS}
+OUTSIDE_HOME_MASKS = {color: BOARD_MASK & ~HOME_MASKS[color] for color in COLORS}
+VIEW_POINTS = {
+    "white": {point: point for point in range(OFF, BAR + 1)},
+    "black": {point: (point if point in (OFF, BAR) else POINT_COUNT - 1 - point) for point in range(OFF, BAR + 1)},
+}
+
+
+def _build_zobrist():
+    """
+    Draws the random keys of the Zobrist hash of a position.
+
+    The generator is seeded with a constant, so a position hashes to the same value in
+    every process and hashes can be stored.
+
+    Returns:
+        tuple: For each slot of the state, a tuple of 2 * CHECKERS + 1 64-bit keys indexed
+               by the signed count of the slot, negative counts wrapping around to the end.
+    """
+    rng = random.Random(ZOBRIST_SEED)
+    return tuple(tuple(rng.getrandbits(64) for _ in range(2 * CHECKERS + 1)) for _ in range(STATE_SIZE))
+
+
+ZOBRIST = _build_zobrist()
+
+
+def zobrist_hash(state):
+    """
+    Computes the Zobrist hash of a state from scratch.
+
+    Parameters:
+        state (array): The decoded state, from white's point of view.
+
+    Returns:
+        int: The 64-bit hash, the XOR of the key of every slot's count.
+    """
+    zobrist = 0
+    for slot, count in enumerate(state):
+        zobrist ^= ZOBRIST[slot][count]
+    return zobrist
+
+
+def occupancy_masks(state):
+    """
+    Computes the bitmasks of the points held by each color from scratch.
+
+    Bit n of a mask stands for point n, from white's point of view.
+
+    Parameters:
+        state (array): The decoded state, from white's point of view.
+
+    Returns:
+        tuple: The masks of the points holding at least one checker of white and of black,
+               then the masks of the points holding at least two, in the order of COLORS.
+    """
+    occupied = [0, 0]
+    made = [0, 0]
+    for point in range(POINT_COUNT):
+        count = state[point]
+        if count:
+            side = 0 if count > 0 else 1
+            occupied[side] |= 1 << point
+            if count >= 2 or count <= -2:
+                made[side] |= 1 << point
+    return tuple(occupied), tuple(made)
+
+
+def mask_points(mask):
+    """
+    Lists the points of a bitmask.
+
+    Parameters:
+        mask (int): The bitmask, bit n standing for point n.
+
+    Returns:
+        list of int: The points whose bit is set, in ascending order.
+    """
+    points = []
+    while mask:
+        lowest = mask & -mask
+        points.append(lowest.bit_length() - 1)
+        mask ^= lowest
+    return points
+
+
+def to_board_point(color, point):
+    """
+    Converts a point from a player's point of view to white's point of view.
+
+    Every client sees its own pieces moving towards triangle 0; the server keeps the board
+    from white's point of view, so black's points are mirrored. BAR and OFF are unchanged.
+
+    Parameters:
+        color (str): The color of the player who sent the point.
+        point (int): The point from the player's point of view (OFF, 0-23 or BAR).
+
+    Returns:
+        int or None: The point from white's point of view, or None if the point does not exist.
+    """
+    return VIEW_POINTS[color].get(point)
+
+
+class Position:
+    """
+    An immutable Backgammon position and the rules of moving checkers in it, without any GUI.
+
+    The position holds the 28 signed counts of the state encoding, from white's point of
+    view, in a compact array that is never changed once the position is built, along with
+    a 64-bit Zobrist hash of the counts and, for each color, a 24-bit mask of the points
+    it occupies and one of the points it has made with two checkers or more. Applying a
+    move returns a new position: the array is copied in one step and the hash and the masks
+    are updated from the few slots the move changes. Positions compare equal when their
+    counts do, so they can be shared freely and used as dict keys by searches and caches.
+
+    The destination of every move, the entry points from the bar and the bear off distances
+    come from precomputed tables, and whether a point is blocked, whether a color may bear
+    off and whether a bear off is allowed are ANDs of the masks, so checking and applying a
+    move costs the same regardless of the position.
+
+    The servers, the bots, the client and the journal replay all play through it, and
+    importing it loads no GUI.
+    """
+
+    __slots__ = ("state", "occupied", "made", "zobrist")
+
+    def __init__(self, state=None):
+        """
+        Initializes a Position.
+
+        Parameters:
+            state (array or bytes, optional): The state to copy, decoded or encoded.
+                                              Defaults to the starting position.
+        """
+        if state is None:
+            state = initial_state()
+        self.state = decode_state(state) if isinstance(state, (bytes, bytearray, memoryview)) else state[:]
+        self.occupied, self.made = occupancy_masks(self.state)
+        self.zobrist = zobrist_hash(self.state)
+
+    def __eq__(self, other):
+        """
+        Compares two positions by their checkers.
+
+        Parameters:
+            other (object): The object to compare with.
+
+        Returns:
+            bool: True if both positions hold the same counts, False otherwise.
+        """
+        if not isinstance(other, Position):
+            return NotImplemented
+        return self.zobrist == other.zobrist and self.state == other.state
+
+    def __hash__(self):
+        """
+        Hashes the position.
+
+        Returns:
+            int: The Zobrist hash of the position.
+        """
+        return self.zobrist
+
+    def __repr__(self):
+        """
+        Describes the position.
+
+        Returns:
+            str: The counts of the position and its hash.
+        """
+        return f"Position({list(self.state)}, zobrist={self.zobrist:#018x})"
+
+    def to_bytes(self):
+        """
+        Encodes the position.
+
+        Returns:
+            bytes: The 28 bytes of the state encoding.
+        """
+        return self.state.tobytes()
+
+    def checkers(self, color, point):
+        """
+        Counts the checkers of a color on a point.
+
+        Parameters:
+            color (str): The color to count.
+            point (int): The point, from white's point of view.
+
+        Returns:
+            int: The number of checkers, 0 if the point is empty or held by the opponent.
+        """
+        count = self.state[point] * SIGNS[color]
+        return count if count > 0 else 0
+
+    def on_bar(self, color):
+        """
+        Counts the checkers of a color on the bar.
+
+        Parameters:
+            color (str): The color to count.
+
+        Returns:
+            int: The number of checkers waiting to enter.
+        """
+        return self.state[BAR_SLOTS[color]]
+
+    def borne_off(self, color):
+        """
+        Counts the checkers a color has borne off.
+
+        Parameters:
+            color (str): The color to count.
+
+        Returns:
+            int: The number of checkers borne off.
+        """
+        return self.state[BOREOFF_SLOTS[color]]
+
+    def can_bear_off(self, color):
+        """
+        Checks if all the checkers of a color that are still in play are in its home board.
+
+        Parameters:
+            color (str): The color to check.
+
+        Returns:
+            bool: True if the color may bear off, False otherwise.
+        """
+        return not self.occupied[COLOR_INDEX[color]] & OUTSIDE_HOME_MASKS[color] and self.state[BAR_SLOTS[color]] == 0
+
+    def target_for(self, color, source, die):
+        """
+        Finds where a checker lands when moved with a die, if the move is legal.
+
+        Parameters:
+            color (str): The color of the moving player.
+            source (int): The point the checker leaves, or BAR.
+            die (int): The die value used.
+
+        Returns:
+            int or None: The destination point or OFF, or None if the move is illegal.
+        """
+        index = COLOR_INDEX[color]
+        if self.state[BAR_SLOTS[color]] > 0:
+            if source != BAR:
+                return None
+        elif not 0 <= source < POINT_COUNT or not self.occupied[index] >> source & 1:
+            return None
+        target = TARGETS[color][source][die]
+        if target == OFF:
+            if not self.can_bear_off(color) or self.occupied[index] & BEAR_OFF_MASKS[color][source][die]:
+                return None
+            return OFF
+        if self.made[1 - index] >> target & 1:
+            return None
+        return target
+
+    def apply_move(self, color, source, target, die):
+        """
+        Plays a legal move, hitting a lone opposing checker on the destination point.
+
+        The position itself is left unchanged.
+
+        Parameters:
+            color (str): The color of the moving player.
+            source (int): The point the checker leaves, or BAR, from white's point of view.
+            target (int): The point the checker lands on, or OFF, from white's point of view.
+            die (int): The die value used.
+
+        Returns:
+            tuple: The Position after the move and the list of the slots of the state that changed.
+        """
+        state = self.state[:]
+        zobrist = self.zobrist
+        sign = SIGNS[color]
+        index = COLOR_INDEX[color]
+        occupied = self.occupied[index]
+        made = self.made[index]
+        opponent_occupied = self.occupied[1 - index]
+
+        changes = [(BAR_SLOTS[color], -1) if source == BAR else (source, -sign)]
+        if target == OFF:
+            changes.append((BOREOFF_SLOTS[color], 1))
+        elif state[target] == -sign:
+            changes.append((BAR_SLOTS[OPPONENTS[color]], 1))
+            changes.append((target, 2 * sign))
+            opponent_occupied &= ~(1 << target)
+        else:
+            changes.append((target, sign))
+
+        slots = []
+        for slot, delta in changes:
+            count = state[slot]
+            zobrist ^= ZOBRIST[slot][count]
+            count += delta
+            state[slot] = count
+            zobrist ^= ZOBRIST[slot][count]
+            slots.append(slot)
+            if slot < POINT_COUNT:
+                bit = 1 << slot
+                held = count * sign
+                occupied = occupied | bit if held > 0 else occupied & ~bit
+                made = made | bit if held >= 2 else made & ~bit
+
+        position = Position.__new__(Position)
+        position.state = state
+        position.zobrist = zobrist
+        if index == 0:
+            position.occupied = (occupied, opponent_occupied)
+            position.made = (made, self.made[1])
+        else:
+            position.occupied = (opponent_occupied, occupied)
+            position.made = (self.made[0], made)
+        return position, slots
+
+    def single_moves(self, color, dice):
+        """
+        Lists the moves a color can make with one of the given dice, taken on their own.
+
+        Does not look at the rest of the turn, so some of these moves may leave dice that
+        could have been played unplayable; legal_moves leaves those out.
+
+        Parameters:
+            color (str): The color to move.
+            dice (list of int): The dice left to play.
+
+        Returns:
+            list of tuple: The (source, target, die) moves, from white's point of view.
+        """
+        sources = [BAR] if self.state[BAR_SLOTS[color]] > 0 else mask_points(self.occupied[COLOR_INDEX[color]])
+        moves = []
+        for die in set(dice):
+            for source in sources:
+                target = self.target_for(color, source, die)
+                if target is not None:
+                    moves.append((source, target, die))
+        return moves
+
+    def search_plays(self, color, dice, leaves=None):
+        """
+        Walks the sequences of moves a color can play with the given dice.
+
+        The walk plays and takes back moves on a single scratch copy of the state, keeping
+        the Zobrist hash and the masks of the moving color up to date, instead of building a
+        Position at every step. A Position is only built for a sequence that cannot go
+        further and ends on a hash not seen yet.
+
+        When all the dice are equal, only the sequences that move the checkers farthest from
+        home first are walked. Any set of moves of a double can be played in that order, since
+        moving a checker never blocks a point for its own color, so the other orders would
+        only reach the same positions again.
+
+        Parameters:
+            color (str): The color to move.
+            dice (list of int): The dice left to play.
+            leaves (dict, optional): Filled with the Zobrist hash of the position ending every
+                                     sequence that cannot go further, mapped to the tuple of
+                                     its moves and that Position. Defaults to None, which
+                                     stops at the first sequence using all the dice.
+
+        Returns:
+            int: The number of dice the longest sequences use.
+        """
+        equal = len(set(dice)) == 1
+        pips = SOURCE_PIPS[color]
+        sign = SIGNS[color]
+        index = COLOR_INDEX[color]
+        bar_slot = BAR_SLOTS[color]
+        boreoff_slot = BOREOFF_SLOTS[color]
+        opponent_bar_slot = BAR_SLOTS[OPPONENTS[color]]
+        targets = TARGETS[color]
+        bear_off_masks = BEAR_OFF_MASKS[color]
+        outside_home = OUTSIDE_HOME_MASKS[color]
+        # Moving never makes or breaks an opposing point: a hit only takes a lone checker.
+        blocked = self.made[1 - index]
+        state = self.state[:]
+        zobrist = self.zobrist
+        occupied = self.occupied[index]
+        made = self.made[index]
+        opponent_occupied = self.occupied[1 - index]
+
+        def add(slot, delta):
+            nonlocal zobrist
+            count = state[slot]
+            zobrist ^= ZOBRIST[slot][count] ^ ZOBRIST[slot][count + delta]
+            state[slot] = count + delta
+
+        def play(source, target):
+            nonlocal occupied, made, opponent_occupied
+            if source == BAR:
+                add(bar_slot, -1)
+            else:
+                add(source, -sign)
+                held = state[source] * sign
+                if held == 0:
+                    occupied &= ~(1 << source)
+                elif held == 1:
+                    made &= ~(1 << source)
+            if target == OFF:
+                add(boreoff_slot, 1)
+                return False
+            hit = state[target] == -sign
+            if hit:
+                add(opponent_bar_slot, 1)
+                add(target, 2 * sign)
+                opponent_occupied &= ~(1 << target)
+            else:
+                add(target, sign)
+            occupied |= 1 << target
+            if state[target] * sign == 2:
+                made |= 1 << target
+            return hit
+
+        def take_back(source, target, hit):
+            nonlocal occupied, made, opponent_occupied
+            if target != OFF:
+                if state[target] * sign == 2:
+                    made &= ~(1 << target)
+                if hit:
+                    add(target, -2 * sign)
+                    add(opponent_bar_slot, -1)
+                    opponent_occupied |= 1 << target
+                else:
+                    add(target, -sign)
+                if state[target] == 0 or hit:
+                    occupied &= ~(1 << target)
+            else:
+                add(boreoff_slot, -1)
+            if source == BAR:
+                add(bar_slot, 1)
+            else:
+                add(source, sign)
+                occupied |= 1 << source
+                if state[source] * sign == 2:
+                    made |= 1 << source
+
+        def single_moves(remaining):
+            if state[bar_slot] > 0:
+                sources = (BAR,)
+                can_bear_off = False
+            else:
+                sources = mask_points(occupied)
+                can_bear_off = not occupied & outside_home
+            moves = []
+            for die in set(remaining):
+                for source in sources:
+                    target = targets[source][die]
+                    if target == OFF:
+                        if not can_bear_off or occupied & bear_off_masks[source][die]:
+                            continue
+                    elif blocked >> target & 1:
+                        continue
+                    moves.append((source, target, die))
+            return moves
+
+        def record(moves):
+            if zobrist in leaves:
+                return
+            position = Position.__new__(Position)
+            position.state = state[:]
+            position.zobrist = zobrist
+            if index == 0:
+                position.occupied = (occupied, opponent_occupied)
+                position.made = (made, blocked)
+            else:
+                position.occupied = (opponent_occupied, occupied)
+                position.made = (blocked, made)
+            leaves[zobrist] = (moves, position)
+
+        def moved_hash(source, target):
+            count = state[bar_slot] if source == BAR else state[source]
+            slot = bar_slot if source == BAR else source
+            key = zobrist ^ ZOBRIST[slot][count] ^ ZOBRIST[slot][count - (1 if source == BAR else sign)]
+            if target == OFF:
+                count = state[boreoff_slot]
+                return key ^ ZOBRIST[boreoff_slot][count] ^ ZOBRIST[boreoff_slot][count + 1]
+            count = state[target]
+            if count == -sign:
+                bar = state[opponent_bar_slot]
+                key ^= ZOBRIST[opponent_bar_slot][bar] ^ ZOBRIST[opponent_bar_slot][bar + 1]
+                return key ^ ZOBRIST[target][count] ^ ZOBRIST[target][sign]
+            return key ^ ZOBRIST[target][count] ^ ZOBRIST[target][count + sign]
+
+        def search(remaining, moves, ceiling):
+            options = [move for move in single_moves(remaining) if pips[move[0]] <= ceiling] if remaining else ()
+            if not options:
+                if leaves is not None:
+                    record(moves)
+                return 0
+            if len(remaining) == 1:
+                # The last die ends every sequence: its positions are only built when new.
+                if leaves is not None:
+                    for source, target, die in options:
+                        if moved_hash(source, target) not in leaves:
+                            hit = play(source, target)
+                            record(moves + ((source, target, die),))
+                            take_back(source, target, hit)
+                return 1
+            most = 0
+            for move in options:
+                source, target, die = move
+                hit = play(source, target)
+                at = remaining.index(die)
+                played = 1 + search(remaining[:at] + remaining[at + 1:], moves + (move,),
+                                    pips[source] if equal else ceiling)
+                take_back(source, target, hit)
+                if played > most:
+                    most = played
+                    if leaves is None and most == len(remaining):
+                        break
+            return most
+
+        return search(tuple(dice), (), pips[BAR])
+
+    def legal_plays(self, color, dice):
+        """
+        Lists every legal way for a color to play a roll, one entry per resulting position.
+
+        A play must use as many of the dice as possible, four for a double, and if only one
+        of two different dice can be used it must be the higher one whenever that one can be
+        played. Entering from the bar and bearing off follow the same rules as single moves.
+        Plays leading to the same position, such as the same checkers moved in another
+        order, are kept once.
+
+        Parameters:
+            color (str): The color to move.
+            dice (list of int): The dice to play.
+
+        Returns:
+            list of tuple: For each play, the tuple of its (source, target, die) moves in
+                           order, from white's point of view, and the Position it leads to.
+                           A roll that cannot be played yields a single empty play.
+        """
+        leaves = {}
+        most = self.search_plays(color, dice, leaves)
+        if most == 1 and len(set(dice)) == 2:
+            # Both dice may reach the same position, e.g. bearing off the last checker, and
+            # the search keeps whichever came first, so the plays are rebuilt from the die
+            # the rule allows.
+            moves = self.single_moves(color, [max(dice)]) or self.single_moves(color, [min(dice)])
+            plays = {}
+            for move in moves:
+                after, _ = self.apply_move(color, *move)
+                plays.setdefault(after, ((move,), after))
+            return list(plays.values())
+        return [(moves, position) for moves, position in leaves.values() if len(moves) == most]
+
+    def legal_moves(self, color, dice):
+        """
+        Lists the moves a color can make next with the given dice.
+
+        Only the moves that start a legal play of the whole roll are listed, so a move that
+        would leave a die unplayable while another move uses them all is left out.
+
+        Parameters:
+            color (str): The color to move.
+            dice (list of int): The dice left to play.
+
+        Returns:
+            list of tuple: The legal (source, target, die) moves, from white's point of view.
+        """
+        moves = self.single_moves(color, dice)
+        if not moves or len(dice) == 1:
+            return moves
+        remaining = list(dice)
+        played = []
+        for move in moves:
+            after, _ = self.apply_move(color, *move)
+            remaining.remove(move[2])
+            played.append(1 + after.search_plays(color, remaining))
+            remaining.append(move[2])
+        most = max(played)
+        moves = [move for move, count in zip(moves, played) if count == most]
+        if most == 1 and len(set(dice)) == 2:
+            higher = [move for move in moves if move[2] == max(dice)]
+            if higher:
+                return higher
+        return moves
+
+    def is_legal_move(self, color, dice, move):
+        """
+        Checks if a move starts a legal play of the given dice.
+
+        Cheaper than looking the move up in legal_moves when, as usual, the move still lets
+        every die be played, since that is settled by a single search stopping at the first
+        sequence that uses them all.
+
+        Parameters:
+            color (str): The color to move.
+            dice (list of int): The dice left to play.
+            move (tuple): The (source, target, die) move, from white's point of view.
+
+        Returns:
+            bool: True if the move is legal, False otherwise.
+        """
+        source, target, die = move
+        if die not in dice or self.target_for(color, source, die) != target:
+            return False
+        if len(dice) == 1:
+            return True
+        after, _ = self.apply_move(color, source, target, die)
+        remaining = list(dice)
+        remaining.remove(die)
+        if after.search_plays(color, remaining) == len(remaining):
+            return True
+        return move in self.legal_moves(color, dice)
+
+    def has_legal_move(self, color, dice):
+        """
+        Checks if a color can use any of the given dice.
+
+        Parameters:
+            color (str): The color to check.
+            dice (list of int): The dice left to play.
+
+        Returns:
+            bool: True if at least one legal move exists, False otherwise.
+        """
+        dice = set(dice)
+        if not dice:
+            return False
+        if self.state[BAR_SLOTS[color]] > 0:
+            return any(self.target_for(color, BAR, die) is not None for die in dice)
+        return any(
+            self.target_for(color, point, die) is not None
+            for point in mask_points(self.occupied[COLOR_INDEX[color]])
+            for die in dice
+        )
+
+    def pip_count(self, color):
+        """
+        Counts the pips a color still has to move to bear off all its checkers.
+
+        Parameters:
+            color (str): The color to count for.
+
+        Returns:
+            int: The total distance to bear off, counting 25 pips per checker on the bar.
+        """
+        state = self.state
+        sign = SIGNS[color]
+        pips = PIPS_TO_OFF[color]
+        total = 25 * state[BAR_SLOTS[color]]
+        for point in mask_points(self.occupied[COLOR_INDEX[color]]):
+            total += state[point] * sign * pips[point]
+        return total
+
+    def blots(self, color):
+        """
+        Finds the points where a color has a single checker, open to being hit.
+
+        Parameters:
+            color (str): The color to look at.
+
+        Returns:
+            int: The bitmask of the points, bit n standing for point n.
+        """
+        index = COLOR_INDEX[color]
+        return self.occupied[index] & ~self.made[index]
+
+    def prime_length(self, color):
+        """
+        Measures the longest run of consecutive points a color has made.
+
+        Every step ANDs the made points with themselves shifted by one point, which only
+        keeps the points that start a run one point longer, so the loop runs once per point
+        of the longest run.
+
+        Parameters:
+            color (str): The color to look at.
+
+        Returns:
+            int: The length of the longest run, 6 for a full prime.
+        """
+        run = self.made[COLOR_INDEX[color]]
+        length = 0
+        while run:
+            run &= run >> 1
+            length += 1
+        return length
+
+    def home_points_made(self, color):
+        """
+        Counts the points a color has made in its home board, where the opponent's checkers
+        on the bar have to enter.
+
+        Parameters:
+            color (str): The color to look at.
+
+        Returns:
+            int: The number of made home points, 6 for a closed board.
+        """
+        return bin(self.made[COLOR_INDEX[color]] & HOME_MASKS[color]).count("1")
+
+    def winner(self):
+        """
+        Finds the color that has borne off all its checkers, if any.
+
+        Returns:
+            str or None: The winning color, or None if both still have checkers in play.
+        """
+        for color in COLORS:
+            if self.state[BOREOFF_SLOTS[color]] == CHECKERS:
+                return color
+        return None
+
+
+class Game:
+    """
+    Plays one game on a Position: whose turn it is, the dice and the moves they allow.
+
+    A Game has no notion of players or connections, so the servers, the local game of the
+    client, the bots and headless simulations all drive the same rules through it.
+    """
+
+    def __init__(self, position=None, rng=None):
+        """
+        Initializes a Game with white to roll.
+
+        Parameters:
+            position (Position, optional): The position to play on. Defaults to the starting position.
+            rng (random.Random, optional): The generator used to roll the dice. Defaults to a new one.
+        """
+        self.position = position if position is not None else Position()
+        self.rng = rng or random.Random()
+        self.turn_color = "white"
+        self.dice = []
+        self.has_rolled = False
+        self.forfeited = None
+
+    def roll(self):
+        """
+        Rolls the dice for the player whose turn it is.
+
+        Returns:
+            list of int: The dice to play, four times the same value for doubles.
+        """
+        d1 = self.rng.randint(1, 6)
+        d2 = self.rng.randint(1, 6)
+        self.set_dice([d1, d2])
+        return list(self.dice)
+
+    def set_dice(self, rolled):
+        """
+        Sets the dice of the current turn from two rolled values.
+
+        Parameters:
+            rolled (list of int): The two values rolled.
+        """
+        d1, d2 = rolled
+        self.dice = [d1, d1, d1, d1] if d1 == d2 else [d1, d2]
+        self.has_rolled = True
+
+    def end_turn(self):
+        """
+        Passes the turn to the other color and clears the dice.
+        """
+        self.turn_color = OPPONENTS[self.turn_color]
+        self.dice = []
+        self.has_rolled = False
+
+    def forfeit(self, color):
+        """
+        Ends the game with a loss for a color, for instance when its clock runs out.
+
+        Parameters:
+            color (str): The color that forfeits.
+        """
+        self.forfeited = color
+        self.dice = []
+        self.has_rolled = False
+
+    def can_bear_off(self, color):
+        """
+        Checks if all the checkers of a color that are still in play are in its home board.
+
+        Parameters:
+            color (str): The color to check.
+
+        Returns:
+            bool: True if the color may bear off, False otherwise.
+        """
+        return self.position.can_bear_off(color)
+
+    def target_for(self, color, source, die):
+        """
+        Finds where a checker lands when moved with a die, if the move is legal.
+
+        Parameters:
+            color (str): The color of the moving player.
+            source (int): The point the checker leaves, or BAR.
+            die (int): The die value used.
+
+        Returns:
+            int or None: The destination point or OFF, or None if the move is illegal.
+        """
+        return self.position.target_for(color, source, die)
+
+    def validate_move(self, color, source, target, die):
+        """
+        Checks a move sent by a player.
+
+        Parameters:
+            color (str): The color of the player who sent the move.
+            source (int): The point the checker leaves, or BAR, from white's point of view.
+            target (int): The point the checker lands on, or OFF, from white's point of view.
+            die (int): The die value the player used.
+
+        Returns:
+            str or None: The reason why the move is rejected, or None if it is legal.
+        """
+        if self.winner() is not None:
+            return "the game is over"
+        if color != self.turn_color:
+            return "not this player's turn"
+        if not self.has_rolled:
+            return "dice not rolled"
+        if die not in self.dice:
+            return f"die {die} not available"
+        expected = self.position.target_for(color, source, die)
+        if expected is None:
+            return f"no legal move from {source} with {die}"
+        if expected != target:
+            return f"moving from {source} with {die} lands on {expected}, not {target}"
+        if not self.position.is_legal_move(color, self.dice, (source, target, die)):
+            return f"moving from {source} with {die} leaves dice unplayed that another move would use"
+        return None
+
+    def apply_move(self, color, source, target, die):
+        """
+        Applies a validated move and uses its die.
+
+        Replaces the position of the game with the one after the move.
+
+        Parameters:
+            color (str): The color of the moving player.
+            source (int): The point the checker leaves, or BAR, from white's point of view.
+            target (int): The point the checker lands on, or OFF, from white's point of view.
+            die (int): The die value used.
+
+        Returns:
+            list of int: The slots of the state that changed.
+        """
+        self.position, slots = self.position.apply_move(color, source, target, die)
+        self.dice.remove(die)
+        return slots
+
+    def legal_moves(self, color):
+        """
+        Lists the moves a color can make with one of its remaining dice.
+
+        Parameters:
+            color (str): The color to move.
+
+        Returns:
+            list of tuple: The legal (source, target, die) moves, from white's point of view.
+        """
+        return self.position.legal_moves(color, self.dice)
+
+    def legal_plays(self, color):
+        """
+        Lists every legal way for a color to play its remaining dice, one per resulting position.
+
+        Parameters:
+            color (str): The color to move.
+
+        Returns:
+            list of tuple: For each play, the tuple of its (source, target, die) moves and the
+                           Position it leads to.
+        """
+        return self.position.legal_plays(color, self.dice)
+
+    def has_legal_move(self, color):
+        """
+        Checks if a color can still use any of its remaining dice.
+
+        Parameters:
+            color (str): The color to check.
+
+        Returns:
+            bool: True if at least one legal move exists, False otherwise.
+        """
+        return self.position.has_legal_move(color, self.dice)
+
+    def pip_count(self, color):
+        """
+        Counts the pips a color still has to move to bear off all its checkers.
+
+        Parameters:
+            color (str): The color to count for.
+
+        Returns:
+            int: The total distance to bear off, counting 25 pips per checker on the bar.
+        """
+        return self.position.pip_count(color)
+
+    def winner(self):
+        """
+        Finds the color that has borne off all its checkers or whose opponent forfeited, if any.
+
+        Returns:
+            str or None: The winning color, or None if the game is still running.
+        """
+        if self.forfeited is not None:
+            return OPPONENTS[self.forfeited]
+        return self.position.winner()
+
+
+class RulesEngine(Game):
+    """
+    Validates and applies the moves of one game on the server.
+
+    Plays on a copy of the authoritative VersionedState of the game, from white's point of
+    view, and writes the slots changed by every move back to it and commits them, so the
+    change can be sent to the players.
+    """
+
+    def __init__(self, game_state, rng=None):
+        """
+        Initializes a RulesEngine for a game.
+
+        Parameters:
+            game_state (VersionedState): The authoritative state of the game.
+            rng (random.Random, optional): The generator used to roll the dice. Defaults to a new one.
+        """
+        super().__init__(Position(game_state.state), rng)
+        self.game_state = game_state
+
+    def apply_move(self, color, source, target, die):
+        """
+        Applies a validated move and records it in the game state.
+
+        Hits a lone opposing checker on the destination point and uses the die.
+
+        Parameters:
+            color (str): The color of the moving player.
+            source (int): The point the checker leaves, or BAR, from white's point of view.
+            target (int): The point the checker lands on, or OFF, from white's point of view.
+            die (int): The die value used.
+
+        Returns:
+            list of tuple: The (slot, value) pairs that changed, from white's point of view.
+        """
+        slots = super().apply_move(color, source, target, die)
+        state = self.position.state
+        for slot in slots:
+            self.game_state.state[slot] = state[slot]
+        return self.game_state.commit(slots)
@@ -1,40 +1,173 @@
-import pickle
+import concurrent.futures
+import queue
+import secrets
 import socket
 import threading
+import time
 import logging
 
+from journal import FSYNC_INTERVAL, GAME_OVER, JOURNAL_DIR, MOVE, ROLL, TURN, open_journal, sync_journals
+from metrics import COUNT_BUCKETS, STATS_LOG_INTERVAL, MetricsRegistry, serve_stats
+from protocol import SESSION_TOKEN_SIZE, FrameDecoder, encode_message, encode_messages, decode_message
+from results import RESULTS_DB, GameResult, ResultStore, player_name
+from rules import RulesEngine, to_board_point
+from state_sync import VersionedState
+from timers import TimerHeap, TimerWheel
+from tracing import SERVER_PROCESS, Tracer, new_trace
+from turn_clock import DEFAULT_TURN_CLOCK, TurnClock
+
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
 
+OUTBOUND_QUEUE_LIMIT = 256
+SEND_TIMEOUT = 10.0
+SPECTATOR_LAG_LIMIT = 64
+SEAT_GRACE_PERIOD = 60.0
+PING_INTERVAL = 15.0
+IDLE_TIMEOUT = 45.0
+PING_MESSAGE = encode_message({"type": "ping"})
+PONG_MESSAGE = encode_message({"type": "pong"})
+SPECTATOR_MESSAGE = encode_message({"type": "color", "data": "spectator"})
+TURN_MESSAGES = {flag: encode_message({"type": "turn", "data": flag}) for flag in (True, False)}
+
 
-class Triangle:
+class ClientConnection:
     """
-    Represents a triangle (point) on the Backgammon board.
+    Represents a client connected to the Game Server.
 
-    Each triangle can hold a number of white and black pieces.
+    Outgoing messages are already encoded frames that are put in a bounded queue and sent
+    by a dedicated writer thread, so a broadcast never blocks the thread of the client who
+    made the move. A client whose queue overflows, or whose socket does not accept data
+    within SEND_TIMEOUT, is dropped.
     """
 
-    def __init__(self, index):
+    def __init__(self, client_socket, addr, queue_limit=OUTBOUND_QUEUE_LIMIT, metrics=None):
         """
-        Initializes a Triangle instance.
+        Initializes a ClientConnection and starts its writer thread.
 
-        Sets up the triangle with no pieces initially.
+        Parameters:
+            client_socket (socket.socket): The socket connected to the client.
+            addr (tuple): The address of the connected client.
+            queue_limit (int, optional): The number of queued messages after which the client
+                                         is dropped. Defaults to OUTBOUND_QUEUE_LIMIT.
+            metrics (MetricsRegistry, optional): The registry counting the bytes sent and the
+                                                 messages per send. Defaults to a private one.
+        """
+        self.socket = client_socket
+        self.addr = addr
+        self.outbound = queue.Queue(maxsize=queue_limit)
+        self.closed = False
+        self.last_seen = time.monotonic()
+        self.heartbeat = None
+        self.socket.settimeout(SEND_TIMEOUT)
+        metrics = metrics or MetricsRegistry()
+        self.bytes_out = metrics.counter("bytes_out")
+        self.write_batches = metrics.histogram("write_batch_messages", COUNT_BUCKETS)
+        self.writer_thread = threading.Thread(target=self.write_outbound, daemon=True)
+        self.writer_thread.start()
+
+    def send(self, message):
+        """
+        Queues an encoded message for the client without blocking.
 
         Parameters:
-            index (int): The index of the triangle (0-23).
+            message (bytes): The framed message to send.
+
+        Returns:
+            bool: True if the message was queued, False if the client is closed or was dropped.
+        """
+        if self.closed:
+            return False
+        try:
+            self.outbound.put_nowait(message)
+            return True
+        except queue.Full:
+            logging.warning(f"Dropping slow client {self.addr}: outbound queue is full.")
+            self.close()
+            return False
+
+    def catch_up(self, message):
+        """
+        Discards the queued messages and queues a single message instead.
+
+        Used for spectators that fall behind: rather than being dropped, they skip the
+        deltas they did not receive yet and get the latest snapshot.
+
+        Parameters:
+            message (bytes): The framed message replacing the queued ones.
+        """
+        if self.closed:
+            return
+        while True:
+            try:
+                self.outbound.get_nowait()
+            except queue.Empty:
+                break
+        self.send(message)
+
+    def write_outbound(self):
         """
-        self.index = index
-        self.pieces_white = 0
-        self.pieces_black = 0
+        Sends the queued messages until the connection is closed.
+
+        Every message queued since the last send is written with a single `sendall`, so the
+        number of messages per send shows how deep the queue got.
+        """
+        while not self.closed:
+            batch = [self.outbound.get()]
+            while True:
+                try:
+                    batch.append(self.outbound.get_nowait())
+                except queue.Empty:
+                    break
+            if self.closed:
+                break
+            self.write_batches.observe(len(batch))
+            data = b"".join(batch)
+            self.bytes_out.inc(len(data))
+            try:
+                self.socket.sendall(data)
+            except OSError as e:
+                logging.error(f"Failed to send to client {self.addr}: {e}")
+                self.close()
+
+    def close(self):
+        """
+        Closes the connection and wakes up its writer thread.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.outbound.put_nowait(b"")
+        except queue.Full:
+            pass
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
 
 
 class GameServer:
     """
     Represents the Backgammon Game Server.
 
-    Manages client connections, game state synchronization, and turn management.
+    Manages client connections, game state synchronization, and turn management. The first
+    two clients play; any further client joins as a read-only spectator. The seat of a player
+    who disconnects is held under its session token for a grace period, so the player can
+    reconnect and resume the game. Quiet clients are pinged and silent ones are closed by a
+    single reaper thread driving one timer wheel for every connection; the same thread
+    expires the turn clock through a timer heap and periodically has a journal thread sync
+    the journal of the game.
+    The result of the game and the new ratings of its players are stored by a ResultStore.
+    Traffic and handling times are kept in a MetricsRegistry, logged periodically and
+    optionally served over HTTP. Moves sent with a trace have the hops they take through the
+    server recorded by a Tracer, and their trace is passed on to the deltas they cause.
     """
 
-    def __init__(self, host='127.0.0.1', port=12345):
+    def __init__(self, host='127.0.0.1', port=12345, grace_period=SEAT_GRACE_PERIOD,
+                 ping_interval=PING_INTERVAL, idle_timeout=IDLE_TIMEOUT, turn_clock=DEFAULT_TURN_CLOCK,
+                 journal_dir=JOURNAL_DIR, results_db=RESULTS_DB, stats_port=None,
+                 stats_interval=STATS_LOG_INTERVAL, trace_file=None):
         """
         Initializes the GameServer instance.
 
@@ -44,145 +177,580 @@ class GameServer:
         Parameters:
             host (str, optional): The IP address to bind the server. Defaults to '127.0.0.1'.
             port (int, optional): The port number to bind the server. Defaults to 12345.
+            grace_period (float, optional): The seconds a disconnected player's seat is held.
+                                            Defaults to SEAT_GRACE_PERIOD.
+            ping_interval (float, optional): The seconds of silence after which a client is pinged.
+                                             Defaults to PING_INTERVAL.
+            idle_timeout (float, optional): The seconds of silence after which a client is
+                                            disconnected. Defaults to IDLE_TIMEOUT.
+            turn_clock (dict, optional): The keyword arguments of the game's TurnClock, or None
+                                         to play without a clock. Defaults to DEFAULT_TURN_CLOCK.
+            journal_dir (str, optional): The directory of the game journal, or None to keep no
+                                         journal. Defaults to JOURNAL_DIR.
+            results_db (str, optional): The SQLite database the result and ratings are stored
+                                        in, or None to store nothing. Defaults to RESULTS_DB.
+            stats_port (int, optional): The port of the HTTP endpoint serving the metrics, or None
+                                        to serve none. Defaults to None.
+            stats_interval (float, optional): The seconds between two logs of the metrics, or 0
+                                              to never log them. Defaults to STATS_LOG_INTERVAL.
+            trace_file (str, optional): The file the spans of traced moves are appended to, or
+                                        None to record none. Defaults to None.
         """
         self.host = host
         self.port = port
+        self.grace_period = grace_period
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.timer_wheel = TimerWheel()
+        self.timer_lock = threading.RLock()
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.bind((self.host, self.port))
-        self.server_socket.listen(2)
+        self.server_socket.listen(128)
         self.clients = []
         self.colors = ["white", "black"]
-        self.current_turn = 0
-        self.triangles = [Triangle(i) for i in range(24)]
-        self.bar_white = 0
-        self.bar_black = 0
-        self.white_boreoff = 0
-        self.black_boreoff = 0
+        self.client_colors = {}
+        self.client_tokens = {}
+        self.held_seats = {}
+        self.spectators = set()
+        self.game_state = VersionedState()
+        self.rules = RulesEngine(self.game_state)
+        self.turn_clock = TurnClock(**turn_clock) if turn_clock else None
+        self.turn_timers = TimerHeap()
+        self.clock_timer = None
+        self.journal = open_journal(journal_dir, 0) if journal_dir else None
+        self.journal_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1) if journal_dir else None
+        self.results = ResultStore(results_db) if results_db else None
+        self.player_names = {}
+        self.move_count = 0
+        self.started_at = None
+        self.stats_port = stats_port
+        self.stats_interval = stats_interval
+        self.metrics = MetricsRegistry()
+        self.metrics.gauge("connections", lambda: len(self.clients) + len(self.spectators))
+        self.moves = self.metrics.counter("moves")
+        self.bytes_in = self.metrics.counter("bytes_in")
+        self.broadcast_time = self.metrics.histogram("broadcast_seconds")
+        self.tracer = Tracer(trace_file, SERVER_PROCESS) if trace_file else None
+        self.lock = threading.Lock()
         print(f"Server started on {self.host}:{self.port}")
 
-    def broadcast_game_state(self, exclude_client=None):
+    def send_game_state(self, client):
+        """
+        Sends a full snapshot of the game state to a single client.
+
+        Used when a client reports a gap in the deltas it received. The encoded snapshot is
+        cached until the next change, so late joining spectators do not re-encode it.
+
+        Parameters:
+            client (ClientConnection): The client to send the snapshot to.
+        """
+        client.send(self.game_state.snapshot_message(self.client_colors.get(client, "white")))
+        logging.debug(f"Queued game state snapshot {self.game_state.seq} for client {client.addr}.")
+
+    def send_to_spectators(self, message):
         """
-        Broadcasts the current game state to all connected clients.
+        Queues the same encoded message for every spectator.
 
-        Optionally excludes a specified client from the broadcast (typically the one who
-        initiated the change).
+        A spectator with more than SPECTATOR_LAG_LIMIT messages waiting is caught up with the
+        cached snapshot instead, so a slow watcher never holds up the others.
 
         Parameters:
-            exclude_client (socket.socket, optional): The client socket to exclude from the broadcast.
-                                                     Defaults to None.
+            message (bytes): The framed message, from white's point of view.
         """
-        game_state = {
-            "triangles": [
-                {"index": t.index, "pieces_white": t.pieces_white, "pieces_black": t.pieces_black}
-                for t in self.triangles
-            ],
-            "bar_white": self.bar_white,
-            "bar_black": self.bar_black,
-            "white_boreoff": self.white_boreoff,
-            "black_boreoff": self.black_boreoff
-        }
+        for client in self.spectators:
+            if client.outbound.qsize() >= SPECTATOR_LAG_LIMIT:
+                client.catch_up(self.game_state.snapshot_message("white"))
+            else:
+                client.send(message)
+
+    def broadcast_state_delta(self, changes, exclude_client=None, trace=None):
+        """
+        Broadcasts the latest change of the game state to all connected clients.
+
+        Only the changed slots are sent, each client receiving them from its own point of view.
+        The delta is encoded once per point of view and the same bytes are queued for every
+        client sharing it, spectators sharing white's. Optionally excludes a specified client
+        from the broadcast (typically the one who initiated the change).
+
+        Parameters:
+            changes (list of tuple): The (slot, value) pairs that changed, from white's point of view.
+            exclude_client (ClientConnection, optional): The client to exclude from the broadcast.
+                                                         Defaults to None.
+            trace (tuple, optional): The trace of the move that caused the change, passed on
+                                     with a new timestamp. Defaults to None.
+        """
+        started = time.perf_counter()
+        if trace is not None:
+            trace = new_trace(trace[0])
+        messages = {}
         for client in self.clients:
             if client != exclude_client:
-                try:
-                    client.send(pickle.dumps({"type": "game_state", "data": game_state}))
-                    logging.debug(f"Sent game state to client {client.getpeername()}.")
-                except Exception as e:
-                    logging.error(f"Failed to send game state to client {client.getpeername()}: {e}")
+                color = self.client_colors[client]
+                if color not in messages:
+                    messages[color] = self.delta_message(color, changes, trace)
+                client.send(messages[color])
+        if self.spectators:
+            if "white" not in messages:
+                messages["white"] = self.delta_message("white", changes, trace)
+            self.send_to_spectators(messages["white"])
+        self.broadcast_time.observe(time.perf_counter() - started)
+
+    def delta_message(self, color, changes, trace):
+        """
+        Encodes the delta of the latest change for one point of view.
+
+        Parameters:
+            color (str): The point of view, "white" or "black".
+            changes (list of tuple): The (slot, value) pairs that changed, from white's point of view.
+            trace (tuple or None): The trace to send with the delta.
+
+        Returns:
+            bytes: The framed state delta.
+        """
+        data = self.game_state.delta(color, changes)
+        if trace is not None:
+            data["trace"] = trace
+        return encode_message({"type": "state_delta", "data": data})
 
     def notify_turn(self):
         """
         Notifies all clients about whose turn it is.
 
-        Sends a message indicating whether each client is currently allowed to make a move.
+        Queues a message indicating whether each client is currently allowed to make a move.
         """
-        for i, client in enumerate(self.clients):
-            try:
-                client.send(pickle.dumps({"type": "turn", "data": i == self.current_turn}))
-                logging.debug(f"Notified client {client.getpeername()} of their turn status: {i == self.current_turn}.")
-            except Exception as e:
-                logging.error(f"Failed to notify client {client.getpeername()} of turn status: {e}")
+        for client in self.clients:
+            your_turn = self.client_colors[client] == self.rules.turn_color
+            client.send(TURN_MESSAGES[your_turn])
+            logging.debug(f"Notified client {client.addr} of their turn status: {your_turn}.")
+
+    def broadcast_dice(self):
+        """
+        Sends the dice rolled for the current turn to all connected clients.
+        """
+        message = encode_message({"type": "dice", "data": self.rules.dice})
+        for client in self.clients:
+            client.send(message)
+        self.send_to_spectators(message)
+
+    def send_correction(self, client):
+        """
+        Resynchronizes a client whose request was rejected.
+
+        Sends the client's turn status, a snapshot of the board and, if it is the client's turn,
+        the dice left to play, undoing whatever the client applied on its own.
+
+        Parameters:
+            client (ClientConnection): The client to resynchronize.
+        """
+        color = self.client_colors[client]
+        messages = [
+            {"type": "turn", "data": color == self.rules.turn_color},
+            {"type": "game_state", "data": self.game_state.snapshot(color)}
+        ]
+        if color == self.rules.turn_color and self.rules.has_rolled:
+            messages.append({"type": "dice", "data": self.rules.dice})
+        client.send(encode_messages(messages))
+
+    def check_heartbeat(self, client):
+        """
+        Pings a quiet client, or closes it once it has been silent for the idle timeout.
+
+        Runs on the reaper thread. Receiving data only records the time, so the next check is
+        scheduled here, for when the client could next need a ping or be reaped. Closing the
+        socket wakes up the client's handler thread, which then releases the client.
+
+        Parameters:
+            client (ClientConnection): The client to check.
+        """
+        if client.closed:
+            return
+        idle = time.monotonic() - client.last_seen
+        if idle >= self.idle_timeout:
+            logging.info(f"Closing idle client {client.addr}: silent for {idle:.0f} seconds.")
+            client.close()
+            return
+        if idle >= self.ping_interval:
+            client.send(PING_MESSAGE)
+            delay = min(self.ping_interval, self.idle_timeout - idle)
+        else:
+            delay = self.ping_interval - idle
+        client.heartbeat = self.timer_wheel.schedule(delay, self.check_heartbeat, client)
+
+    def record(self, kind, color, a=0, b=0, c=0):
+        """
+        Appends an event to the journal of the game, if the server keeps one.
+
+        Parameters:
+            kind (int): ROLL, MOVE, TURN or GAME_OVER.
+            color (str): The color the event concerns.
+            a (int, optional): The first argument of the event. Defaults to 0.
+            b (int, optional): The second argument of the event. Defaults to 0.
+            c (int, optional): The third argument of the event. Defaults to 0.
+        """
+        if self.journal is not None:
+            self.journal.append(kind, color, self.game_state.seq, a, b, c)
+
+    def sync_journal(self):
+        """
+        Hands the journal to the journal thread if it was written to since the last sync, and
+        schedules the next sync.
+
+        Runs on the reaper thread under the timer lock, which connections also take when they
+        open and close, so the sync itself runs on the journal thread: neither the players nor
+        the timers ever wait for the disk.
+        """
+        if self.journal.dirty:
+            self.journal_executor.submit(sync_journals, [self.journal])
+        self.timer_wheel.schedule(FSYNC_INTERVAL, self.sync_journal)
+
+    def log_metrics(self):
+        """
+        Logs a summary of the metrics and schedules the next log.
+
+        Runs on the reaper thread.
+        """
+        logging.info(f"Metrics: {self.metrics.summary()}")
+        self.timer_wheel.schedule(self.stats_interval, self.log_metrics)
+
+    def run_timers(self):
+        """
+        Advances the timer wheel and the turn timer heap once per tick, forever.
+
+        The heap is advanced under the game lock, since an expired turn changes the game.
+        """
+        while True:
+            time.sleep(self.timer_wheel.tick)
+            with self.timer_lock:
+                self.timer_wheel.advance()
+            with self.lock:
+                self.turn_timers.advance()
+
+    def start_turn_clock(self):
+        """
+        Starts the clock of the player whose turn it is and schedules its expiry.
+        """
+        if self.turn_clock is None or self.rules.winner() is not None:
+            return
+        if self.clock_timer is not None:
+            self.turn_timers.cancel(self.clock_timer)
+        color = self.rules.turn_color
+        seconds = self.turn_clock.start(color)
+        self.clock_timer = self.turn_timers.schedule(seconds, self.expire_turn, color)
+
+    def expire_turn(self, color):
+        """
+        Handles a player running out of time, by passing its turn or ending the game.
+
+        Parameters:
+            color (str): The color whose turn timed out.
+        """
+        self.clock_timer = None
+        if self.rules.turn_color != color or self.rules.winner() is not None:
+            return
+        self.turn_clock.stop()
+        if self.turn_clock.on_timeout == "forfeit":
+            logging.info(f"{color.capitalize()} ran out of time and forfeits.")
+            self.rules.forfeit(color)
+            self.end_game()
+        else:
+            logging.info(f"{color.capitalize()} ran out of time, passing the turn.")
+            self.advance_turn()
+
+    def advance_turn(self):
+        """
+        Passes the turn to the other player and restarts the clock.
+        """
+        if self.turn_clock is not None:
+            self.turn_clock.stop()
+        self.rules.end_turn()
+        self.record(TURN, self.rules.turn_color)
+        self.notify_turn()
+        self.start_turn_clock()
+
+    def end_game(self):
+        """
+        Announces the winner to the players and spectators and stops the clock.
+        """
+        if self.clock_timer is not None:
+            self.turn_timers.cancel(self.clock_timer)
+            self.clock_timer = None
+        winner = self.rules.winner()
+        self.record(GAME_OVER, winner, self.rules.forfeited is not None)
+        self.store_result(winner)
+        logging.info(f"{winner.capitalize()} has won!")
+        message = encode_message({"type": "game_over", "data": winner})
+        for client in self.clients:
+            client.send(message)
+        self.send_to_spectators(message)
+
+    def store_result(self, winner):
+        """
+        Queues the result of the finished game to be stored, if the server keeps results.
+
+        Parameters:
+            winner (str): The winning color.
+        """
+        if self.results is None:
+            return
+        started_at = self.started_at or time.time()
+        self.results.record(GameResult(
+            0, self.player_names.get("white"), self.player_names.get("black"), winner,
+            self.rules.forfeited is not None, self.rules.pip_count("white"), self.rules.pip_count("black"),
+            self.move_count, started_at, time.time() - started_at))
+
+    def release_expired_seats(self):
+        """
+        Gives up the held seats whose grace period is over.
+
+        Expiry is checked whenever a seat is requested rather than by a timer, so a held
+        seat costs no thread.
+        """
+        now = time.monotonic()
+        for token, (color, deadline) in list(self.held_seats.items()):
+            if deadline <= now:
+                del self.held_seats[token]
+                logging.info(f"The held {color} seat expired.")
+
+    def hold_seat(self, client):
+        """
+        Removes a disconnected player and keeps its seat for the grace period.
+
+        Parameters:
+            client (ClientConnection): The player that dropped.
+        """
+        color = self.client_colors.pop(client)
+        token = self.client_tokens.pop(client)
+        self.clients.remove(client)
+        if self.grace_period > 0:
+            self.held_seats[token] = (color, time.monotonic() + self.grace_period)
+            logging.info(f"Holding the {color} seat for {self.grace_period:g} seconds.")
+
+    def resume_session(self, client, token):
+        """
+        Moves a reconnected player back into the seat held under its session token.
+
+        The player gives up the seat or spectator place it got on connection and receives its
+        session token, color and turn status along with the cached snapshot and the dice left
+        to play, so no history has to be replayed. If the seat is no longer held, the player
+        is sent its current session token instead.
+
+        Parameters:
+            client (ClientConnection): The connection that asked to resume.
+            token (bytes): The session token sent by the player.
+        """
+        self.release_expired_seats()
+        held = self.held_seats.pop(token, None)
+        if held is None:
+            logging.info(f"Client {client.addr} could not resume: unknown or expired session.")
+            if client in self.client_tokens:
+                client.send(encode_message({"type": "session", "data": self.client_tokens[client]}))
+            return
+        if client in self.spectators:
+            self.spectators.discard(client)
+        else:
+            self.clients.remove(client)
+            del self.client_colors[client]
+            del self.client_tokens[client]
+        color = held[0]
+        self.clients.append(client)
+        self.client_colors[client] = color
+        self.client_tokens[client] = token
+        messages = encode_messages([
+            {"type": "session", "data": token},
+            {"type": "color", "data": color},
+            {"type": "turn", "data": color == self.rules.turn_color}
+        ]) + self.game_state.snapshot_message(color)
+        if color == self.rules.turn_color and self.rules.has_rolled:
+            messages += encode_message({"type": "dice", "data": self.rules.dice})
+        client.send(messages)
+        logging.info(f"Client {client.addr} resumed the {color} seat.")
 
     def client_handler(self, client_socket, addr):
         """
         Handles communication with a connected client.
 
         Receives messages from the client, processes them, and updates the game state accordingly.
+        The time taken to decode and handle each request is observed per request type.
 
         Parameters:
             client_socket (socket.socket): The socket connected to the client.
             addr (tuple): The address of the connected client.
         """
-        color = self.colors[len(self.clients) % 2]
-        self.clients.append(client_socket)
-        response = {"color": color}
-        try:
-            client_socket.send(pickle.dumps(response))
-            logging.info(f"Client connected: {addr} assigned color: {color}")
-        except Exception as e:
-            logging.error(f"Failed to send initial color to client {addr}: {e}")
-            self.clients.remove(client_socket)
-            client_socket.close()
-            return
-
-        while True:
+        client = ClientConnection(client_socket, addr, metrics=self.metrics)
+        with self.timer_lock:
+            client.heartbeat = self.timer_wheel.schedule(self.ping_interval, self.check_heartbeat, client)
+        with self.lock:
+            self.release_expired_seats()
+            taken = set(self.client_colors.values()) | {color for color, _ in self.held_seats.values()}
+            color = next((c for c in self.colors if c not in taken), None)
+            if color is None:
+                self.spectators.add(client)
+                client.send(SPECTATOR_MESSAGE + self.game_state.snapshot_message("white"))
+            else:
+                token = secrets.token_bytes(SESSION_TOKEN_SIZE)
+                self.clients.append(client)
+                self.client_colors[client] = color
+                self.client_tokens[client] = token
+                client.send(encode_messages([
+                    {"type": "color", "data": color},
+                    {"type": "session", "data": token},
+                    {"type": "turn", "data": color == self.rules.turn_color},
+                    {"type": "game_state", "data": self.game_state.snapshot(color)}
+                ]))
+                if len(self.clients) + len(self.held_seats) == len(self.colors) and self.started_at is None:
+                    self.started_at = time.time()
+                    self.start_turn_clock()
+        logging.info(f"Client connected: {addr} assigned color: {color or 'spectator'}")
+
+        decoder = FrameDecoder()
+        while not client.closed:
             try:
-                data = client_socket.recv(4096)
-                if not data:
+                size = decoder.recv_into(client_socket)
+                if not size:
                     logging.info(f"No data received. Client {addr} may have disconnected.")
                     break
 
-                request = pickle.loads(data)
-                logging.info(f"Received request from {addr}: {request}")
-
-                if request["type"] == "move":
-                    self.broadcast_game_state(exclude_client=client_socket)
-                    self.current_turn = (self.current_turn + 1) % len(self.clients)
-                    self.notify_turn()
-
-                elif request["type"] == "turn_end":
-                    self.current_turn = (self.current_turn + 1) % len(self.clients)
-                    self.notify_turn()
-
-                elif request["type"] == "game_state":
-                    game_state = request["data"]
-                    for triangle in game_state["triangles"]:
-                        triangle["index"] = 23 - triangle["index"]
-                    self.triangles = [Triangle(t["index"]) for t in game_state["triangles"]]
-                    for t in self.triangles:
-                        t.pieces_white = next(
-                            (tr["pieces_white"] for tr in game_state["triangles"] if tr["index"] == t.index), 0)
-                        t.pieces_black = next(
-                            (tr["pieces_black"] for tr in game_state["triangles"] if tr["index"] == t.index), 0)
-                    self.bar_white = game_state.get("bar_white", 0)
-                    self.bar_black = game_state.get("bar_black", 0)
-                    self.white_boreoff = game_state.get("white_boreoff", 0)
-                    self.black_boreoff = game_state.get("black_boreoff", 0)
-                    self.broadcast_game_state(exclude_client=client_socket)
-
+                client.last_seen = time.monotonic()
+                self.bytes_in.inc(size)
+                for payload in decoder:
+                    with self.lock:
+                        started = time.perf_counter()
+                        received = time.monotonic_ns()
+                        request = decode_message(payload)
+                        if self.tracer is not None and request["type"] == "move":
+                            trace = request["data"].get("trace")
+                            self.tracer.wire(trace, received)
+                            self.tracer.span(trace, "receive", received)
+                        self.handle_request(client, request)
+                        self.metrics.histogram(f"handle_seconds_{request['type']}").observe(
+                            time.perf_counter() - started)
+
+            except socket.timeout:
+                continue
             except Exception as e:
                 logging.error(f"Error with client {addr}: {e}")
                 break
 
         logging.info(f"Client {addr} disconnected.")
-        self.clients.remove(client_socket)
-        client_socket.close()
+        with self.timer_lock:
+            self.timer_wheel.cancel(client.heartbeat)
+        with self.lock:
+            if client in self.spectators:
+                self.spectators.discard(client)
+            else:
+                self.hold_seat(client)
+        client.close()
+
+    def handle_request(self, client, request):
+        """
+        Processes a single request received from a client.
+
+        Parameters:
+            client (ClientConnection): The client who sent the request.
+            request (dict): The decoded request.
+        """
+        addr = client.addr
+        logging.debug(f"Received request from {addr}: {request}")
+
+        if "room" in request:
+            logging.debug(f"Ignored routed {request['type']} request from {addr}: this server hosts a single game.")
+            return
+        if request["type"] == "resync":
+            self.send_game_state(client)
+            return
+        if request["type"] == "resume":
+            self.resume_session(client, request["data"])
+            return
+        if request["type"] == "ping":
+            client.send(PONG_MESSAGE)
+            return
+        if request["type"] == "pong":
+            return
+
+        color = self.client_colors.get(client)
+        if color is None:
+            logging.debug(f"Ignored {request['type']} request from spectator {addr}.")
+            return
+        if request["type"] == "name":
+            self.player_names[color] = player_name(request["data"])
+
+        elif request["type"] == "roll":
+            if color != self.rules.turn_color or self.rules.has_rolled or self.rules.winner() is not None:
+                self.send_correction(client)
+                return
+            self.rules.roll()
+            self.record(ROLL, color, *self.rules.dice[:2])
+            self.broadcast_dice()
+
+        elif request["type"] == "move":
+            move = request["data"]
+            started = time.monotonic_ns()
+            source = to_board_point(color, move["from"])
+            target = to_board_point(color, move["to"])
+            if source is None or target is None:
+                error = "unknown point"
+            else:
+                error = self.rules.validate_move(color, source, target, move["die"])
+            if self.tracer is not None:
+                self.tracer.span(move.get("trace"), "validate", started)
+            if error is not None:
+                logging.warning(f"Rejected move {move} from {addr}: {error}")
+                self.send_correction(client)
+                return
+            changes = self.rules.apply_move(color, source, target, move["die"])
+            self.move_count += 1
+            self.moves.inc()
+            self.record(MOVE, color, source, target, move["die"])
+            started = time.monotonic_ns()
+            self.broadcast_state_delta(changes, trace=move.get("trace"))
+            if self.tracer is not None:
+                self.tracer.span(move.get("trace"), "broadcast", started)
+            if self.rules.winner() is not None:
+                self.end_game()
+
+        elif request["type"] == "turn_end":
+            if color != self.rules.turn_color or not self.rules.has_rolled or self.rules.has_legal_move(color):
+                logging.warning(f"Rejected end of turn from {addr}.")
+                self.send_correction(client)
+                return
+            self.advance_turn()
 
     def start(self):
         """
         Starts the Game Server.
 
-        Listens for incoming client connections and spawns a new thread to handle each client.
+        Starts the reaper thread driving the timers and the stats endpoint, if any, then
+        listens for incoming client connections and spawns a new thread to handle each client.
         """
+        with self.timer_lock:
+            if self.journal is not None:
+                self.timer_wheel.schedule(FSYNC_INTERVAL, self.sync_journal)
+            if self.stats_interval > 0:
+                self.timer_wheel.schedule(self.stats_interval, self.log_metrics)
+        if self.stats_port is not None:
+            serve_stats(self.metrics, self.host, self.stats_port)
+        threading.Thread(target=self.run_timers, daemon=True).start()
         logging.info("Waiting for connections...")
-        while True:
-            try:
-                client_socket, addr = self.server_socket.accept()
-                thread = threading.Thread(target=self.client_handler, args=(client_socket, addr), daemon=True)
-                thread.start()
-                logging.info(f"Started thread for client {addr}.")
-            except Exception as e:
-                logging.error(f"Error accepting connections: {e}")
-                break
+        try:
+            while True:
+                try:
+                    client_socket, addr = self.server_socket.accept()
+                    thread = threading.Thread(target=self.client_handler, args=(client_socket, addr), daemon=True)
+                    thread.start()
+                    logging.info(f"Started thread for client {addr}.")
+                except Exception as e:
+                    logging.error(f"Error accepting connections: {e}")
+                    break
+        finally:
+            if self.journal_executor is not None:
+                self.journal_executor.shutdown()
+            with self.lock:
+                if self.journal is not None:
+                    self.journal.close()
+            if self.results is not None:
+                self.results.close()
+            if self.tracer is not None:
+                self.tracer.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,522 @@
+import argparse
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import secrets
+import selectors
+import signal
+import socket
+import struct
+import sys
+import time
+
+from async_server import AsyncGameServer, LISTEN_BACKLOG, add_server_options, raise_open_file_limit, server_options
+from protocol import HEADER, SESSION_TOKEN_SIZE, FrameProtocol, ProtocolError, decode_message
+from tracing import SERVER_PROCESS, Tracer
+
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+HANDOFF = struct.Struct("!I")
+ROOM_CLOSED_REPORT = struct.Struct("!BI")
+STATS_REPORT = struct.Struct("!BIIQ")
+ROOM_CLOSED = 1
+STATS = 2
+ROOM_FILLED = 3
+LOCAL_ROOM_IDS = 1 << 31
+NO_ROOM = 0
+MAX_WORKERS = 256
+FIRST_REQUEST_SIZE = 64
+FIRST_REQUEST_TIMEOUT = 1.0
+STATS_INTERVAL = 5.0
+
+
+def worker_for_room(room_id, worker_count):
+    """
+    Finds the worker process hosting a room.
+
+    Parameters:
+        room_id (int): The unique identifier of the room.
+        worker_count (int): The number of worker processes.
+
+    Returns:
+        int: The index of the worker hosting the room.
+    """
+    return room_id % worker_count
+
+
+def worker_for_session(token, worker_count):
+    """
+    Finds the worker process holding the seat of a session.
+
+    Parameters:
+        token (bytes): The session token, whose first byte is the index of the worker that drew it.
+        worker_count (int): The number of worker processes.
+
+    Returns:
+        int: The index of the worker holding the seat.
+    """
+    return token[0] % worker_count
+
+
+class ShardWorker(AsyncGameServer):
+    """
+    Represents one worker process of the ShardSupervisor.
+
+    Does not listen on its own: the supervisor accepts the connections and passes each socket,
+    along with the id of the room to seat it in, over a Unix datagram channel. A connection
+    handed off with NO_ROOM came to resume a seat or watch a room of this worker, and is
+    served like a new connection of an unsharded server. The first byte of every session
+    token the worker draws is its index, so the supervisor can find the seat. The worker
+    reports closed rooms and rooms filled by a bot as they happen, and its load every
+    STATS_INTERVAL seconds, on the same channel. Each worker keeps its own metrics; with a
+    stats port, worker `index` serves them on `stats_port + index`. With a trace file, each
+    worker appends its spans to its own file, named after the trace file and its index.
+    """
+
+    def __init__(self, index, channel, **options):
+        """
+        Initializes a ShardWorker instance.
+
+        Parameters:
+            index (int): The index of the worker.
+            channel (socket.socket): The worker's end of the channel to the supervisor.
+            **options: The keyword arguments passed on to AsyncGameServer.
+        """
+        super().__init__(**options)
+        if self.stats_port is not None:
+            self.stats_port += index
+        if self.tracer is not None:
+            self.tracer = Tracer(f"{self.trace_file}.{index}", f"{SERVER_PROCESS} {index}")
+        self.index = index
+        self.channel = channel
+        self.handoff_tasks = set()
+        self.room_ids = itertools.count(LOCAL_ROOM_IDS)
+
+    def assign_room(self, room_id=None, conn=None):
+        """
+        Finds the room chosen by the supervisor for a new connection.
+
+        If a bot took the free seat of that room before the supervisor learnt about it, the
+        connection is paired locally instead, in a room whose id the supervisor never uses.
+        Connections joining one more game are always paired locally.
+
+        Parameters:
+            room_id (int, optional): The room chosen for the connection by the supervisor.
+                                     Defaults to None.
+            conn (Connection, optional): The connection joining one more game. Defaults to None.
+
+        Returns:
+            Room: The room to seat the connection in.
+        """
+        room = super().assign_room(room_id, conn)
+        if room.is_full():
+            room = super().assign_room(conn=conn)
+        return room
+
+    def close_room_if_idle(self, room):
+        """
+        Discards a room that has no players left and tells the supervisor about it.
+
+        Parameters:
+            room (Room): The room to check.
+
+        Returns:
+            bool: True if the room was discarded, False otherwise.
+        """
+        closed = super().close_room_if_idle(room)
+        if closed:
+            self.report(ROOM_CLOSED_REPORT.pack(ROOM_CLOSED, room.room_id))
+        return closed
+
+    def new_session_token(self):
+        """
+        Draws the session token of a new seat, starting with the index of the worker.
+
+        Returns:
+            bytes: The index of the worker followed by SESSION_TOKEN_SIZE - 1 random bytes.
+        """
+        return bytes((self.index,)) + secrets.token_bytes(SESSION_TOKEN_SIZE - 1)
+
+    def seat_bot(self, room, conn):
+        """
+        Gives the free seat of a room to a bot and tells the supervisor the room is full.
+
+        Parameters:
+            room (Room): The room of the player.
+            conn (Connection): The player who asked for a bot.
+        """
+        super().seat_bot(room, conn)
+        if room.bot_color is not None:
+            self.report(ROOM_CLOSED_REPORT.pack(ROOM_FILLED, room.room_id))
+
+    def log_metrics(self):
+        """
+        Logs a summary of the metrics of the worker and schedules the next log.
+        """
+        logging.info(f"Worker {self.index} metrics: {self.metrics.summary()}")
+        self.timer_wheel.schedule(self.stats_interval, self.log_metrics)
+
+    def report(self, message):
+        """
+        Sends a report to the supervisor, dropping it if the channel is full.
+
+        Parameters:
+            message (bytes): The packed report.
+        """
+        try:
+            self.channel.send(message)
+        except (BlockingIOError, OSError) as e:
+            logging.warning(f"Worker {self.index} could not report to the supervisor: {e}")
+
+    def receive_handoffs(self):
+        """
+        Adopts every connection the supervisor has handed off so far.
+        """
+        while True:
+            try:
+                data, fds, _, _ = socket.recv_fds(self.channel, HANDOFF.size, 1)
+            except BlockingIOError:
+                return
+            if not fds:
+                continue
+            sock = socket.socket(fileno=fds[0])
+            if len(data) != HANDOFF.size:
+                sock.close()
+                continue
+            (room_id,) = HANDOFF.unpack(data)
+            task = asyncio.create_task(self.adopt_connection(sock, room_id))
+            self.handoff_tasks.add(task)
+            task.add_done_callback(self.handoff_tasks.discard)
+
+    async def adopt_connection(self, sock, room_id):
+        """
+        Serves a connection accepted by the supervisor.
+
+        Parameters:
+            sock (socket.socket): The accepted client socket.
+            room_id (int): The room to seat the client in, or NO_ROOM.
+        """
+        _, protocol = await asyncio.get_running_loop().connect_accepted_socket(FrameProtocol, sock)
+        await self.client_handler(protocol, room_id if room_id != NO_ROOM else None)
+
+    async def report_stats(self):
+        """
+        Reports the load of the worker to the supervisor every STATS_INTERVAL seconds.
+        """
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            stats = self.stats()
+            self.report(STATS_REPORT.pack(STATS, stats["rooms"], stats["clients"], stats["moves"]))
+
+    async def serve(self):
+        """
+        Serves the connections handed off by the supervisor until cancelled.
+        """
+        raise_open_file_limit()
+        self.start_timers()
+        self.start_monitoring()
+        self.channel.setblocking(False)
+        asyncio.get_running_loop().add_reader(self.channel.fileno(), self.receive_handoffs)
+        logging.info(f"Worker {self.index} started (pid {os.getpid()}).")
+        await self.report_stats()
+
+
+def run_worker(index, channel, options):
+    """
+    The entry point of a worker process.
+
+    Parameters:
+        index (int): The index of the worker.
+        channel (socket.socket): The worker's end of the channel to the supervisor.
+        options (dict): The keyword arguments passed on to AsyncGameServer.
+    """
+    ShardWorker(index, channel, **options).start()
+
+
+class ShardSupervisor:
+    """
+    Represents the supervisor of a sharded Backgammon Game Server.
+
+    Spreads the rooms over several worker processes so the server is no longer bound to a
+    single core. The supervisor only accepts connections and pairs them: each pair of clients
+    gets a room id, and the room is hosted by worker `room_id % workers`, which receives the
+    accepted sockets. The workers report their load back and the supervisor logs the totals.
+
+    Before handing a connection off, the supervisor peeks at its first request, leaving it
+    for the worker to read. A client resuming its seat goes to the worker whose index starts
+    its session token, and a client watching a room to the worker hosting the room, without
+    being paired. A client that sends nothing within FIRST_REQUEST_TIMEOUT is paired.
+    """
+
+    def __init__(self, host='127.0.0.1', port=12345, workers=None, **options):
+        """
+        Initializes the ShardSupervisor instance.
+
+        Parameters:
+            host (str, optional): The IP address to bind the server. Defaults to '127.0.0.1'.
+            port (int, optional): The port number to bind the server. Defaults to 12345.
+            workers (int, optional): The number of worker processes, at most MAX_WORKERS.
+                                     Defaults to the number of CPUs.
+            **options: The keyword arguments passed on to the AsyncGameServer of every worker.
+        """
+        self.host = host
+        self.port = port
+        self.worker_count = min(workers or os.cpu_count() or 1, MAX_WORKERS)
+        self.options = options
+        self.processes = []
+        self.channels = []
+        self.worker_stats = {}
+        self.next_room_id = 1
+        self.waiting_room_id = None
+        self.pending = {}
+        self.selector = selectors.DefaultSelector()
+
+    def start_workers(self):
+        """
+        Starts the worker processes, each with a datagram channel to the supervisor.
+        """
+        for index in range(self.worker_count):
+            parent_end, child_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+            process = multiprocessing.Process(target=run_worker, args=(index, child_end, self.options))
+            process.start()
+            child_end.close()
+            self.processes.append(process)
+            self.channels.append(parent_end)
+            self.selector.register(parent_end, selectors.EVENT_READ, index)
+
+    def assign_room_id(self):
+        """
+        Pairs a new connection with the one waiting for an opponent.
+
+        Returns:
+            int: The id of the room waiting for an opponent, or of a new room if none is waiting.
+        """
+        if self.waiting_room_id is not None:
+            room_id, self.waiting_room_id = self.waiting_room_id, None
+            return room_id
+        room_id = self.next_room_id
+        self.next_room_id += 1
+        self.waiting_room_id = room_id
+        return room_id
+
+    def accept_connections(self, server_socket):
+        """
+        Accepts every pending connection and waits for its first request.
+
+        Parameters:
+            server_socket (socket.socket): The non-blocking listening socket.
+        """
+        while True:
+            try:
+                client_socket, addr = server_socket.accept()
+            except BlockingIOError:
+                return
+            client_socket.setblocking(False)
+            self.pending[client_socket] = (addr, time.monotonic())
+            self.selector.register(client_socket, selectors.EVENT_READ, addr)
+
+    def peek_first_request(self, client_socket):
+        """
+        Dispatches a connection that sent data, by the first request it sent.
+
+        The request is peeked at, so it stays in the socket for the worker to read. A request
+        that is not complete in the first FIRST_REQUEST_SIZE bytes, or cannot be decoded, is
+        left for the worker to deal with and the connection is paired.
+
+        Parameters:
+            client_socket (socket.socket): The accepted client socket.
+        """
+        addr, _ = self.pending[client_socket]
+        try:
+            data = client_socket.recv(FIRST_REQUEST_SIZE, socket.MSG_PEEK)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.forget_pending(client_socket)
+            client_socket.close()
+            return
+        request = None
+        if len(data) >= HEADER.size:
+            (length,) = HEADER.unpack_from(data)
+            if len(data) >= HEADER.size + length:
+                try:
+                    request = decode_message(data[HEADER.size:HEADER.size + length])
+                except ProtocolError:
+                    pass
+        self.forget_pending(client_socket)
+        self.dispatch(client_socket, addr, request)
+
+    def dispatch_silent(self, now):
+        """
+        Pairs the connections that sent nothing for FIRST_REQUEST_TIMEOUT seconds.
+
+        Parameters:
+            now (float): The current monotonic time.
+        """
+        silent = [(client_socket, addr) for client_socket, (addr, accepted_at) in self.pending.items()
+                  if now - accepted_at >= FIRST_REQUEST_TIMEOUT]
+        for client_socket, addr in silent:
+            self.forget_pending(client_socket)
+            self.dispatch(client_socket, addr)
+
+    def forget_pending(self, client_socket):
+        """
+        Stops waiting for the first request of a connection.
+
+        Parameters:
+            client_socket (socket.socket): The accepted client socket.
+        """
+        del self.pending[client_socket]
+        self.selector.unregister(client_socket)
+
+    def worker_for_request(self, request):
+        """
+        Finds the worker a first request has to be served by, whatever the pairing.
+
+        Parameters:
+            request (dict): The decoded first request, or None.
+
+        Returns:
+            int: The worker holding the seat a resume request names, or hosting the room a
+                 watch request names, or None if the connection is to be paired.
+        """
+        if request is None or "room" in request:
+            return None
+        if request["type"] == "resume":
+            return worker_for_session(request["data"], self.worker_count)
+        if request["type"] == "watch" and request["data"] < LOCAL_ROOM_IDS:
+            return worker_for_room(request["data"], self.worker_count)
+        return None
+
+    def dispatch(self, client_socket, addr, request=None):
+        """
+        Hands an accepted connection off to the worker hosting its room.
+
+        Parameters:
+            client_socket (socket.socket): The accepted client socket.
+            addr (tuple): The address of the client.
+            request (dict, optional): The first request of the client. Defaults to None.
+        """
+        index = self.worker_for_request(request)
+        if index is None:
+            room_id = self.assign_room_id()
+            index = worker_for_room(room_id, self.worker_count)
+        else:
+            room_id = NO_ROOM
+        try:
+            socket.send_fds(self.channels[index], [HANDOFF.pack(room_id)], [client_socket.fileno()])
+            logging.debug(f"Client {addr} handed off to worker {index} for room {room_id}")
+        except OSError as e:
+            logging.error(f"Could not hand client {addr} off to worker {index}: {e}")
+        finally:
+            client_socket.close()
+
+    def receive_reports(self, channel, index):
+        """
+        Reads the reports sent by a worker.
+
+        Parameters:
+            channel (socket.socket): The supervisor's end of the channel to the worker.
+            index (int): The index of the worker.
+        """
+        while True:
+            try:
+                report = channel.recv(STATS_REPORT.size)
+            except BlockingIOError:
+                return
+            if not report:
+                return
+            if report[0] in (ROOM_CLOSED, ROOM_FILLED) and len(report) == ROOM_CLOSED_REPORT.size:
+                _, room_id = ROOM_CLOSED_REPORT.unpack(report)
+                if room_id == self.waiting_room_id:
+                    self.waiting_room_id = None
+            elif report[0] == STATS and len(report) == STATS_REPORT.size:
+                _, rooms, clients, moves = STATS_REPORT.unpack(report)
+                self.worker_stats[index] = {"rooms": rooms, "clients": clients, "moves": moves}
+
+    def log_stats(self, elapsed, previous_moves):
+        """
+        Logs the load of all the workers combined.
+
+        Parameters:
+            elapsed (float): The seconds since the previous log.
+            previous_moves (int): The total number of moves at the previous log.
+
+        Returns:
+            int: The total number of moves applied by the workers.
+        """
+        totals = {"rooms": 0, "clients": 0, "moves": 0}
+        for stats in self.worker_stats.values():
+            for key in totals:
+                totals[key] += stats[key]
+        alive = sum(process.is_alive() for process in self.processes)
+        rate = (totals["moves"] - previous_moves) / elapsed if elapsed > 0 else 0.0
+        logging.info(f"Workers: {alive}/{self.worker_count}, rooms: {totals['rooms']}, "
+                     f"clients: {totals['clients']}, moves: {totals['moves']} ({rate:.1f}/s)")
+        return totals["moves"]
+
+    def start(self):
+        """
+        Starts the workers and dispatches connections to them until interrupted.
+        """
+        if not hasattr(socket, "send_fds"):
+            raise RuntimeError("Sharding requires passing sockets between processes, which this platform does not support.")
+        raise_open_file_limit()
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        self.start_workers()
+        server_socket = socket.create_server((self.host, self.port), backlog=LISTEN_BACKLOG)
+        server_socket.setblocking(False)
+        self.selector.register(server_socket, selectors.EVENT_READ, None)
+        for channel in self.channels:
+            channel.setblocking(False)
+        logging.info(f"Sharded server started on {self.host}:{self.port} with {self.worker_count} workers")
+
+        last_log = time.monotonic()
+        total_moves = 0
+        try:
+            while True:
+                timeout = FIRST_REQUEST_TIMEOUT if self.pending else STATS_INTERVAL
+                for key, _ in self.selector.select(timeout=timeout):
+                    if key.data is None:
+                        self.accept_connections(server_socket)
+                    elif key.fileobj in self.pending:
+                        self.peek_first_request(key.fileobj)
+                    else:
+                        self.receive_reports(key.fileobj, key.data)
+                now = time.monotonic()
+                self.dispatch_silent(now)
+                if now - last_log >= STATS_INTERVAL:
+                    total_moves = self.log_stats(now - last_log, total_moves)
+                    last_log = now
+        except KeyboardInterrupt:
+            logging.info("Server stopped.")
+        finally:
+            server_socket.close()
+            for client_socket in self.pending:
+                client_socket.close()
+            for process in self.processes:
+                process.terminate()
+            for process in self.processes:
+                process.join()
+
+
+def main():
+    """
+    The entry point of the sharded Game Server.
+
+    Parses the command line options and starts the supervisor.
+    """
+    parser = argparse.ArgumentParser(description="Backgammon server spreading its games over several processes.")
+    add_server_options(parser)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="The number of worker processes. Defaults to the number of CPUs.")
+    args = parser.parse_args()
+    ShardSupervisor(args.host, args.port, args.workers, **server_options(args)).start()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+from array import array
+
+POINT_COUNT = 24
+BAR_WHITE = 24
+BAR_BLACK = 25
+WHITE_BOREOFF = 26
+BLACK_BOREOFF = 27
+STATE_SIZE = 28
+
+
+def new_state():
+    """
+    Creates the encoding of an empty board.
+
+    Returns:
+        bytes: A state with no pieces on the board, on the bar or borne off.
+    """
+    return bytes(STATE_SIZE)
+
+
+def initial_state():
+    """
+    Creates the encoding of the starting position.
+
+    The position is seen from white's point of view: white moves towards triangle 0
+    and black moves towards triangle 23.
+
+    Returns:
+        bytes: The encoded starting position.
+    """
+    counts = array('b', bytes(STATE_SIZE))
+    for index, count in {0: -2, 5: 5, 7: 3, 11: -5, 12: 5, 16: -3, 18: -5, 23: 2}.items():
+        counts[index] = count
+    return counts.tobytes()
+
+
+def encode_state(triangles, bar_white, bar_black, white_boreoff, black_boreoff):
+    """
+    Encodes a game state into its fixed 28 byte layout.
+
+    Bytes 0-23 hold one signed count per triangle, positive for white pieces and negative
+    for black pieces. Bytes 24-27 hold the white bar, black bar, white boreoff and black
+    boreoff counts.
+
+    Parameters:
+        triangles (list of Triangle): The 24 triangles of the board, ordered by index.
+        bar_white (int): The number of white pieces on the bar.
+        bar_black (int): The number of black pieces on the bar.
+        white_boreoff (int): The number of white pieces borne off.
+        black_boreoff (int): The number of black pieces borne off.
+
+    Returns:
+        bytes: The encoded state.
+
+    Raises:
+        ValueError: If a triangle holds pieces of both colors.
+    """
+    counts = array('b', bytes(STATE_SIZE))
+    for t in triangles:
+        if t.pieces_white and t.pieces_black:
+            raise ValueError(f"Triangle {t.index} holds pieces of both colors.")
+        counts[t.index] = t.pieces_white - t.pieces_black
+    counts[BAR_WHITE] = bar_white
+    counts[BAR_BLACK] = bar_black
+    counts[WHITE_BOREOFF] = white_boreoff
+    counts[BLACK_BOREOFF] = black_boreoff
+    return counts.tobytes()
+
+
+def decode_state(data):
+    """
+    Decodes a game state encoded by `encode_state`.
+
+    Parameters:
+        data (bytes-like): The 28 bytes of the encoded state.
+
+    Returns:
+        array: The signed counts of the state, indexed like the encoding.
+
+    Raises:
+        ValueError: If the data does not have the size of an encoded state.
+    """
+    if len(data) != STATE_SIZE:
+        raise ValueError(f"Game state must be {STATE_SIZE} bytes, got {len(data)}.")
+    counts = array('b')
+    counts.frombytes(data)
+    return counts
+
+
+def mirror_state(data):
+    """
+    Mirrors an encoded game state to the point of view of the opponent.
+
+    Triangle i becomes triangle 23 - i; the bar and boreoff counts are left unchanged.
+
+    Parameters:
+        data (bytes or array): The encoded or decoded state.
+
+    Returns:
+        bytes or array: The mirrored state, of the same type as `data`.
+    """
+    return data[POINT_COUNT - 1::-1] + data[POINT_COUNT:]
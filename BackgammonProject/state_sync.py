@@ -0,0 +1,104 @@
+from protocol import encode_message
+from state_codec import POINT_COUNT, STATE_SIZE, decode_state, initial_state, mirror_state
+
+MIRRORED_SLOTS = tuple(POINT_COUNT - 1 - i if i < POINT_COUNT else i for i in range(STATE_SIZE))
+
+
+def apply_changes(state, changes):
+    """
+    Applies (slot, value) pairs to a decoded game state in place.
+
+    Parameters:
+        state (array): The decoded state to patch.
+        changes (list of tuple): The (slot, value) pairs to write.
+    """
+    for slot, value in changes:
+        state[slot] = value
+
+
+def mirror_changes(changes):
+    """
+    Mirrors (slot, value) pairs to the point of view of the opponent.
+
+    Parameters:
+        changes (list of tuple): The (slot, value) pairs to mirror.
+
+    Returns:
+        list of tuple: The mirrored pairs.
+    """
+    return [(MIRRORED_SLOTS[slot], value) for slot, value in changes]
+
+
+class VersionedState:
+    """
+    Keeps the authoritative game state of a game along with its sequence number.
+
+    The state is stored from white's point of view. Every committed change increments the
+    sequence number, so peers can tell from a delta's number whether they missed one and
+    must ask for a snapshot instead. Encoded snapshot messages are cached until the next
+    change, so any number of late joiners get the same bytes without re-encoding.
+    """
+
+    def __init__(self):
+        """
+        Initializes a VersionedState holding the starting position at sequence number 0.
+        """
+        self.state = decode_state(initial_state())
+        self.seq = 0
+        self.snapshot_messages = {}
+
+    def snapshot(self, color):
+        """
+        Builds a full snapshot of the state for a player.
+
+        Parameters:
+            color (str): The color of the receiving player ("white" or "black").
+
+        Returns:
+            dict: The sequence number and the encoded state from the player's point of view.
+        """
+        state = self.state if color == "white" else mirror_state(self.state)
+        return {"seq": self.seq, "state": state.tobytes()}
+
+    def snapshot_message(self, color):
+        """
+        Returns the encoded snapshot message of the latest state for a point of view.
+
+        Parameters:
+            color (str): The color of the receiving player ("white" or "black").
+
+        Returns:
+            bytes: The framed game state message, cached until the next change.
+        """
+        message = self.snapshot_messages.get(color)
+        if message is None:
+            message = encode_message({"type": "game_state", "data": self.snapshot(color)})
+            self.snapshot_messages[color] = message
+        return message
+
+    def delta(self, color, changes):
+        """
+        Builds the delta of the latest change for a player.
+
+        Parameters:
+            color (str): The color of the receiving player ("white" or "black").
+            changes (list of tuple): The (slot, value) pairs of the change, from white's point of view.
+
+        Returns:
+            dict: The sequence number and the changes from the player's point of view.
+        """
+        return {"seq": self.seq, "changes": changes if color == "white" else mirror_changes(changes)}
+
+    def commit(self, slots):
+        """
+        Records a change that was applied in place to the state.
+
+        Parameters:
+            slots (list of int): The slots that were modified.
+
+        Returns:
+            list of tuple: The (slot, value) pairs of the change, from white's point of view.
+        """
+        self.seq += 1
+        self.snapshot_messages.clear()
+        return [(slot, self.state[slot]) for slot in slots]
@@ -0,0 +1,197 @@
+import heapq
+import itertools
+import time
+
+WHEEL_TICK = 0.5
+WHEEL_SLOTS = 512
+
+
+class Timer:
+    """
+    Represents a callback scheduled on a TimerWheel.
+    """
+
+    __slots__ = ("expires_tick", "slot", "callback", "args")
+
+    def __init__(self, expires_tick, slot, callback, args):
+        """
+        Initializes a Timer.
+
+        Parameters:
+            expires_tick (int): The wheel tick at which the timer fires.
+            slot (int): The wheel slot holding the timer.
+            callback (callable): The function to call when the timer fires.
+            args (tuple): The arguments passed to the callback.
+        """
+        self.expires_tick = expires_tick
+        self.slot = slot
+        self.callback = callback
+        self.args = args
+
+
+class TimerWheel:
+    """
+    A hashed timing wheel holding the timers of every connection of a server.
+
+    Time is cut into ticks of `tick` seconds and each timer is stored in the slot of the tick
+    it expires on, modulo the number of slots. Scheduling and cancelling a timer cost O(1)
+    whatever the number of timers, and advancing the wheel only visits the slots of the
+    ticks that went by, so thousands of connections share one wheel driven by a single
+    periodic call to `advance` instead of one timer each.
+
+    The wheel is not thread-safe; callers sharing it between threads must lock around it.
+    """
+
+    def __init__(self, tick=WHEEL_TICK, slots=WHEEL_SLOTS, clock=time.monotonic):
+        """
+        Initializes an empty TimerWheel starting at the current time.
+
+        Parameters:
+            tick (float, optional): The resolution of the wheel in seconds. Defaults to WHEEL_TICK.
+            slots (int, optional): The number of slots of the wheel. Defaults to WHEEL_SLOTS.
+            clock (callable, optional): The monotonic clock to read the time from.
+                                        Defaults to time.monotonic.
+        """
+        self.tick = tick
+        self.clock = clock
+        self.wheel = [set() for _ in range(slots)]
+        self.current_tick = int(clock() / tick)
+
+    def __len__(self):
+        """
+        Counts the pending timers.
+
+        Returns:
+            int: The number of timers that have not fired nor been cancelled.
+        """
+        return sum(len(slot) for slot in self.wheel)
+
+    def schedule(self, delay, callback, *args):
+        """
+        Schedules a callback to run after a delay.
+
+        The callback runs on the first call to `advance` made at least `delay` seconds from
+        now, rounded up to the next tick.
+
+        Parameters:
+            delay (float): The number of seconds to wait.
+            callback (callable): The function to call.
+            *args: The arguments passed to the callback.
+
+        Returns:
+            Timer: The scheduled timer, which can be given to `cancel`.
+        """
+        expires_tick = max(-int(-(self.clock() + delay) // self.tick), self.current_tick + 1)
+        slot = expires_tick % len(self.wheel)
+        timer = Timer(expires_tick, slot, callback, args)
+        self.wheel[slot].add(timer)
+        return timer
+
+    def cancel(self, timer):
+        """
+        Cancels a timer that has not fired yet.
+
+        Parameters:
+            timer (Timer): The timer to cancel. Cancelling a timer twice has no effect.
+        """
+        self.wheel[timer.slot].discard(timer)
+
+    def advance(self):
+        """
+        Fires every timer that expired since the previous call.
+
+        Callbacks run after the wheel has been updated, so they may schedule or cancel timers.
+
+        Returns:
+            int: The number of timers fired.
+        """
+        target = int(self.clock() / self.tick)
+        steps = min(target - self.current_tick, len(self.wheel))
+        due = []
+        for step in range(1, steps + 1):
+            slot = self.wheel[(self.current_tick + step) % len(self.wheel)]
+            expired = [timer for timer in slot if timer.expires_tick <= target]
+            slot.difference_update(expired)
+            due.extend(expired)
+        self.current_tick = max(self.current_tick, target)
+        for timer in due:
+            timer.callback(*timer.args)
+        return len(due)
+
+
+class TimerHeap:
+    """
+    A binary heap of timers ordered by deadline, shared by every room of a server.
+
+    Scheduling a timer and firing the earliest one cost O(log n) in the number of pending
+    timers. Cancelled timers are only marked and are dropped when they reach the top of the
+    heap, so cancelling costs O(1).
+
+    The heap is not thread-safe; callers sharing it between threads must lock around it.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        """
+        Initializes an empty TimerHeap.
+
+        Parameters:
+            clock (callable, optional): The monotonic clock to read the time from.
+                                        Defaults to time.monotonic.
+        """
+        self.clock = clock
+        self.heap = []
+        self.counter = itertools.count()
+
+    def __len__(self):
+        """
+        Counts the timers still in the heap, including cancelled ones not dropped yet.
+
+        Returns:
+            int: The number of timers in the heap.
+        """
+        return len(self.heap)
+
+    def schedule(self, delay, callback, *args):
+        """
+        Schedules a callback to run after a delay.
+
+        Parameters:
+            delay (float): The number of seconds to wait.
+            callback (callable): The function to call.
+            *args: The arguments passed to the callback.
+
+        Returns:
+            list: The heap entry of the timer, which can be given to `cancel`.
+        """
+        entry = [self.clock() + delay, next(self.counter), callback, args]
+        heapq.heappush(self.heap, entry)
+        return entry
+
+    def cancel(self, entry):
+        """
+        Cancels a timer that has not fired yet.
+
+        Parameters:
+            entry (list): The heap entry returned by `schedule`.
+        """
+        entry[2] = None
+
+    def advance(self):
+        """
+        Fires every timer whose deadline has passed, earliest first.
+
+        Callbacks run after the expired timers have been popped, so they may schedule or
+        cancel timers.
+
+        Returns:
+            int: The number of timers fired.
+        """
+        now = self.clock()
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            entry = heapq.heappop(self.heap)
+            if entry[2] is not None:
+                due.append(entry)
+        for _, _, callback, args in due:
+            callback(*args)
+        return len(due)
@@ -0,0 +1,220 @@
+import argparse
+import collections
+import json
+import logging
+import random
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+FLUSH_SPANS = 4096
+SERVER_PROCESS = "server"
+CHAIN = ("mover.click", "mover.encode", "server.wire", "server.receive", "server.validate", "server.broadcast",
+         "peer.wire", "peer.decode", "peer.redraw")
+
+
+def new_trace(trace_id=None):
+    """
+    Stamps a traced message with the current monotonic time.
+
+    Parameters:
+        trace_id (int, optional): The id of the trace the message belongs to. Defaults to a
+                                  new random id, starting a trace.
+
+    Returns:
+        tuple: The trace id and the monotonic time in nanoseconds, as carried by the message.
+    """
+    if trace_id is None:
+        trace_id = random.getrandbits(64)
+    return trace_id, time.monotonic_ns()
+
+
+class Tracer:
+    """
+    Records the spans of traced moves and appends them to a JSON lines file.
+
+    A span is one hop of a move on its way from the click of the mover to the redraw of its
+    opponent: encoding it, receiving, validating and broadcasting it on the server, waiting
+    on the wire, decoding and redrawing it. Spans are timed with the monotonic clock, which
+    every process of a host shares, so the dumps of the clients and of the server can be
+    merged by `python tracing.py` into a timeline per move. Spans are buffered and written
+    FLUSH_SPANS at a time, and when the tracer is closed.
+    """
+
+    def __init__(self, path, process):
+        """
+        Initializes a Tracer.
+
+        Parameters:
+            path (str): The file the spans are appended to.
+            process (str): The name of the recording process, SERVER_PROCESS or any name
+                           starting with it for a server, anything else for a client.
+        """
+        self.path = path
+        self.process = process
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def span(self, trace, name, start_ns, end_ns=None):
+        """
+        Records a span of a traced message; does nothing for a message without a trace.
+
+        Parameters:
+            trace (tuple or None): The trace id and timestamp carried by the message.
+            name (str): The name of the hop.
+            start_ns (int): The monotonic time the hop started at, in nanoseconds.
+            end_ns (int, optional): The monotonic time the hop ended at. Defaults to now.
+        """
+        if trace is None:
+            return
+        self.spans.append((trace[0], name, start_ns, end_ns or time.monotonic_ns()))
+        if len(self.spans) >= FLUSH_SPANS:
+            self.flush()
+
+    def wire(self, trace, received_ns):
+        """
+        Records the time a traced message spent between its sender and this process.
+
+        The span starts at the timestamp carried by the message, so it is only meaningful
+        when the sender runs on the same host.
+
+        Parameters:
+            trace (tuple or None): The trace id and timestamp carried by the message.
+            received_ns (int): The monotonic time the message was received at, in nanoseconds.
+        """
+        if trace is not None:
+            self.span(trace, "wire", trace[1], received_ns)
+
+    def flush(self):
+        """
+        Appends the buffered spans to the file.
+        """
+        with self.lock:
+            spans, self.spans = self.spans, []
+        if not spans:
+            return
+        try:
+            with open(self.path, "a") as f:
+                f.writelines(json.dumps({"trace": f"{trace_id:016x}", "process": self.process, "span": name,
+                                         "start": start_ns, "end": end_ns}) + "\n"
+                             for trace_id, name, start_ns, end_ns in spans)
+        except OSError as e:
+            logging.error(f"Could not write {len(spans)} spans to {self.path}: {e}")
+
+    def close(self):
+        """
+        Writes the spans still buffered.
+        """
+        self.flush()
+
+
+def load_spans(paths):
+    """
+    Reads the spans of several trace dumps.
+
+    Parameters:
+        paths (list of str): The dumps of the clients and servers.
+
+    Returns:
+        list of dict: The spans, with their trace id, process, name, start and end.
+    """
+    spans = []
+    for path in paths:
+        with open(path) as f:
+            spans.extend(json.loads(line) for line in f if line.strip())
+    return spans
+
+
+def merge_traces(spans):
+    """
+    Groups spans by trace and names each one after the role of its process in the move.
+
+    The client that encoded the move is the mover, the other clients are peers. A client
+    that receives its own move back only shows up as the mover.
+
+    Parameters:
+        spans (list of dict): The spans of every dump.
+
+    Returns:
+        dict: The spans of every trace, ordered by start time, as (label, start, end) tuples
+              keyed by trace id.
+    """
+    by_trace = collections.defaultdict(list)
+    for span in spans:
+        by_trace[span["trace"]].append(span)
+    traces = {}
+    for trace_id, trace_spans in by_trace.items():
+        movers = {span["process"] for span in trace_spans if span["span"] == "encode"}
+        timeline = []
+        for span in trace_spans:
+            if span["process"].startswith(SERVER_PROCESS):
+                role = "server"
+            elif span["process"] in movers:
+                role = "mover"
+            else:
+                role = "peer"
+            timeline.append((f"{role}.{span['span']}", span["start"], span["end"]))
+        traces[trace_id] = sorted(timeline, key=lambda item: item[1])
+    return traces
+
+
+def percentile(sorted_values, fraction):
+    """
+    Picks a percentile from sorted values.
+
+    Parameters:
+        sorted_values (list of float): The values, in ascending order.
+        fraction (float): The percentile, between 0 and 1.
+
+    Returns:
+        float: The value below which `fraction` of the values fall.
+    """
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def main():
+    """
+    Merges the trace dumps of clients and servers into a latency breakdown per move.
+
+    Prints the hops of the latest traced moves, then the p50 and p99 of every hop and of the
+    whole move, from the first span of the mover to the last span of a peer.
+    """
+    parser = argparse.ArgumentParser(description="Break down the latency of traced Backgammon moves.")
+    parser.add_argument("dumps", nargs="+", help="The trace files of the clients and servers.")
+    parser.add_argument("--moves", type=int, default=5, help="The number of latest moves shown hop by hop.")
+    args = parser.parse_args()
+    traces = merge_traces(load_spans(args.dumps))
+    complete = {}
+    for trace_id, timeline in traces.items():
+        labels = [label for label, _, _ in timeline]
+        if any(label.startswith("mover.") for label in labels) and any(label.startswith("peer.") for label in labels):
+            complete[trace_id] = timeline
+    print(f"{len(traces)} traced moves, {len(complete)} seen from the mover to a peer.")
+    if not complete:
+        return
+
+    totals = {trace_id: max(end for label, _, end in timeline if label.startswith("peer.")) - timeline[0][1]
+              for trace_id, timeline in complete.items()}
+    latest = sorted(complete.items(), key=lambda item: item[1][0][1])[max(len(complete) - args.moves, 0):]
+    for trace_id, timeline in latest:
+        origin = timeline[0][1]
+        print(f"\nMove {trace_id}: {totals[trace_id] / 1e6:.3f} ms")
+        for label, start, end in timeline:
+            print(f"  {label:<18} +{(start - origin) / 1e6:8.3f} ms  {(end - start) / 1e6:8.3f} ms")
+
+    durations = collections.defaultdict(list)
+    for trace_id, timeline in complete.items():
+        for label, start, end in timeline:
+            durations[label].append(end - start)
+        durations["total"].append(totals[trace_id])
+    print(f"\n{'hop':<18} {'p50 ms':>9} {'p99 ms':>9} {'count':>7}")
+    for label in [label for label in CHAIN if label in durations] + \
+            sorted(label for label in durations if label not in CHAIN and label != "total") + ["total"]:
+        values = sorted(durations[label])
+        print(f"{label:<18} {percentile(values, 0.5) / 1e6:9.3f} {percentile(values, 0.99) / 1e6:9.3f} "
+              f"{len(values):>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import time
+
+CLOCK_MODES = ("fixed", "fischer")
+TIMEOUT_ACTIONS = ("pass", "forfeit")
+DEFAULT_TURN_CLOCK = {"mode": "fixed", "budget": 120.0, "increment": 0.0, "on_timeout": "pass"}
+
+
+class TurnClock:
+    """
+    Tracks the thinking time of both players of a game.
+
+    In "fixed" mode every turn gets the same budget. In "fischer" mode each player has a
+    bank of `budget` seconds that the running turn draws from, and `increment` seconds are
+    added to it after every completed turn. The clock only measures time; the server
+    schedules the expiry of the running turn and decides what happens when it expires.
+    """
+
+    def __init__(self, mode="fixed", budget=120.0, increment=0.0, on_timeout="pass", clock=time.monotonic):
+        """
+        Initializes a TurnClock with a full budget for both players.
+
+        Parameters:
+            mode (str, optional): "fixed" or "fischer". Defaults to "fixed".
+            budget (float, optional): The seconds per turn, or the initial bank in fischer mode.
+                                      Defaults to 120.0.
+            increment (float, optional): The seconds added after each turn in fischer mode.
+                                         Defaults to 0.0.
+            on_timeout (str, optional): "pass" to end the turn of a player who runs out of time,
+                                        "forfeit" to make them lose. Defaults to "pass".
+            clock (callable, optional): The monotonic clock to read the time from.
+                                        Defaults to time.monotonic.
+
+        Raises:
+            ValueError: If the mode or the timeout action is unknown.
+        """
+        if mode not in CLOCK_MODES:
+            raise ValueError(f"Unknown turn clock mode: {mode}")
+        if on_timeout not in TIMEOUT_ACTIONS:
+            raise ValueError(f"Unknown turn timeout action: {on_timeout}")
+        self.mode = mode
+        self.budget = budget
+        self.increment = increment
+        self.on_timeout = on_timeout
+        self.clock = clock
+        self.remaining = {"white": budget, "black": budget}
+        self.running_color = None
+        self.started_at = None
+
+    def start(self, color):
+        """
+        Starts the clock of a player whose turn begins.
+
+        Parameters:
+            color (str): The color of the player to move.
+
+        Returns:
+            float: The seconds the player has to finish the turn.
+        """
+        self.stop()
+        if self.mode == "fixed":
+            self.remaining[color] = self.budget
+        self.running_color = color
+        self.started_at = self.clock()
+        return self.remaining[color]
+
+    def stop(self):
+        """
+        Stops the running clock and charges the elapsed time to its player.
+
+        In fischer mode the increment is then added to the player's bank, so a player who
+        ran out of time still gets the increment for the next turn.
+        """
+        color = self.running_color
+        if color is None:
+            return
+        left = max(self.remaining[color] - (self.clock() - self.started_at), 0.0)
+        if self.mode == "fischer":
+            left += self.increment
+        self.remaining[color] = left
+        self.running_color = None
+        self.started_at = None